@@ -0,0 +1,93 @@
+"""Cold-start import cost of the bot.
+
+Each run imports the target module in a fresh interpreter with `-X importtime`
+and reports the wall time plus the most expensive modules. Importing `main`
+has no side effects, so no credentials or database are needed.
+
+    python benchmarks/import_time.py                  # main, 5 runs
+    python benchmarks/import_time.py --module platform_sdks --call warm
+    python benchmarks/import_time.py --budget-ms 800  # non-zero exit when over budget
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def measure(module, call=None):
+    """Returns (wall ms, {top-level module: cumulative us}) for one fresh-interpreter import."""
+    code = (
+        "import sys, time; sys.stderr.write('IMPORT_START\\n'); _t = time.perf_counter()\n"
+        f"import {module}\n"
+        + (f"{module}.{call}()\n" if call else "")
+        + "print('WALL_MS', (time.perf_counter() - _t) * 1000)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_ROOT, capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{result.stderr[-2000:]}")
+
+    wall_ms = next(float(line.split()[1]) for line in result.stdout.splitlines() if line.startswith("WALL_MS"))
+    top_level = {}
+    # Only what the target pulls in, not interpreter startup (site, encodings, ...).
+    log = result.stderr.split("IMPORT_START\n", 1)[-1]
+    for line in log.splitlines():
+        # "import time: <self us> | <cumulative us> | <two spaces per nesting level><module>"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        name = name[1:]
+        if not name.startswith(" "):
+            top_level[name.strip()] = top_level.get(name.strip(), 0) + int(cumulative_us)
+    return wall_ms, top_level
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main")
+    parser.add_argument("--call", help="function of the module to call after import (e.g. warm)")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--budget-ms", type=float, help="fail when the median wall time exceeds this")
+    parser.add_argument("--json", action="store_true", help="print a machine-readable summary")
+    args = parser.parse_args()
+
+    walls, last = [], {}
+    for _ in range(args.runs):
+        wall_ms, last = measure(args.module, args.call)
+        walls.append(wall_ms)
+
+    heaviest = sorted(last.items(), key=lambda item: item[1], reverse=True)[:args.top]
+    summary = {
+        "module": args.module,
+        "call": args.call,
+        "runs": args.runs,
+        "median_ms": statistics.median(walls),
+        "min_ms": min(walls),
+        "max_ms": max(walls),
+        "heaviest": [{"module": name, "cumulative_ms": us / 1000} for name, us in heaviest],
+    }
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        target = args.module + (f" + {args.call}()" if args.call else "")
+        print(f"import {target}: median {summary['median_ms']:.1f} ms "
+              f"(min {summary['min_ms']:.1f}, max {summary['max_ms']:.1f}) over {args.runs} runs\n")
+        print(f"{'module':<40}{'cumulative ms':>15}")
+        for entry in summary["heaviest"]:
+            print(f"{entry['module']:<40}{entry['cumulative_ms']:>15.1f}")
+
+    if args.budget_ms is not None and summary["median_ms"] > args.budget_ms:
+        print(f"\nOver budget: {summary['median_ms']:.1f} ms > {args.budget_ms:.1f} ms", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,460 @@
+"""End-to-end load test: handle_media_upload -> process_and_upload at a chosen concurrency.
+
+Nothing leaves the machine:
+- Telegram is a fake client. download_media copies a local fixture at a
+  capped bandwidth, and sends and edits are counted.
+- graph.facebook.com, graph-video.facebook.com and the YouTube resumable
+  upload endpoint are served by a local stand-in. It runs on its own
+  thread and event loop, so its sleeps don't show up as bot loop lag. It
+  injects latency, per-connection bandwidth caps and random 5xx failures.
+- MongoDB is a local mongod, using a throwaway database that is dropped
+  afterwards. mongomock cannot back pymongo's AsyncMongoClient, which the
+  Repository uses.
+
+Each simulated user sends one video, answers every prompt instantly and
+waits for the upload task. The report covers jobs/sec, job latency
+percentiles, per-stage p95 (from the job traces), event-loop lag, peak
+RSS and what the stand-ins saw.
+
+    python benchmarks/load_test.py --jobs 40 --concurrency 8 --max-uploads 4
+    python benchmarks/load_test.py --platform youtube --bandwidth-mbps 20 --failure-rate 0.05
+    python benchmarks/load_test.py --media my_clip.mp4 --json result.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from urllib.parse import urlsplit
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_ROOT)
+sys.path.insert(0, BENCH_DIR)
+
+from media_bench import PeakRss, make_fixture  # noqa: E402
+
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(round(fraction * (len(values) - 1))), len(values) - 1)]
+
+
+# ===================================================================
+# ================= PLATFORM STAND-IN (own loop) ====================
+# ===================================================================
+
+class PlatformStandIn:
+    """Local HTTP server answering the Graph API and YouTube resumable upload calls the bot makes.
+
+    Routes:
+      POST /v19.0/<page>/photos                 Facebook photo post
+      POST /video/<page>/videos                 Facebook video / reel (FB_GRAPH_VIDEO_URL points at /video)
+      POST /upload/youtube/v3/videos            YouTube resumable session start -> Location
+      PUT  /upload/session/<id>                 YouTube media bytes
+    """
+
+    def __init__(self, latency=0.05, jitter=0.02, bandwidth_bps=0, failure_rate=0.0, host="127.0.0.1"):
+        self.latency = latency
+        self.jitter = jitter
+        self.bandwidth_bps = bandwidth_bps  # per connection; 0 is unlimited
+        self.failure_rate = failure_rate
+        self.host = host
+        self.port = None
+        self.counters = {"requests": 0, "failures_injected": 0, "bytes_received": 0, "not_found": 0}
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, name="platform-standin", daemon=True)
+        self._thread.start()
+        self._ready.wait()
+
+    def stop(self):
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(timeout=5)
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, 0, limit=64 * 1024)
+        )
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._server.close()
+        self._loop.close()
+
+    async def _read_body(self, reader, length):
+        """Reads `length` bytes no faster than the bandwidth cap."""
+        received, started = 0, time.monotonic()
+        while received < length:
+            chunk = await reader.read(min(64 * 1024, length - received))
+            if not chunk:
+                break
+            received += len(chunk)
+            if self.bandwidth_bps:
+                ahead = received / self.bandwidth_bps - (time.monotonic() - started)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+        self.counters["bytes_received"] += received
+        return received
+
+    async def _handle(self, reader, writer):
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+            lines = head.decode("latin-1").split("\r\n")
+            method, target, _ = lines[0].split(" ", 2)
+            headers = {}
+            for line in lines[1:]:
+                if ":" in line:
+                    name, value = line.split(":", 1)
+                    headers[name.strip().lower()] = value.strip()
+            await self._read_body(reader, int(headers.get("content-length", "0")))
+            self.counters["requests"] += 1
+            await asyncio.sleep(max(self.latency + random.uniform(-self.jitter, self.jitter), 0))
+            status, extra_headers, body = self._route(method, urlsplit(target).path)
+            payload = json.dumps(body).encode()
+            response = (
+                f"HTTP/1.1 {status} X\r\nContent-Type: application/json\r\nContent-Length: {len(payload)}\r\n"
+                + "".join(f"{k}: {v}\r\n" for k, v in extra_headers.items())
+                + "Connection: close\r\n\r\n"
+            ).encode("latin-1") + payload
+            writer.write(response)
+            await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    def _route(self, method, path):
+        parts = [p for p in path.split("/") if p]
+        if random.random() < self.failure_rate:
+            self.counters["failures_injected"] += 1
+            return 500, {}, {"error": {"message": "Injected failure", "code": 2, "type": "OAuthException"}}
+        object_id = str(random.randint(10 ** 14, 10 ** 15))
+        if method == "POST" and len(parts) == 3 and parts[0] == "v19.0" and parts[2] == "photos":
+            return 200, {}, {"id": object_id, "post_id": f"{parts[1]}_{object_id}"}
+        if method == "POST" and len(parts) == 3 and parts[0] == "video" and parts[2] == "videos":
+            return 200, {}, {"id": object_id}
+        if method == "POST" and parts[:4] == ["upload", "youtube", "v3", "videos"]:
+            return 200, {"Location": f"{self.url}/upload/session/{uuid.uuid4().hex}"}, {}
+        if method == "PUT" and parts[:2] == ["upload", "session"]:
+            return 200, {}, {"id": uuid.uuid4().hex[:11], "kind": "youtube#video"}
+        self.counters["not_found"] += 1
+        return 404, {}, {"error": {"message": f"No stand-in for {method} {path}", "code": 404}}
+
+
+# ===================================================================
+# ====================== FAKE TELEGRAM ==============================
+# ===================================================================
+
+class FakeMessage:
+    """The slice of a Pyrogram Message the upload flow touches."""
+
+    def __init__(self, client, chat_id, message_id, user_id=None, video=None, caption=None):
+        self._client = client
+        self.id = message_id
+        self.chat = SimpleNamespace(id=chat_id)
+        self.from_user = SimpleNamespace(id=user_id or chat_id, username=f"load{chat_id}", mention=str(chat_id))
+        self.video = video
+        self.photo = None
+        self.document = None
+        self.caption = caption
+
+    async def reply(self, text=None, **kwargs):
+        return await self._client.send_message(self.chat.id, text, **kwargs)
+
+    async def edit_text(self, text=None, **kwargs):
+        return await self._client.edit_message_text(self.chat.id, self.id, text, **kwargs)
+
+    edit = edit_text
+
+    async def delete(self):
+        return await self._client.delete_messages(self.chat.id, self.id)
+
+
+class FakeTelegram:
+    """Stands in for the Pyrogram client: API calls cost `latency`, downloads are bandwidth-capped copies."""
+
+    def __init__(self, media_path, latency=0.03, bandwidth_bps=0):
+        self.media_path = media_path
+        self.latency = latency
+        self.bandwidth_bps = bandwidth_bps
+        self.calls = {}
+        self._next_id = 1000
+
+    def _call(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    def message(self, chat_id, **kwargs):
+        self._next_id += 1
+        return FakeMessage(self, chat_id, self._next_id, **kwargs)
+
+    async def send_message(self, chat_id, text=None, **kwargs):
+        self._call("send_message")
+        await asyncio.sleep(self.latency)
+        return self.message(chat_id)
+
+    async def edit_message_text(self, chat_id, message_id, text=None, **kwargs):
+        self._call("edit_message_text")
+        await asyncio.sleep(self.latency)
+        return FakeMessage(self, chat_id, message_id)
+
+    async def delete_messages(self, chat_id, message_ids, **kwargs):
+        self._call("delete_messages")
+        await asyncio.sleep(self.latency)
+        return True
+
+    async def download_media(self, message, file_name=None, progress=None, progress_args=(), **kwargs):
+        self._call("download_media")
+        await asyncio.sleep(self.latency)
+        size = os.path.getsize(self.media_path)
+        if self.bandwidth_bps:
+            await asyncio.sleep(size / self.bandwidth_bps)
+        target = file_name or tempfile.mkdtemp()
+        if target.endswith(os.sep):
+            target = os.path.join(target, message.video.file_name)
+        await asyncio.to_thread(shutil.copyfile, self.media_path, target)
+        return target
+
+
+# ===================================================================
+# ========================== HARNESS ================================
+# ===================================================================
+
+async def seed_user(repo, user_id, standin_url):
+    """A Facebook page and a YouTube channel per user, both active."""
+    await repo.upsert_session(user_id, "facebook", "loadpage", {
+        "session_data": {"id": "loadpage", "name": "Load Test Page", "access_token": "stand-in-token"},
+        "logged_in_at": datetime.now(timezone.utc)
+    })
+    credentials = {
+        "token": "stand-in-token", "refresh_token": "stand-in-refresh", "client_id": "stand-in",
+        "client_secret": "stand-in", "token_uri": f"{standin_url}/token"
+    }
+    await repo.upsert_session(user_id, "youtube", "loadchannel", {
+        "session_data": {"id": "loadchannel", "name": "Load Test Channel", "credentials_json": json.dumps(credentials)},
+        "logged_in_at": datetime.now(timezone.utc)
+    })
+    await repo.save_user_settings(user_id, {"active_facebook_id": "loadpage", "active_youtube_id": "loadchannel"})
+
+
+async def run_job(main, telegram, user_id, platform, upload_type, media_size, media_name):
+    """One user's flow from sending the video to the end of the upload task. Returns a result dict."""
+    main.user_states[user_id] = {"action": "waiting_for_media", "platform": platform,
+                                 "upload_type": upload_type, "lang": "en"}
+    video = SimpleNamespace(file_size=media_size, file_name=media_name, mime_type="video/mp4", duration=0)
+    msg = telegram.message(user_id, video=video, caption="Load test upload")
+    started = time.perf_counter()
+
+    await main.handle_media_upload(telegram, msg)
+    state = main.user_states.get(user_id)
+    if not state or "downloaded_path" not in state.get("file_info", {}):
+        return {"platform": platform, "ok": False, "stage": "download", "seconds": time.perf_counter() - started}
+
+    job_id = state["file_info"]["staging_id"]
+    # Answer every prompt at once: no schedule, no custom thumbnail.
+    state["file_info"].update({"title": f"Load test {job_id[:8]}", "description": "", "tags": "",
+                               "thumbnail_path": None, "visibility": "private", "schedule_time": None})
+    await main.process_upload_step(msg)
+    while main.task_tracker.has_active_task(user_id):
+        await asyncio.sleep(0.02)
+    seconds = time.perf_counter() - started
+
+    traces = await main.tracer.find(job_id, limit=1)
+    status = traces[0]["status"] if traces else "unknown"
+    return {"platform": platform, "ok": status == "ok", "status": status, "job_id": job_id, "seconds": seconds,
+            "error": traces[0].get("error") if traces else None}
+
+
+async def run(args, standin, media_path):
+    os.environ.update({
+        "FB_GRAPH_URL": standin.url,
+        "FB_GRAPH_VIDEO_URL": f"{standin.url}/video",
+        "YOUTUBE_API_ENDPOINT": f"{standin.url}/",
+    })
+    import logging
+    logging.basicConfig(level=logging.WARNING if not args.verbose else logging.INFO)
+    logging.getLogger("YTFBUser").setLevel(logging.ERROR if not args.verbose else logging.INFO)
+
+    import main
+    from repository import Repository
+    from rollups import DailyRollups
+    from staging import StagingArea
+    from stats_service import StatsService
+
+    telegram = FakeTelegram(media_path, latency=args.tg_latency_ms / 1000,
+                            bandwidth_bps=args.tg_bandwidth_mbps * 1024 * 1024 / 8)
+    main.app = telegram
+    main.MessageRef.client = telegram
+    main.task_tracker = main.TaskTracker()
+    main.executors.configure({"io": main.EXECUTOR_IO_WORKERS, "upload": main.EXECUTOR_UPLOAD_WORKERS,
+                              "media": main.EXECUTOR_MEDIA_WORKERS})
+    staging_root = tempfile.mkdtemp(prefix="loadtest-staging-")
+    main.staging = StagingArea(staging_root, min_free_bytes=0)
+    main.MAX_FILE_SIZE_BYTES = 1 << 40
+    await main.upload_limiter.set_max(args.max_uploads)
+
+    db_name = f"loadtest_{int(time.time())}"
+    repo = Repository(args.mongo_uri, db_name=db_name)
+    await repo.connect()
+    main.repo = repo
+    main.stats_service = StatsService(repo.db, main.PREMIUM_PLATFORMS)
+    main.rollups = DailyRollups(repo.db)
+    main.tracer.collection = repo.db.job_traces
+
+    lags = []
+    main.loop_monitor.observe_lag = lags.append
+    main.task_tracker.create_task(main.loop_monitor.run())
+    if not args.no_governor:
+        main.task_tracker.create_task(main.governor.run())
+
+    platforms = ["facebook", "youtube"] if args.platform == "mixed" else [args.platform]
+    users = [900_000_000 + i for i in range(args.concurrency)]
+    for user_id in users:
+        await seed_user(repo, user_id, standin.url)
+
+    media_size = os.path.getsize(media_path)
+    jobs = asyncio.Queue()
+    for i in range(args.jobs):
+        jobs.put_nowait(platforms[i % len(platforms)])
+    results = []
+
+    async def worker(user_id):
+        while True:
+            try:
+                platform = jobs.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            upload_type = args.upload_type if platform == "youtube" or args.upload_type != "short" else "video"
+            results.append(await run_job(main, telegram, user_id, platform, upload_type,
+                                         media_size, os.path.basename(media_path)))
+
+    run_started_at = datetime.now(timezone.utc)
+    with PeakRss() as rss:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(user_id) for user_id in users))
+        wall = time.perf_counter() - started
+
+    stages = await main.tracer.stage_summary(run_started_at)
+    await main.task_tracker.cancel_and_wait_all()
+    main.executors.shutdown_all()
+    if not args.keep_db:
+        await repo.client.drop_database(db_name)
+    await repo.close()
+    shutil.rmtree(staging_root, ignore_errors=True)
+
+    ok = [r for r in results if r["ok"]]
+    latencies = [r["seconds"] for r in ok]
+    failures = {}
+    for r in results:
+        if not r["ok"]:
+            key = r.get("error") or r.get("stage") or r.get("status")
+            failures[key] = failures.get(key, 0) + 1
+    return {
+        "config": {k: v for k, v in vars(args).items() if k != "json"},
+        "media": {"path": media_path, "size_mb": round(media_size / 1024 ** 2, 2)},
+        "jobs": len(results), "ok": len(ok), "failed": len(results) - len(ok),
+        "wall_s": wall,
+        "jobs_per_s": len(ok) / wall if wall else 0.0,
+        "latency_s": {"p50": _percentile(latencies, 0.5), "p95": _percentile(latencies, 0.95),
+                      "max": max(latencies, default=0.0),
+                      "mean": statistics.mean(latencies) if latencies else 0.0},
+        "loop_lag_ms": {"p50": _percentile(lags, 0.5) * 1000, "p95": _percentile(lags, 0.95) * 1000,
+                        "max": max(lags, default=0.0) * 1000, "stalls": main.loop_monitor.stall_count},
+        "peak_rss_mb": round(rss.peak / 1024 ** 2, 1),
+        "stages": stages,
+        "failures": failures,
+        "standin": dict(standin.counters),
+        "telegram_calls": dict(telegram.calls),
+    }
+
+
+def print_report(report):
+    print(f"\n{report['ok']}/{report['jobs']} jobs ok in {report['wall_s']:.1f}s "
+          f"-> {report['jobs_per_s']:.2f} jobs/s "
+          f"(concurrency {report['config']['concurrency']}, max uploads {report['config']['max_uploads']})")
+    lat = report["latency_s"]
+    print(f"job latency: p50 {lat['p50']:.2f}s  p95 {lat['p95']:.2f}s  max {lat['max']:.2f}s")
+    lag = report["loop_lag_ms"]
+    print(f"loop lag:    p50 {lag['p50']:.1f}ms  p95 {lag['p95']:.1f}ms  max {lag['max']:.1f}ms  "
+          f"stalls {lag['stalls']}")
+    print(f"peak RSS:    {report['peak_rss_mb']:.0f} MB (bot + ffmpeg)")
+    if report["stages"]:
+        print(f"\n{'stage':<15}{'n':>6}{'p50 s':>9}{'p95 s':>9}{'max s':>9}{'errors':>8}")
+        for row in report["stages"]:
+            print(f"{row['stage']:<15}{row['count']:>6}{row['p50']:>9.2f}{row['p95']:>9.2f}"
+                  f"{row['max']:>9.2f}{row['errors']:>8}")
+    if report["failures"]:
+        print("\nfailures:")
+        for reason, count in sorted(report["failures"].items(), key=lambda item: -item[1]):
+            print(f"  {count:>4}  {reason}")
+    print(f"\nstand-in: {report['standin']}\ntelegram: {report['telegram_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4, help="simulated users sending at once")
+    parser.add_argument("--max-uploads", type=int, default=4, help="upload limiter ceiling (max_concurrent_uploads)")
+    parser.add_argument("--platform", choices=("facebook", "youtube", "mixed"), default="mixed")
+    parser.add_argument("--upload-type", choices=("video", "reels", "short"), default="video")
+    parser.add_argument("--media", help="video to upload; default is a generated H.264/AAC fixture")
+    parser.add_argument("--media-seconds", type=int, default=10, help="length of the generated fixture")
+    parser.add_argument("--latency-ms", type=float, default=80, help="stand-in response latency")
+    parser.add_argument("--jitter-ms", type=float, default=30)
+    parser.add_argument("--bandwidth-mbps", type=float, default=50, help="stand-in per-connection cap; 0 = none")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of stand-in calls answered 500")
+    parser.add_argument("--tg-latency-ms", type=float, default=30, help="fake Telegram API call latency")
+    parser.add_argument("--tg-bandwidth-mbps", type=float, default=100, help="fake Telegram download cap; 0 = none")
+    parser.add_argument("--mongo-uri", default=os.getenv("LOADTEST_MONGO_URI", "mongodb://127.0.0.1:27017"))
+    parser.add_argument("--keep-db", action="store_true", help="keep the throwaway database for inspection")
+    parser.add_argument("--no-governor", action="store_true", help="pin limits instead of letting the governor move them")
+    parser.add_argument("--json", help="also write the report to this file")
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    media_path = args.media
+    if media_path is None:
+        fixtures = os.path.join(BENCH_DIR, ".fixtures")
+        os.makedirs(fixtures, exist_ok=True)
+        media_path = make_fixture(fixtures, "h264_aac_mp4", args.media_seconds)
+        if media_path is None:
+            sys.exit("Could not generate the fixture; pass --media or install ffmpeg with libx264.")
+
+    standin = PlatformStandIn(latency=args.latency_ms / 1000, jitter=args.jitter_ms / 1000,
+                              bandwidth_bps=args.bandwidth_mbps * 1024 * 1024 / 8, failure_rate=args.failure_rate)
+    standin.start()
+    try:
+        report = asyncio.run(run(args, standin, media_path))
+    finally:
+        standin.stop()
+
+    print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
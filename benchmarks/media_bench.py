@@ -0,0 +1,276 @@
+"""Media pipeline benchmark on synthetic inputs.
+
+Fixtures are generated locally with ffmpeg's lavfi sources (test pattern
+plus a sine tone), so no Telegram, platform or network access is needed.
+Each fixture goes through the same helpers the bot uses:
+get_video_metadata, needs_conversion, process_video_for_upload (stream
+copy or re-encode, depending on the fixture's codecs) and
+generate_thumbnail. Wall time, throughput (media seconds per wall second
+and MB/s of input) and peak RSS of the bot plus its ffmpeg children are
+recorded.
+
+    python benchmarks/media_bench.py                          # all fixtures, 5s and 30s
+    python benchmarks/media_bench.py --durations 10,120 --repeat 5
+    python benchmarks/media_bench.py --output after.json --baseline before.json --tolerance 0.15
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+import psutil
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+_VIDEO = "testsrc2=size={size}:rate=30:duration={duration}"
+_AUDIO = "sine=frequency=440:sample_rate=48000:duration={duration}"
+
+# name -> (extension, frame size, encoder arguments). Durations are applied per run.
+FIXTURES = {
+    "h264_aac_mp4": ("mp4", "1280x720", ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                                          "-c:a", "aac", "-b:a", "128k"]),
+    "hevc_mkv": ("mkv", "1280x720", ["-c:v", "libx265", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                                     "-c:a", "libopus", "-b:a", "96k"]),
+    "vp9_webm": ("webm", "1280x720", ["-c:v", "libvpx-vp9", "-deadline", "realtime", "-cpu-used", "8",
+                                      "-b:v", "2M", "-c:a", "libopus", "-b:a", "96k"]),
+    "vertical_short_mp4": ("mp4", "1080x1920", ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p",
+                                                "-c:a", "aac", "-b:a", "128k"]),
+    "h264_10bit_mp4": ("mp4", "1280x720", ["-c:v", "libx264", "-preset", "veryfast", "-pix_fmt", "yuv420p10le",
+                                           "-c:a", "aac", "-b:a", "128k"]),
+}
+SHORTS_MAX_SECONDS = 60
+
+
+def ffmpeg_version():
+    try:
+        out = subprocess.run(["ffmpeg", "-version"], capture_output=True, text=True, check=True).stdout
+        return out.splitlines()[0]
+    except (FileNotFoundError, subprocess.CalledProcessError):
+        return None
+
+
+def make_fixture(directory, name, duration):
+    """Generates (or reuses) one fixture; returns its path, or None when the encoder is unavailable."""
+    ext, size, codec_args = FIXTURES[name]
+    path = os.path.join(directory, f"{name}_{duration}s.{ext}")
+    if os.path.exists(path):
+        return path
+    command = [
+        "ffmpeg", "-y", "-v", "error",
+        "-f", "lavfi", "-i", _VIDEO.format(size=size, duration=duration),
+        "-f", "lavfi", "-i", _AUDIO.format(duration=duration),
+        *codec_args, "-shortest", path + ".part." + ext
+    ]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"  skipping {name} ({duration}s): {result.stderr.strip().splitlines()[-1:] or 'ffmpeg failed'}",
+              file=sys.stderr)
+        return None
+    os.replace(path + ".part." + ext, path)
+    return path
+
+
+class PeakRss:
+    """Samples the RSS of this process plus its children (ffmpeg) in a background thread."""
+
+    def __init__(self, interval=0.02):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._process = psutil.Process()
+
+    def _current(self):
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        return rss
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self._current())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        self.peak = self._current()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+
+async def measure(run, repeat):
+    """Runs the coroutine factory `repeat` times; returns (wall times, peak RSS bytes, last result)."""
+    walls, peak, result = [], 0, None
+    for _ in range(repeat):
+        with PeakRss() as rss:
+            started = time.perf_counter()
+            result = await run()
+            walls.append(time.perf_counter() - started)
+        peak = max(peak, rss.peak)
+    return walls, peak, result
+
+
+async def bench_fixture(main, path, name, duration, repeat, workdir):
+    size = os.path.getsize(path)
+    media = main.executors
+
+    def row(op, walls, peak, **extra):
+        median = statistics.median(walls)
+        return {
+            "fixture": name, "duration_s": duration, "size_mb": round(size / 1024 ** 2, 2), "op": op,
+            "runs": len(walls), "median_s": median, "min_s": min(walls), "max_s": max(walls),
+            "realtime_x": duration / median if median > 0 else None,
+            "mb_per_s": size / 1024 ** 2 / median if median > 0 else None,
+            "peak_rss_mb": round(peak / 1024 ** 2, 1), **extra
+        }
+
+    rows = []
+    walls, peak, metadata = await measure(lambda: media.run("media", main.get_video_metadata, path), repeat)
+    codecs = {s.get("codec_type"): s.get("codec_name") for s in metadata.get("streams", [])}
+    rows.append(row("get_video_metadata", walls, peak))
+
+    walls, peak, needed = await measure(lambda: media.run("media", main.needs_conversion, path), repeat)
+    rows.append(row("needs_conversion", walls, peak, result=needed))
+
+    output = os.path.join(workdir, f"{name}_{duration}s_processed.mp4")
+    mode = "copy" if codecs.get("video") == "h264" and codecs.get("audio") == "aac" else "reencode"
+
+    async def process():
+        # No chat: safe_threaded_reply returns early when there is no original message.
+        return await main.process_video_for_upload(None, None, None, path, output)
+
+    walls, peak, _ = await measure(process, repeat)
+    rows.append(row("process_video_for_upload", walls, peak, mode=mode,
+                    video_codec=codecs.get("video"), audio_codec=codecs.get("audio"),
+                    output_mb=round(os.path.getsize(output) / 1024 ** 2, 2)))
+
+    thumb = output + ".jpg"
+    walls, peak, generated = await measure(
+        lambda: media.run("media", main.generate_thumbnail, output, thumb, main.FFMPEG_THREADS), repeat
+    )
+    rows.append(row("generate_thumbnail", walls, peak, ok=generated is not None))
+    for leftover in (output, thumb):
+        if os.path.exists(leftover):
+            os.remove(leftover)
+    return rows
+
+
+def compare(results, baseline, tolerance):
+    """Pairs each result with its baseline row; returns (lines, regression count)."""
+    previous = {(r["fixture"], r["duration_s"], r["op"]): r for r in baseline.get("results", [])}
+    lines, regressions = [], 0
+    for r in results:
+        old = previous.get((r["fixture"], r["duration_s"], r["op"]))
+        if old is None:
+            lines.append(f"{r['fixture']:<22}{r['duration_s']:>5}s  {r['op']:<26}{'new':>10}")
+            continue
+        change = (r["median_s"] - old["median_s"]) / old["median_s"] if old["median_s"] else 0.0
+        flag = ""
+        if change > tolerance:
+            flag = "  REGRESSION"
+            regressions += 1
+        elif change < -tolerance:
+            flag = "  faster"
+        lines.append(f"{r['fixture']:<22}{r['duration_s']:>5}s  {r['op']:<26}"
+                     f"{old['median_s']:>9.3f}s -> {r['median_s']:.3f}s ({change * 100:+.1f}%){flag}")
+    return lines, regressions
+
+
+async def run(args):
+    logging.getLogger("YTFBUser").setLevel(logging.CRITICAL)  # the helpers log every step
+    import main
+
+    main.executors.configure({"media": args.workers, "io": 2})
+    os.makedirs(args.fixtures_dir, exist_ok=True)
+    workdir = os.path.join(args.fixtures_dir, "work")
+    os.makedirs(workdir, exist_ok=True)
+
+    names = args.fixtures.split(",") if args.fixtures else list(FIXTURES)
+    durations = [int(d) for d in args.durations.split(",")]
+    results = []
+    try:
+        for name in names:
+            for duration in durations:
+                if name.startswith("vertical_short") and duration > SHORTS_MAX_SECONDS:
+                    continue
+                path = make_fixture(args.fixtures_dir, name, duration)
+                if path is None:
+                    continue
+                print(f"  {name} ({duration}s)...", file=sys.stderr)
+                try:
+                    results.extend(await bench_fixture(main, path, name, duration, args.repeat, workdir))
+                except Exception as e:
+                    print(f"  {name} ({duration}s) failed: {e}", file=sys.stderr)
+    finally:
+        main.executors.shutdown_all()
+        shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fixtures", help=f"comma-separated subset of: {', '.join(FIXTURES)}")
+    parser.add_argument("--durations", default="5,30", help="comma-separated fixture durations in seconds")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=2, help="size of the media executor")
+    parser.add_argument("--fixtures-dir", default=os.path.join(REPO_ROOT, "benchmarks", ".fixtures"))
+    parser.add_argument("--output", default="media_bench.json")
+    parser.add_argument("--baseline", help="earlier --output file to compare medians against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="slowdown that counts as a regression")
+    args = parser.parse_args()
+
+    version = ffmpeg_version()
+    if version is None:
+        sys.exit("ffmpeg/ffprobe not found on PATH.")
+
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "ffmpeg": version,
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'fixture':<22}{'dur':>6}  {'op':<26}{'median':>9}{'x realtime':>12}{'MB/s':>9}{'peak RSS':>10}")
+    for r in results:
+        print(f"{r['fixture']:<22}{r['duration_s']:>5}s  {r['op']:<26}{r['median_s']:>8.3f}s"
+              f"{r['realtime_x'] or 0:>12.1f}{r['mb_per_s'] or 0:>9.1f}{r['peak_rss_mb']:>8.0f}MB"
+              + (f"  [{r['mode']}]" if "mode" in r else ""))
+    print(f"\nWrote {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        lines, regressions = compare(results, baseline, args.tolerance)
+        print(f"\nAgainst {args.baseline} (tolerance {args.tolerance * 100:.0f}%):")
+        print("\n".join(lines))
+        if regressions:
+            print(f"\n{regressions} regression(s).", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
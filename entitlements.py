@@ -0,0 +1,156 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger("YTFBUser.entitlements")
+
+
+class EntitlementCache:
+    """Bounded in-memory map of user -> per-platform premium (type, until, status)."""
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _normalize(premium) -> dict:
+        entry = {}
+        for platform, data in (premium or {}).items():
+            if not isinstance(data, dict):
+                continue
+            until = data.get("until")
+            if isinstance(until, datetime) and until.tzinfo is None:
+                until = until.replace(tzinfo=timezone.utc)
+            entry[platform] = (data.get("type"), until, data.get("status"))
+        return entry
+
+    def put(self, user_id, premium):
+        """Replaces the cached entitlements with the user's full `premium` sub-document."""
+        self._entries[user_id] = self._normalize(premium)
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def mark_expired(self, user_id, platform):
+        entry = self._entries.get(user_id)
+        if entry is not None and platform in entry:
+            premium_type, until, _ = entry[platform]
+            entry[platform] = (premium_type, until, "expired")
+
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def check(self, user_id, platform, now=None):
+        """True/False when the user is cached, None when the caller must consult the database."""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+
+        premium_type, until, status = entry.get(platform, (None, None, None))
+        if not premium_type or status == "expired":
+            self.hits += 1
+            return False
+        if premium_type == "lifetime":
+            self.hits += 1
+            return True
+        now = now or datetime.now(timezone.utc)
+        self.hits += 1
+        # A passed `until` is final; PremiumSweeper records the expiry in the database.
+        return isinstance(until, datetime) and until > now
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class PremiumSweeper:
+    """Marks lapsed plans expired in bulk and reminds users shortly before their plan runs out."""
+
+    def __init__(self, users, cache, platforms, notify=None, interval=300,
+                 remind_before=timedelta(hours=24), batch_size=20, batch_pause=1.0):
+        self.users = users
+        self.cache = cache
+        self.platforms = list(platforms)
+        self.notify = notify
+        self.interval = interval
+        self.remind_before = remind_before
+        self.batch_size = batch_size
+        self.batch_pause = batch_pause
+        self.expired_total = 0
+        self.reminded_total = 0
+
+    async def expire_due(self, now=None) -> int:
+        """Flips every active plan whose `until` has passed to expired, one update_many per platform."""
+        now = now or datetime.now(timezone.utc)
+        expired = 0
+        for platform in self.platforms:
+            query = {f"premium.{platform}.status": "active", f"premium.{platform}.until": {"$lte": now}}
+            docs = await self.users.find(query, {"_id": 1}).to_list()
+            if not docs:
+                continue
+            user_ids = [doc["_id"] for doc in docs]
+            await self.users.update_many(
+                {**query, "_id": {"$in": user_ids}},
+                {"$set": {f"premium.{platform}.status": "expired"}}
+            )
+            for user_id in user_ids:
+                self.cache.mark_expired(user_id, platform)
+            expired += len(user_ids)
+            logger.info(f"Marked {len(user_ids)} {platform} premium plan(s) as expired.")
+        self.expired_total += expired
+        return expired
+
+    async def send_reminders(self, now=None) -> int:
+        """Notifies users whose plan ends within `remind_before`; each plan is reminded once."""
+        if self.notify is None:
+            return 0
+        now = now or datetime.now(timezone.utc)
+        sent = 0
+        for platform in self.platforms:
+            query = {
+                f"premium.{platform}.status": "active",
+                f"premium.{platform}.until": {"$gt": now, "$lte": now + self.remind_before},
+                f"premium.{platform}.reminded_at": {"$exists": False}
+            }
+            docs = await self.users.find(query, {"_id": 1, f"premium.{platform}.until": 1}).to_list()
+            if not docs:
+                continue
+            # Flag first so a crash mid-batch never reminds the same user twice.
+            await self.users.update_many(
+                {**query, "_id": {"$in": [doc["_id"] for doc in docs]}},
+                {"$set": {f"premium.{platform}.reminded_at": now}}
+            )
+            for i in range(0, len(docs), self.batch_size):
+                batch = docs[i:i + self.batch_size]
+                await asyncio.gather(*(
+                    self._remind(doc["_id"], platform, doc["premium"][platform]["until"]) for doc in batch
+                ))
+                sent += len(batch)
+                if i + self.batch_size < len(docs):
+                    await asyncio.sleep(self.batch_pause)
+        self.reminded_total += sent
+        return sent
+
+    async def _remind(self, user_id, platform, until):
+        if isinstance(until, datetime) and until.tzinfo is None:
+            until = until.replace(tzinfo=timezone.utc)
+        try:
+            await self.notify(user_id, platform, until)
+        except Exception as e:
+            logger.warning(f"Could not send {platform} expiry reminder to {user_id}: {e}")
+
+    async def sweep(self):
+        await self.expire_due()
+        await self.send_reminders()
+
+    async def run(self):
+        while True:
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Premium sweep failed: {e}")
+            await asyncio.sleep(self.interval)
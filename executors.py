@@ -0,0 +1,98 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger("YTFBUser.executors")
+
+
+class WorkloadExecutor:
+    """A named, bounded thread pool that keeps track of its own utilization."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-pool")
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.active = 0
+        self.busy_seconds = 0.0
+
+    def _instrumented(self, func, args, kwargs):
+        ctx = contextvars.copy_context()
+
+        def call():
+            with self._lock:
+                self.active += 1
+            started = time.perf_counter()
+            try:
+                return ctx.run(func, *args, **kwargs)
+            except BaseException:
+                with self._lock:
+                    self.failed += 1
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._lock:
+                    self.active -= 1
+                    self.completed += 1
+                    self.busy_seconds += elapsed
+        return call
+
+    async def run(self, func, *args, **kwargs):
+        """Runs a blocking callable in this pool and awaits its result."""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self.submitted += 1
+        return await loop.run_in_executor(self._executor, self._instrumented(func, args, kwargs))
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            queued = max(self.submitted - self.completed - self.active, 0)
+            return {
+                "name": self.name,
+                "max_workers": self.max_workers,
+                "active": self.active,
+                "queued": queued,
+                "completed": self.completed,
+                "failed": self.failed,
+                "busy_seconds": self.busy_seconds,
+                "utilization": self.active / self.max_workers if self.max_workers else 0.0
+            }
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+_pools: dict[str, WorkloadExecutor] = {}
+
+
+def configure(sizes: dict):
+    """Creates (or replaces) one pool per workload class, e.g. {"io": 8, "upload": 16, "media": 4}."""
+    for name, size in sizes.items():
+        old = _pools.get(name)
+        _pools[name] = WorkloadExecutor(name, max(int(size), 1))
+        if old is not None:
+            old.shutdown(wait=False)
+        logger.info(f"Executor '{name}' configured with {_pools[name].max_workers} workers.")
+
+
+def get(name: str) -> WorkloadExecutor:
+    return _pools[name]
+
+
+async def run(name: str, func, *args, **kwargs):
+    return await _pools[name].run(func, *args, **kwargs)
+
+
+def snapshot_all() -> list[dict]:
+    return [pool.snapshot() for pool in _pools.values()]
+
+
+def shutdown_all(wait=False):
+    for pool in _pools.values():
+        pool.shutdown(wait=wait)
@@ -0,0 +1,104 @@
+import logging
+import time
+
+from state_store import StateStore
+
+logger = logging.getLogger("YTFBUser.flood_control")
+
+# Verdicts returned by FloodController.check
+ALLOW = "allow"
+THROTTLE = "throttle"  # over the limit: drop this update
+MUTE = "mute"          # just muted: drop it and tell the user once
+MUTED = "muted"        # still muted: drop silently
+
+ACTION_CLASSES = ("callback", "command", "text", "media")
+
+
+def parse_limit(spec: str) -> tuple[float, float]:
+    """'rate/burst' -> (tokens per second, bucket size), e.g. '0.5/5'."""
+    rate, burst = spec.split("/")
+    return float(rate), float(burst)
+
+
+def parse_user_limits(spec: str) -> dict:
+    """'123:media=1/10,123:text=2/20' -> {123: {"media": (1.0, 10.0), "text": (2.0, 20.0)}}."""
+    overrides = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        user_part, limit_part = item.split(":", 1)
+        action_class, limit = limit_part.split("=", 1)
+        overrides.setdefault(int(user_part), {})[action_class.strip()] = parse_limit(limit)
+    return overrides
+
+
+class _UserFlood:
+    __slots__ = ("buckets", "strikes", "muted_until")
+
+    def __init__(self):
+        self.buckets = {}  # action class -> [tokens, last refill]
+        self.strikes = 0
+        self.muted_until = 0.0
+
+
+class FloodController:
+    """Per-user token buckets for each action class, with a temporary mute for repeat offenders."""
+
+    def __init__(self, limits: dict, user_limits=None, mute_seconds=60, strikes_to_mute=5,
+                 max_users=10000, exempt=()):
+        self.limits = dict(limits)
+        self.user_limits = dict(user_limits or {})
+        self.mute_seconds = mute_seconds
+        self.strikes_to_mute = strikes_to_mute
+        self.exempt = set(exempt)
+        # Idle users are forgotten once their buckets would have refilled anyway.
+        self._users = StateStore("flood_control", ttl=max(mute_seconds, 300), maxsize=max_users)
+        self.throttled = 0
+        self.mutes = 0
+
+    def _limit_for(self, user_id, action_class):
+        return self.user_limits.get(user_id, {}).get(action_class) or self.limits.get(action_class)
+
+    def check(self, user_id, action_class, now=None) -> str:
+        if user_id in self.exempt:
+            return ALLOW
+        limit = self._limit_for(user_id, action_class)
+        if limit is None:
+            return ALLOW
+        now = now if now is not None else time.monotonic()
+
+        state = self._users.get(user_id)
+        if state is None:
+            state = self._users[user_id] = _UserFlood()
+        if state.muted_until > now:
+            return MUTED
+
+        rate, burst = limit
+        bucket = state.buckets.get(action_class)
+        if bucket is None:
+            bucket = state.buckets[action_class] = [burst, now]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            state.strikes = 0
+            return ALLOW
+
+        self.throttled += 1
+        state.strikes += 1
+        if state.strikes >= self.strikes_to_mute:
+            state.strikes = 0
+            state.muted_until = now + self.mute_seconds
+            self.mutes += 1
+            logger.warning(f"User {user_id} muted for {self.mute_seconds}s after flooding '{action_class}'.")
+            return MUTE
+        return THROTTLE
+
+    def unmute(self, user_id):
+        state = self._users.get(user_id)
+        if state is not None:
+            state.muted_until = 0.0
+            state.strikes = 0
+
+    async def run(self, interval=60):
+        await self._users.run(interval)
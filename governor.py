@@ -0,0 +1,182 @@
+import asyncio
+import logging
+import os
+import time
+
+import psutil
+
+logger = logging.getLogger("YTFBUser.governor")
+
+# Pressure ratio (worst observed/target) at which limits hold, shrink, or are cut hard.
+RELAX_BELOW = 0.8
+PRESSURE_AT = 1.0
+SEVERE_AT = 1.5
+
+
+class AdaptiveLimiter:
+    """A semaphore whose limit can move between 1 and `max_limit` at runtime.
+
+    Lowering the limit never interrupts holders; new acquirers wait until
+    the active count drops below it.
+    """
+
+    def __init__(self, name, max_limit, resources=()):
+        self.name = name
+        self.max_limit = max(int(max_limit), 1)
+        self.limit = self.max_limit
+        self.resources = tuple(resources)  # which governor readings drive this limiter
+        self.active = 0
+        self.waiting = 0
+        self.observe_wait = None  # optional callable(seconds), e.g. a histogram's observe
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        started = time.perf_counter()
+        async with self._cond:
+            self.waiting += 1
+            try:
+                await self._cond.wait_for(lambda: self.active < self.limit)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+        if self.observe_wait is not None:
+            self.observe_wait(time.perf_counter() - started)
+
+    async def release(self):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    async def __aenter__(self):
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.release()
+
+    async def set_limit(self, limit):
+        limit = min(max(int(limit), 1), self.max_limit)
+        if limit == self.limit:
+            return
+        async with self._cond:
+            self.limit = limit
+            self._cond.notify_all()
+
+    async def set_max(self, max_limit):
+        """Changes the configured ceiling (e.g. from the admin panel) and resets to it."""
+        self.max_limit = max(int(max_limit), 1)
+        async with self._cond:
+            self.limit = self.max_limit
+            self._cond.notify_all()
+
+    def snapshot(self) -> dict:
+        return {"name": self.name, "limit": self.limit, "max": self.max_limit,
+                "active": self.active, "waiting": self.waiting}
+
+
+class ResourceGovernor:
+    """Samples CPU, RSS, disk and network throughput and steers the limiters.
+
+    Each limiter follows only the readings it is sensitive to: a reading over
+    its target halves the limit, one comfortably under it lets the limit grow
+    by one per sample (AIMD). A target of 0 disables that reading.
+    """
+
+    def __init__(self, limiters, cpu_target=85.0, rss_target_bytes=None, disk_target_bps=0, net_target_bps=0,
+                 interval=5.0, ffmpeg_threads=0):
+        if rss_target_bytes is None:
+            rss_target_bytes = int(psutil.virtual_memory().total * 0.7)
+        self.limiters = {limiter.name: limiter for limiter in limiters}
+        self.targets = {"cpu": cpu_target, "rss": rss_target_bytes, "disk": disk_target_bps, "net": net_target_bps}
+        self.interval = interval
+        self.cpu_count = os.cpu_count() or 1
+        self.max_ffmpeg_threads = ffmpeg_threads  # 0 lets ffmpeg pick
+        self.readings = {"cpu": 0.0, "rss": 0, "disk": 0.0, "net": 0.0}
+        self.ratios = {}
+        self.pressure = 0.0
+        self.samples = 0
+        self._process = psutil.Process()
+        self._last_io = None
+
+    # --- Sampling ---
+
+    @staticmethod
+    def _io_totals():
+        disk = psutil.disk_io_counters()
+        net = psutil.net_io_counters()
+        return (
+            time.monotonic(),
+            (disk.read_bytes + disk.write_bytes) if disk else 0,
+            (net.bytes_sent + net.bytes_recv) if net else 0
+        )
+
+    def sample(self) -> dict:
+        """Takes one reading; cpu_percent is measured since the previous call."""
+        self.readings["cpu"] = psutil.cpu_percent(interval=None)
+        rss = self._process.memory_info().rss
+        for child in self._process.children(recursive=True):  # ffmpeg
+            try:
+                rss += child.memory_info().rss
+            except psutil.Error:
+                pass
+        self.readings["rss"] = rss
+
+        now_io = self._io_totals()
+        if self._last_io is not None:
+            elapsed = max(now_io[0] - self._last_io[0], 1e-6)
+            self.readings["disk"] = (now_io[1] - self._last_io[1]) / elapsed
+            self.readings["net"] = (now_io[2] - self._last_io[2]) / elapsed
+        self._last_io = now_io
+
+        self.ratios = {
+            name: self.readings[name] / target
+            for name, target in self.targets.items() if target
+        }
+        self.pressure = max(self.ratios.values(), default=0.0)
+        self.samples += 1
+        return dict(self.readings)
+
+    async def adjust(self):
+        for limiter in self.limiters.values():
+            ratio = max((self.ratios.get(r, 0.0) for r in limiter.resources), default=0.0)
+            if ratio >= PRESSURE_AT:
+                new_limit = limiter.limit // 2
+            elif ratio < RELAX_BELOW:
+                new_limit = limiter.limit + 1
+            else:
+                continue
+            if new_limit != limiter.limit and 1 <= new_limit <= limiter.max_limit:
+                logger.info(f"Governor: {limiter.name} limit {limiter.limit} -> {new_limit} (pressure {ratio:.2f}).")
+            await limiter.set_limit(new_limit)
+
+    async def run(self):
+        psutil.cpu_percent(interval=None)  # prime the CPU counter
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sample()
+            await self.adjust()
+
+    # --- Derived policy ---
+
+    @property
+    def under_pressure(self) -> bool:
+        """True while any reading is over target; cosmetic traffic (progress edits) should pause."""
+        return self.pressure >= PRESSURE_AT
+
+    def ffmpeg_threads(self) -> int:
+        if self.pressure >= SEVERE_AT:
+            return 1
+        if self.pressure >= PRESSURE_AT:
+            # Never above the configured cap; 0 ("let ffmpeg pick") is bounded by the core count.
+            return min(self.max_ffmpeg_threads or self.cpu_count, max(self.cpu_count // 2, 1))
+        return self.max_ffmpeg_threads
+
+    def snapshot(self) -> dict:
+        return {
+            "readings": dict(self.readings),
+            "targets": dict(self.targets),
+            "pressure": self.pressure,
+            "under_pressure": self.under_pressure,
+            "ffmpeg_threads": self.ffmpeg_threads(),
+            "limiters": [limiter.snapshot() for limiter in self.limiters.values()],
+        }
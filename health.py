@@ -0,0 +1,148 @@
+import asyncio
+import logging
+import time
+
+logger = logging.getLogger("YTFBUser.health")
+
+
+class PhaseResult:
+    __slots__ = ("name", "status", "seconds", "error")
+
+    def __init__(self, name, status, seconds, error=None):
+        self.name = name
+        self.status = status  # "ok", "failed" or "timeout"
+        self.seconds = seconds
+        self.error = error
+
+    def as_dict(self) -> dict:
+        return {"phase": self.name, "status": self.status, "seconds": round(self.seconds, 3), "error": self.error}
+
+
+class Health:
+    """Startup phase timings plus liveness and readiness, served by the HTTP routes on the bot's loop.
+
+    Liveness means the event loop is still turning (a heartbeat task keeps
+    stamping it). Readiness means every required dependency passed its last
+    probe; until `startup_complete` it is always false.
+    """
+
+    def __init__(self, required=("telegram", "mongo"), vital=("telegram",), heartbeat_interval=5.0):
+        self.required = tuple(required)
+        self.vital = tuple(vital)  # down after startup means a restart is warranted
+        self.heartbeat_interval = heartbeat_interval
+        self.phases = []
+        self.components = {}  # name -> (ok, detail, checked_at)
+        self.started_at = time.monotonic()
+        self.startup_seconds = None
+        self._last_beat = time.monotonic()
+        self.startup_complete = asyncio.Event()
+
+    # --- Startup phases ---
+
+    async def phase(self, name, coro, timeout):
+        """Awaits `coro` under a timeout and records how long it took. Re-raises failures."""
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(coro, timeout=timeout)
+        except asyncio.TimeoutError:
+            self._record(PhaseResult(name, "timeout", time.perf_counter() - started, f"exceeded {timeout}s"))
+            raise
+        except Exception as e:
+            self._record(PhaseResult(name, "failed", time.perf_counter() - started, str(e)))
+            raise
+        self._record(PhaseResult(name, "ok", time.perf_counter() - started))
+        return result
+
+    def _record(self, result):
+        self.phases.append(result)
+        log = logger.info if result.status == "ok" else logger.warning
+        log(f"Startup phase '{result.name}' {result.status} in {result.seconds:.2f}s"
+            + (f": {result.error}" if result.error else ""))
+
+    def mark_started(self):
+        self.startup_seconds = time.monotonic() - self.started_at
+        self.startup_complete.set()
+        slowest = sorted(self.phases, key=lambda p: p.seconds, reverse=True)[:3]
+        logger.info(f"Startup finished in {self.startup_seconds:.2f}s; slowest phases: "
+                    + ", ".join(f"{p.name} {p.seconds:.2f}s" for p in slowest))
+
+    # --- Liveness ---
+
+    def beat(self):
+        self._last_beat = time.monotonic()
+
+    def is_live(self) -> bool:
+        return time.monotonic() - self._last_beat < self.heartbeat_interval * 3
+
+    def is_healthy(self) -> bool:
+        """Liveness for the orchestrator: the loop turns and no vital dependency is down."""
+        if not self.is_live():
+            return False
+        if not self.startup_complete.is_set():
+            return True
+        return all(self.components.get(name, (True,))[0] for name in self.vital)
+
+    async def run_heartbeat(self):
+        while True:
+            self.beat()
+            await asyncio.sleep(self.heartbeat_interval)
+
+    # --- Readiness ---
+
+    def set_component(self, name, ok, detail=None):
+        previous = self.components.get(name)
+        self.components[name] = (ok, detail, time.time())
+        if previous is not None and previous[0] != ok:
+            log = logger.info if ok else logger.warning
+            log(f"Dependency '{name}' is now {'up' if ok else 'down'}" + (f": {detail}" if detail else ""))
+
+    def is_ready(self) -> bool:
+        if not self.startup_complete.is_set():
+            return False
+        return all(self.components.get(name, (False,))[0] for name in self.required)
+
+    async def run_probes(self, probes, interval=15.0, timeout=5.0):
+        """Re-checks each dependency; `probes` maps a component name to an async callable."""
+        while True:
+            await asyncio.sleep(interval)
+            for name, probe in probes.items():
+                try:
+                    await asyncio.wait_for(probe(), timeout=timeout)
+                    self.set_component(name, True)
+                except Exception as e:
+                    self.set_component(name, False, str(e) or type(e).__name__)
+
+    def snapshot(self) -> dict:
+        return {
+            "live": self.is_live(),
+            "healthy": self.is_healthy(),
+            "ready": self.is_ready(),
+            "startup_seconds": self.startup_seconds,
+            "components": {
+                name: {"ok": ok, "detail": detail, "checked_at": checked_at}
+                for name, (ok, detail, checked_at) in self.components.items()
+            },
+            "phases": [p.as_dict() for p in self.phases],
+        }
+
+
+class HealthCollector:
+    """Prometheus collector exposing liveness, readiness, dependencies and startup phases."""
+
+    def __init__(self, health):
+        self.health = health
+
+    def collect(self):
+        from prometheus_client.core import GaugeMetricFamily
+
+        snapshot = self.health.snapshot()
+        yield GaugeMetricFamily("bot_live", "1 while the event loop heartbeat is fresh", value=int(snapshot["live"]))
+        yield GaugeMetricFamily("bot_ready", "1 while every required dependency is up", value=int(snapshot["ready"]))
+        deps = GaugeMetricFamily("bot_dependency_up", "Result of the last dependency probe", labels=["component"])
+        for name, component in snapshot["components"].items():
+            deps.add_metric([name], int(component["ok"]))
+        yield deps
+        phases = GaugeMetricFamily("bot_startup_phase_seconds", "Duration of each startup phase", labels=["phase", "status"])
+        for phase in snapshot["phases"]:
+            phases.add_metric([phase["phase"], phase["status"]], phase["seconds"])
+        yield phases
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from urllib.parse import parse_qs, urlsplit
+
+logger = logging.getLogger("YTFBUser.http_server")
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+            408: "Request Timeout", 413: "Payload Too Large", 500: "Internal Server Error",
+            503: "Service Unavailable"}
+
+
+class Request:
+    __slots__ = ("method", "path", "query", "headers")
+
+    def __init__(self, method, path, query, headers):
+        self.method = method
+        self.path = path
+        self.query = query
+        self.headers = headers
+
+    def arg(self, name, default=None):
+        values = self.query.get(name)
+        return values[0] if values else default
+
+
+class Response:
+    __slots__ = ("status", "body", "content_type")
+
+    def __init__(self, body=b"", status=200, content_type="text/plain; charset=utf-8"):
+        self.status = status
+        self.body = body.encode("utf-8") if isinstance(body, str) else body
+        self.content_type = content_type
+
+
+class HttpServer:
+    """A small GET-only HTTP/1.1 server running on the bot's event loop.
+
+    Every connection is its own task and must deliver its request head within
+    `read_timeout`, so a slow client cannot hold up health checks.
+    """
+
+    def __init__(self, host, port, read_timeout=10.0, max_head_bytes=16 * 1024):
+        self.host = host
+        self.port = port
+        self.read_timeout = read_timeout
+        self.max_head_bytes = max_head_bytes
+        self._routes = {}
+        self._server = None
+
+    def route(self, path):
+        def decorator(handler):
+            self._routes[path] = handler
+            return handler
+        return decorator
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._handle, self.host, self.port, limit=self.max_head_bytes
+        )
+        logger.info(f"HTTP server listening on {self.host}:{self.port}.")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _read_request(self, reader):
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=self.read_timeout)
+        lines = head.decode("latin-1").split("\r\n")
+        method, target, _ = lines[0].split(" ", 2)
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+        url = urlsplit(target)
+        return Request(method.upper(), url.path or "/", parse_qs(url.query), headers)
+
+    async def _dispatch(self, request):
+        if request.method not in ("GET", "HEAD"):
+            return Response("Method not allowed", status=405)
+        handler = self._routes.get(request.path) or self._routes.get("*")
+        if handler is None:
+            return Response("Not found", status=404)
+        try:
+            return await handler(request)
+        except Exception:
+            logger.exception(f"HTTP handler for {request.path} failed")
+            return Response("Internal server error", status=500)
+
+    async def _handle(self, reader, writer):
+        request = None
+        try:
+            try:
+                request = await self._read_request(reader)
+                response = await self._dispatch(request)
+            except asyncio.TimeoutError:
+                response = Response("Request timeout", status=408)
+            except asyncio.LimitOverrunError:
+                response = Response("Request head too large", status=413)
+            except (asyncio.IncompleteReadError, ValueError):
+                response = Response("Bad request", status=400)
+
+            head = (
+                f"HTTP/1.1 {response.status} {_REASONS.get(response.status, '')}\r\n"
+                f"Content-Type: {response.content_type}\r\n"
+                f"Content-Length: {len(response.body)}\r\n"
+                "Connection: close\r\n\r\n"
+            ).encode("latin-1")
+            writer.write(head if request is not None and request.method == "HEAD" else head + response.body)
+            await asyncio.wait_for(writer.drain(), timeout=self.read_timeout)
+        except (ConnectionError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except (ConnectionError, OSError):
+                pass
@@ -0,0 +1,132 @@
+import asyncio
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+from datetime import datetime, timezone
+
+logger = logging.getLogger("YTFBUser.log_pipeline")
+
+TELEGRAM_MESSAGE_LIMIT = 4096
+
+# LogRecord attributes that are not user-supplied `extra=` fields.
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "taskName"}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; `extra=` fields are carried through as top-level keys."""
+
+    def format(self, record):
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+            "thread": record.threadName,
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def setup_logging(path="bot.log", max_bytes=10 * 1024 * 1024, backup_count=5, level=logging.INFO, json_file=True):
+    """Routes all records through a queue so handlers never block the event loop.
+
+    The caller's thread only enqueues; a QueueListener thread writes to stdout
+    and to a size-rotated file. Returns the listener (already started, stopped at exit).
+    """
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    file_handler = logging.handlers.RotatingFileHandler(
+        path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8", delay=True
+    )
+    file_handler.setFormatter(
+        JsonFormatter() if json_file else logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    )
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers.clear()
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(log_queue, console, file_handler, respect_handler_level=True)
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
+
+
+def _chunks(entries, limit=TELEGRAM_MESSAGE_LIMIT, header=""):
+    """Packs entries into as few messages as fit under Telegram's length limit."""
+    current = header
+    for entry in entries:
+        entry = entry[:limit - len(header) - 2]
+        candidate = f"{current}\n\n{entry}" if current else entry
+        if len(candidate) > limit:
+            yield current
+            current = f"{header}\n\n{entry}" if header else entry
+        else:
+            current = candidate
+    if current and current != header:
+        yield current
+
+
+class LogChannelDigest:
+    """Batches log-channel events into periodic digest messages.
+
+    `post(text)` only appends to a buffer; `run()` flushes every `interval`
+    seconds, or sooner once `max_items` are waiting. `post(text, urgent=True)`
+    (errors) is sent straight away.
+    """
+
+    def __init__(self, send, interval=60, max_items=50):
+        self.send = send  # async callable(text)
+        self.interval = interval
+        self.max_items = max_items
+        self._pending = []
+        self._wake = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self.posted = 0
+        self.messages_sent = 0
+
+    async def post(self, text, urgent=False):
+        self.posted += 1
+        if urgent:
+            await self._send(text)
+            return
+        self._pending.append(f"`{datetime.now(timezone.utc).strftime('%H:%M:%S')}` {text}")
+        if len(self._pending) >= self.max_items:
+            self._wake.set()
+
+    async def _send(self, text):
+        try:
+            await self.send(text)
+            self.messages_sent += 1
+        except Exception as e:
+            logger.error(f"Failed to deliver log-channel message: {e}")
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, []
+            header = f"🧾 **Activity digest** ({len(batch)} event{'s' if len(batch) != 1 else ''})"
+            for message in _chunks(batch, header=header):
+                await self._send(message)
+            return len(batch)
+
+    async def run(self):
+        """Periodic flusher; cancel it and call flush() once more on shutdown."""
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
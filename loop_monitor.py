@@ -0,0 +1,227 @@
+import asyncio
+import collections
+import logging
+import os
+import re
+import sys
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+logger = logging.getLogger("YTFBUser.loop_monitor")
+
+# asyncio's debug-mode warning: "Executing <Task ... name='Task-7' coro=<handler() ...>> took 0.312 seconds"
+_SLOW_CALLBACK_RE = re.compile(r"^Executing (?P<handle>.*) took (?P<seconds>[\d.]+) seconds")
+_TASK_NAME_RE = re.compile(r"name='([^']+)'")
+_CORO_RE = re.compile(r"coro=<([\w.<>]+)\(")
+_CALLBACK_RE = re.compile(r"<(?:Timer)?Handle ([\w.<>]+)\(")
+
+
+class Stall:
+    __slots__ = ("seconds", "culprit", "handler", "stack", "at")
+
+    def __init__(self, seconds, culprit, handler, stack):
+        self.seconds = seconds
+        self.culprit = culprit  # "file.py:function" of the innermost project frame
+        self.handler = handler  # handler/task label the loop was running, if known
+        self.stack = stack
+        self.at = time.time()
+
+    def as_dict(self) -> dict:
+        return {"seconds": round(self.seconds, 3), "culprit": self.culprit, "handler": self.handler, "at": self.at}
+
+
+class _SlowCallbackHandler(logging.Handler):
+    """Turns asyncio's debug-mode slow-callback warnings into attributed reports."""
+
+    def __init__(self, monitor):
+        super().__init__(logging.WARNING)
+        self.monitor = monitor
+
+    def emit(self, record):
+        try:
+            match = _SLOW_CALLBACK_RE.match(record.getMessage())
+        except Exception:
+            return
+        if match:
+            self.monitor._slow_callback(match.group("handle"), float(match.group("seconds")))
+
+
+class LoopMonitor:
+    """Measures event-loop lag and catches whatever is blocking the loop.
+
+    A sampler task sleeps for `interval` and records how late it woke up. A
+    watchdog thread notices when the sampler has not woken for `threshold`
+    seconds and grabs the loop thread's stack while the blocking call is
+    still on it. Handlers wrapped with `attribute()` are named in reports.
+    """
+
+    def __init__(self, interval=0.25, threshold=0.5, alert_cooldown=300.0, debug=False, project_root=None,
+                 history=50):
+        self.interval = interval
+        self.threshold = threshold
+        self.alert_cooldown = alert_cooldown
+        self.debug = debug
+        self.project_root = os.path.abspath(project_root or os.path.dirname(os.path.abspath(__file__)))
+        self.observe_lag = None  # callable(seconds)
+        self.on_stall = None  # callable(Stall, alert: bool), called on the loop
+        self.on_slow_callback = None  # callable(label, seconds), debug mode only
+        self.max_lag = 0.0
+        self.last_lag = 0.0
+        self.stall_count = 0
+        self.recent = collections.deque(maxlen=history)
+        self._labels = {}  # asyncio task name -> handler label
+        # Labels of handlers that just returned: asyncio reports a slow step only after it ends.
+        self._finished_labels = collections.OrderedDict()
+        self._last_alert = {}
+        self._last_tick = time.monotonic()
+        self._pending = None  # (tick, culprit, handler, stack) captured by the watchdog
+        self._loop = None
+        self._loop_thread_id = None
+        self._stop = threading.Event()
+        self._debug_handler = None
+
+    # --- Attribution ---
+
+    @contextmanager
+    def attribute(self, label):
+        """Labels the current task as `label` for stall and slow-callback reports."""
+        task = asyncio.current_task()
+        name = task.get_name() if task is not None else None
+        previous = self._labels.get(name)
+        if name is not None:
+            self._labels[name] = label
+        try:
+            yield
+        finally:
+            if name is not None:
+                if previous is None:
+                    self._labels.pop(name, None)
+                else:
+                    self._labels[name] = previous
+                self._finished_labels[name] = label
+                self._finished_labels.move_to_end(name)
+                if len(self._finished_labels) > 256:
+                    self._finished_labels.popitem(last=False)
+
+    def _label_for_task(self, task_name):
+        if not task_name:
+            return None
+        return self._labels.get(task_name) or self._finished_labels.get(task_name)
+
+    def _culprit(self, frames):
+        """The innermost frame in the bot's own code, else the innermost frame at all."""
+        own = [f for f in frames if f.filename.startswith(self.project_root) and not f.filename.endswith("loop_monitor.py")]
+        candidates = own or frames
+        if not candidates:
+            return "unknown"
+        frame = candidates[-1]
+        return f"{os.path.basename(frame.filename)}:{frame.name}"
+
+    # --- Watchdog thread ---
+
+    def _watch(self):
+        poll = max(min(self.threshold / 4, 0.25), 0.01)
+        while not self._stop.wait(poll):
+            tick = self._last_tick
+            blocked_for = time.monotonic() - tick - self.interval
+            if blocked_for < self.threshold or self._pending is not None:
+                continue
+            frame = sys._current_frames().get(self._loop_thread_id)
+            if frame is None:
+                continue
+            frames = traceback.extract_stack(frame)
+            task = None
+            try:
+                task = asyncio.current_task(self._loop)
+            except RuntimeError:
+                pass
+            handler = self._label_for_task(task.get_name()) if task is not None else None
+            if handler is None and task is not None:
+                handler = task.get_name()
+            self._pending = (tick, self._culprit(frames), handler, "".join(traceback.format_list(frames)))
+
+    # --- Sampler ---
+
+    async def run(self):
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        if self.debug:
+            self.enable_debug()
+        self._last_tick = time.monotonic()
+        self._stop.clear()
+        watchdog = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        watchdog.start()
+        try:
+            while True:
+                started = self._last_tick
+                await asyncio.sleep(self.interval)
+                now = time.monotonic()
+                self._last_tick = now
+                self._record_lag(max(now - started - self.interval, 0.0), started)
+        finally:
+            self._stop.set()
+            if self.debug:
+                self.disable_debug()
+
+    def _record_lag(self, lag, tick):
+        self.last_lag = lag
+        self.max_lag = max(self.max_lag, lag)
+        if self.observe_lag is not None:
+            self.observe_lag(lag)
+        pending, self._pending = self._pending, None
+        if lag < self.threshold:
+            return
+        if pending is None or pending[0] != tick:  # the watchdog missed it or caught an earlier stall
+            pending = (tick, "unknown", None, "")
+        _, culprit, handler, stack = pending
+        stall = Stall(lag, culprit, handler, stack)
+        self.stall_count += 1
+        self.recent.append(stall)
+        logger.warning(f"Event loop blocked for {lag:.3f}s in {culprit}"
+                       + (f" (handler {handler})" if handler else "")
+                       + (f"\n{stack}" if stack else ""))
+        now = time.monotonic()
+        alert = now - self._last_alert.get(culprit, float("-inf")) >= self.alert_cooldown
+        if alert:
+            self._last_alert[culprit] = now
+        if self.on_stall is not None:
+            self.on_stall(stall, alert)
+
+    # --- asyncio debug mode ---
+
+    def enable_debug(self):
+        """Turns on asyncio's slow-callback logging with handler attribution. Costly; opt-in only."""
+        loop = self._loop or asyncio.get_running_loop()
+        loop.set_debug(True)
+        loop.slow_callback_duration = self.threshold
+        if self._debug_handler is None:
+            self._debug_handler = _SlowCallbackHandler(self)
+            logging.getLogger("asyncio").addHandler(self._debug_handler)
+        logger.info(f"asyncio debug mode on; callbacks over {self.threshold}s are reported.")
+
+    def disable_debug(self):
+        if self._loop is not None:
+            self._loop.set_debug(False)
+        if self._debug_handler is not None:
+            logging.getLogger("asyncio").removeHandler(self._debug_handler)
+            self._debug_handler = None
+
+    def _slow_callback(self, handle, seconds):
+        task_name = _TASK_NAME_RE.search(handle)
+        label = self._label_for_task(task_name.group(1)) if task_name else None
+        if label is None:
+            match = _CORO_RE.search(handle) or _CALLBACK_RE.search(handle)
+            label = match.group(1) if match else "unknown"
+        if self.on_slow_callback is not None:
+            self.on_slow_callback(label, seconds)
+
+    def snapshot(self) -> dict:
+        return {
+            "last_lag": self.last_lag,
+            "max_lag": self.max_lag,
+            "stalls": self.stall_count,
+            "debug": self.debug,
+            "recent": [stall.as_dict() for stall in list(self.recent)[-5:]],
+        }
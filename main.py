@@ -6,16 +6,15 @@ import logging
 import subprocess
 import json
 from datetime import datetime, timedelta, timezone
-from http.server import HTTPServer, BaseHTTPRequestHandler
 import signal
 from functools import wraps, partial
 import re
 import time
-import requests
 import random
 import string
-from urllib.parse import urlparse, parse_qs
-from collections import defaultdict
+from urllib.parse import urlencode
+import html
+import io
 
 
 # Load environment variables
@@ -23,49 +22,59 @@ from dotenv import load_dotenv
 load_dotenv()
 
 # MongoDB
-from pymongo import MongoClient, DESCENDING
 from pymongo.errors import OperationFailure
-from bson import ObjectId
 
 
 # Pyrogram (Telegram Bot)
 from pyrogram import Client, filters, enums, idle, types
 from pyrogram.errors import UserNotParticipant, FloodWait, UserIsBlocked, PeerIdInvalid
 from pyrogram.types import (
-    ReplyKeyboardMarkup,
-    KeyboardButton,
     InlineKeyboardMarkup,
     InlineKeyboardButton,
     ReplyKeyboardRemove
 )
 
-# Google/YouTube Client
-from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
-from google.oauth2.credentials import Credentials
-from google.auth.transport.requests import Request
-from google.auth.exceptions import RefreshError
+# Google API client and requests are imported on first use (see platform_sdks.py)
+import platform_sdks
 
 # System Utilities
 import psutil
 
+from stats_service import StatsService
+from rollups import DailyRollups
+from repository import Repository
+import executors
+from write_behind import ActivityBuffer
+from entitlements import EntitlementCache, PremiumSweeper
+from session_cache import UserSessionCache
+import migrations
+from state_store import StateStore, MessageRef
+import flood_control
+from router import Router
+import rendering
+from rendering import to_bold_sans, render, DEFAULT_LANGUAGE
+import log_pipeline
+from staging import StagingArea, StagingFull
+from governor import AdaptiveLimiter, ResourceGovernor
+from health import Health, HealthCollector
+from http_server import HttpServer, Response
+from loop_monitor import LoopMonitor
+import profiling
+from tracing import JobTracer
+import metrics
+
 # --- Enhanced YouTube Authentication ---
-oauth_flows = {}
 oauth_tokens = {}
 
-# Set up logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(sys.stdout),
-        logging.FileHandler("bot.log")
-    ]
-)
 logger = logging.getLogger("YTFBUser")
 
-# === Load and Validate Environment Variables ===
+# === Load Environment Variables ===
+# Optional settings are read here with their defaults; required credentials are
+# validated, and the client built, by create_app().
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "5"))
+LOG_JSON = os.getenv("LOG_JSON", "true").lower() == "true"
 API_ID_STR = os.getenv("TELEGRAM_API_ID")
 API_HASH = os.getenv("TELEGRAM_API_HASH")
 BOT_TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
@@ -74,17 +83,78 @@ MONGO_URI = os.getenv("MONGO_DB")
 ADMIN_ID_STR = os.getenv("ADMIN_ID")
 REDIRECT_URI = os.getenv("REDIRECT_URI", "https://absent-dulcea-primeyour-bcdf24ed.koyeb.app/")
 PORT_STR = os.getenv("PORT", "8080")
+# Platform endpoints; overridden only to point at local stand-ins (see benchmarks/load_test.py)
+FB_GRAPH_URL = os.getenv("FB_GRAPH_URL", "https://graph.facebook.com").rstrip("/")
+FB_GRAPH_VIDEO_URL = os.getenv("FB_GRAPH_VIDEO_URL", "https://graph-video.facebook.com").rstrip("/")
+YOUTUBE_API_ENDPOINT = os.getenv("YOUTUBE_API_ENDPOINT")
+YOUTUBE_CLIENT_OPTIONS = {"api_endpoint": YOUTUBE_API_ENDPOINT} if YOUTUBE_API_ENDPOINT else None
+STATS_CACHE_TTL = int(os.getenv("STATS_CACHE_TTL", "60"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "50"))
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "0"))
+MONGO_MAX_IDLE_MS = int(os.getenv("MONGO_MAX_IDLE_MS", "60000"))
+ACTIVITY_FLUSH_INTERVAL = int(os.getenv("ACTIVITY_FLUSH_INTERVAL", "15"))
+ACTIVITY_MAX_PENDING = int(os.getenv("ACTIVITY_MAX_PENDING", "5000"))
+ENTITLEMENT_CACHE_SIZE = int(os.getenv("ENTITLEMENT_CACHE_SIZE", "10000"))
+PREMIUM_SWEEP_INTERVAL = int(os.getenv("PREMIUM_SWEEP_INTERVAL", "300"))
+PREMIUM_REMINDER_HOURS = int(os.getenv("PREMIUM_REMINDER_HOURS", "24"))
+PREMIUM_REMINDER_BATCH = int(os.getenv("PREMIUM_REMINDER_BATCH", "20"))
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "300"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "5000"))
+MONGO_PROFILE_SLOW_MS = int(os.getenv("MONGO_PROFILE_SLOW_MS", "0"))  # 0 leaves the profiler off
+
+# Conversation state bounds (see state_store.py)
+STATE_TTL = int(os.getenv("STATE_TTL", "1800"))
+STATE_MAX_ENTRIES = int(os.getenv("STATE_MAX_ENTRIES", "10000"))
+OAUTH_FLOW_TTL = int(os.getenv("OAUTH_FLOW_TTL", "900"))
+LOCK_IDLE_TTL = int(os.getenv("LOCK_IDLE_TTL", "3600"))
+STATE_SWEEP_INTERVAL = int(os.getenv("STATE_SWEEP_INTERVAL", "60"))
+STATE_PERSISTENCE = os.getenv("STATE_PERSISTENCE", "false").lower() == "true"
+STAGING_DIR = os.getenv("STAGING_DIR", "staging")
+STAGING_SMALL_DIR = os.getenv("STAGING_SMALL_DIR")  # e.g. a tmpfs mount for thumbnails and photos
+STAGING_SMALL_MAX_MB = int(os.getenv("STAGING_SMALL_MAX_MB", "5"))
+STAGING_MIN_FREE_MB = int(os.getenv("STAGING_MIN_FREE_MB", "1024"))
+STAGING_SIZE_FACTOR = float(os.getenv("STAGING_SIZE_FACTOR", "2.5"))
+STAGING_ORPHAN_HOURS = float(os.getenv("STAGING_ORPHAN_HOURS", "6"))
+STAGING_SWEEP_INTERVAL = int(os.getenv("STAGING_SWEEP_INTERVAL", "900"))
+MAX_CONCURRENT_DOWNLOADS = int(os.getenv("MAX_CONCURRENT_DOWNLOADS", "4"))
+MAX_CONCURRENT_TRANSCODES = int(os.getenv("MAX_CONCURRENT_TRANSCODES", str(max((os.cpu_count() or 1) // 2, 1))))
+GOVERNOR_INTERVAL = float(os.getenv("GOVERNOR_INTERVAL", "5"))
+GOVERNOR_CPU_TARGET = float(os.getenv("GOVERNOR_CPU_TARGET", "85"))
+GOVERNOR_RSS_TARGET_MB = int(os.getenv("GOVERNOR_RSS_TARGET_MB", "0"))  # 0 means 70% of system memory
+GOVERNOR_DISK_TARGET_MBPS = float(os.getenv("GOVERNOR_DISK_TARGET_MBPS", "0"))  # 0 disables the target
+GOVERNOR_NET_TARGET_MBPS = float(os.getenv("GOVERNOR_NET_TARGET_MBPS", "0"))
+FFMPEG_THREADS = int(os.getenv("FFMPEG_THREADS", "0"))  # 0 lets ffmpeg decide
+STARTUP_STEP_TIMEOUT = float(os.getenv("STARTUP_STEP_TIMEOUT", "20"))
+STARTUP_TELEGRAM_TIMEOUT = float(os.getenv("STARTUP_TELEGRAM_TIMEOUT", "60"))
+STARTUP_MIGRATION_TIMEOUT = float(os.getenv("STARTUP_MIGRATION_TIMEOUT", "120"))
+HEALTH_PROBE_INTERVAL = float(os.getenv("HEALTH_PROBE_INTERVAL", "15"))
+LOOP_SAMPLE_INTERVAL = float(os.getenv("LOOP_SAMPLE_INTERVAL", "0.25"))
+LOOP_STALL_THRESHOLD = float(os.getenv("LOOP_STALL_THRESHOLD", "0.5"))
+LOOP_ALERT_COOLDOWN = int(os.getenv("LOOP_ALERT_COOLDOWN", "300"))
+PROFILE_MAX_SECONDS = int(os.getenv("PROFILE_MAX_SECONDS", "120"))
+LOOP_DEBUG = os.getenv("LOOP_DEBUG", "false").lower() == "true"  # asyncio debug mode; noticeably slower
+LOG_DIGEST_INTERVAL = int(os.getenv("LOG_DIGEST_INTERVAL", "60"))
+LOG_DIGEST_MAX_ITEMS = int(os.getenv("LOG_DIGEST_MAX_ITEMS", "50"))
+
+# Flood protection: "rate/burst" token buckets per action class (see flood_control.py)
+FLOOD_LIMITS = {
+    action_class: flood_control.parse_limit(os.getenv(f"FLOOD_{action_class.upper()}_LIMIT", default))
+    for action_class, default in (("callback", "1/10"), ("command", "0.5/5"), ("text", "1/10"), ("media", "0.2/5"))
+}
+FLOOD_USER_LIMITS = flood_control.parse_user_limits(os.getenv("FLOOD_USER_LIMITS", ""))
+FLOOD_MUTE_SECONDS = int(os.getenv("FLOOD_MUTE_SECONDS", "60"))
+FLOOD_STRIKES_TO_MUTE = int(os.getenv("FLOOD_STRIKES_TO_MUTE", "5"))
 
+# Dedicated thread pools per workload class (see executors.py)
+EXECUTOR_IO_WORKERS = int(os.getenv("EXECUTOR_IO_WORKERS", "8"))
+EXECUTOR_UPLOAD_WORKERS = int(os.getenv("EXECUTOR_UPLOAD_WORKERS", "16"))
+EXECUTOR_MEDIA_WORKERS = int(os.getenv("EXECUTOR_MEDIA_WORKERS", str(max(os.cpu_count() or 1, 2))))
 
-# Validate required environment variables
-if not all([API_ID_STR, API_HASH, BOT_TOKEN, ADMIN_ID_STR, MONGO_URI]):
-    logger.critical("FATAL ERROR: One or more required environment variables are missing.")
-    sys.exit(1)
 
-# Convert to correct types after validation
-API_ID = int(API_ID_STR)
-ADMIN_ID = int(ADMIN_ID_STR)
-LOG_CHANNEL = int(LOG_CHANNEL_STR) if LOG_CHANNEL_STR else None
+# Set by create_app() once the required variables are validated
+API_ID = 0
+ADMIN_ID = 0
+LOG_CHANNEL = None
 PORT = int(PORT_STR)
 
 # === Advanced Video Processing Helpers ===
@@ -102,12 +172,12 @@ def get_video_metadata(file_path: str) -> dict:
         logger.error(f"Could not probe file '{file_path}': {e}")
         return {}
 
-def generate_thumbnail(video_path: str, output_path: str) -> str | None:
+def generate_thumbnail(video_path: str, output_path: str, threads: int = 0) -> str | None:
     """Intelligently generates a thumbnail."""
     try:
         logger.info(f"Generating intelligent thumbnail for {video_path}...")
         ffmpeg_command = [
-            'ffmpeg', '-i', video_path,
+            'ffmpeg', '-threads', str(threads), '-i', video_path,
             '-vf', "select='gt(scene,0.4)',scale=1280:-1",
             '-frames:v', '1', '-q:v', '2',
             output_path, '-y'
@@ -119,7 +189,7 @@ def generate_thumbnail(video_path: str, output_path: str) -> str | None:
         logger.error(f"Thumbnail generation failed: {e}. Falling back to a random frame.")
         try:
             fallback_command = [
-                'ffmpeg', '-i', video_path, '-ss', str(random.randint(1, 29)),
+                'ffmpeg', '-threads', str(threads), '-i', video_path, '-ss', str(random.randint(1, 29)),
                 '-vframes', '1', '-q:v', '2', output_path, '-y'
             ]
             subprocess.run(fallback_command, check=True, capture_output=True, text=True)
@@ -154,10 +224,11 @@ def needs_conversion(input_file: str) -> bool:
 
 # ഈ ഫംഗ്ഷൻ നിങ്ങളുടെ കോഡിൽ പൂർണ്ണമായി റീപ്ലേസ് ചെയ്യുക
 
-async def process_video_for_upload(app, status_msg, original_media_msg, input_file: str, output_file: str) -> str:
+async def process_video_for_upload(app, status_msg, original_media_msg, input_file: str, output_file: str, span=None) -> str:
     """
     Intelligently converts a video. It stream-copies compatible tracks 
     and only re-encodes what is necessary, while showing progress and including a timeout.
+    `span`, when given, receives the codecs and conversion mode.
     """
     # --- PROGRESS BAR STYLE ---
     # You can change these characters to customize the progress bar
@@ -166,12 +237,15 @@ async def process_video_for_upload(app, status_msg, original_media_msg, input_fi
     # Other options: filled_char='■', empty_char='□'  or  filled_char='▓', empty_char='░'
     # -------------------------
 
-    metadata = get_video_metadata(input_file)
+    metadata = await executors.run("media", get_video_metadata, input_file)
     total_duration_str = metadata.get("format", {}).get("duration", "0")
     total_duration_secs = float(total_duration_str)
     
     v_codec = next((s.get('codec_name') for s in metadata.get('streams', []) if s.get('codec_type') == 'video'), None)
     a_codec = next((s.get('codec_name') for s in metadata.get('streams', []) if s.get('codec_type') == 'audio'), None)
+    transcode_mode = "copy" if v_codec == 'h264' and a_codec == 'aac' else "reencode"
+    if span is not None:
+        span.set(video_codec=v_codec, audio_codec=a_codec, mode=transcode_mode, duration=total_duration_secs)
 
     # --- Smart Command Building ---
     command = ['ffmpeg', '-y', '-i', input_file]
@@ -184,7 +258,7 @@ async def process_video_for_upload(app, status_msg, original_media_msg, input_fi
         command.extend(['-c:v', 'copy'])
     else:
         logger.warning(f"Video stream '{v_codec}' is not h264. Re-encoding.")
-        command.extend(['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23'])
+        command.extend(['-c:v', 'libx264', '-preset', 'ultrafast', '-crf', '23', '-threads', str(governor.ffmpeg_threads())])
         processing_actions.append(f"Converting Video (`{v_codec}` to `h264`)")
 
     # Audio stream handling
@@ -212,6 +286,7 @@ async def process_video_for_upload(app, status_msg, original_media_msg, input_fi
     )
     status_msg = await safe_threaded_reply(original_media_msg, initial_text, status_message=status_msg)
     
+    transcode_started = time.perf_counter()
     process = await asyncio.create_subprocess_exec(
         *command,
         stdout=asyncio.subprocess.PIPE,
@@ -234,7 +309,7 @@ async def process_video_for_upload(app, status_msg, original_media_msg, input_fi
                     if total_duration_secs > 0:
                         percentage = min((current_secs / total_duration_secs) * 100, 100)
                         nonlocal status_msg
-                        if time.time() - last_update_time > 5 or percentage >= 99:
+                        if (time.time() - last_update_time > 5 and not governor.under_pressure) or percentage >= 99:
                             last_update_time = time.time()
                             filled_len = int(percentage / 5)
                             empty_len = 20 - filled_len
@@ -254,14 +329,19 @@ async def process_video_for_upload(app, status_msg, original_media_msg, input_fi
         try: process.kill()
         except ProcessLookupError: pass
         await process.wait()
+        metrics.TRANSCODE_SECONDS.labels(transcode_mode, "timeout").observe(time.perf_counter() - transcode_started)
         raise ValueError("Video processing took too long (over 30 minutes) and was cancelled.")
         
     if process.returncode != 0:
+        metrics.TRANSCODE_SECONDS.labels(transcode_mode, "error").observe(time.perf_counter() - transcode_started)
         stderr_output = (await process.stderr.read()).decode('utf-8', errors='ignore')
         logger.error(f"ffmpeg processing failed. Error: {stderr_output}")
         raise ValueError("Video processing failed.")
+    metrics.TRANSCODE_SECONDS.labels(transcode_mode, "ok").observe(time.perf_counter() - transcode_started)
         
     final_size_mb = os.path.getsize(output_file) / (1024*1024)
+    if span is not None:
+        span.set(output_size=os.path.getsize(output_file))
     final_text = (
         f"✅ {to_bold_sans('Processing Complete!')}\n\n"
         f"**Final Size**: `{final_size_mb:.2f} MB`"
@@ -288,18 +368,69 @@ DEFAULT_GLOBAL_SETTINGS = {
 }
 
 # --- Global State & DB Management ---
-mongo = None
-db = None
+repo = None
 global_settings = {}
-upload_semaphore = None
-user_upload_locks = {}
+# Concurrency for each stage of the pipeline; the governor moves these limits with system load.
+download_limiter = AdaptiveLimiter("downloads", MAX_CONCURRENT_DOWNLOADS, resources=("net", "disk", "rss"))
+transcode_limiter = AdaptiveLimiter("transcodes", MAX_CONCURRENT_TRANSCODES, resources=("cpu", "rss"))
+upload_limiter = AdaptiveLimiter("uploads", 1, resources=("net", "rss"))
+governor = ResourceGovernor(
+    [download_limiter, transcode_limiter, upload_limiter],
+    cpu_target=GOVERNOR_CPU_TARGET,
+    rss_target_bytes=GOVERNOR_RSS_TARGET_MB * 1024 * 1024 or None,
+    disk_target_bps=GOVERNOR_DISK_TARGET_MBPS * 1024 * 1024,
+    net_target_bps=GOVERNOR_NET_TARGET_MBPS * 1024 * 1024,
+    interval=GOVERNOR_INTERVAL,
+    ffmpeg_threads=FFMPEG_THREADS
+)
+
+def _state_in_use(user_id, state):
+    return task_tracker is not None and task_tracker.has_active_task(user_id)
+
+def _discard_state(user_id, state):
+    """Removes the temp files of an abandoned upload flow."""
+    file_info = state.get("file_info", {}) if isinstance(state, dict) else {}
+    cleanup_temp_files([file_info.get("downloaded_path"), file_info.get("processed_path"), file_info.get("thumbnail_path")])
+    staging.discard(file_info.get("staging_id"))
+
+# State store holding each user's in-progress conversation; stored messages are MessageRefs.
+# Login flows carry app/client secrets in `login_data`, so they are never written to conversation_states.
+user_states = StateStore("user_states", ttl=STATE_TTL, maxsize=STATE_MAX_ENTRIES,
+                         on_evict=_discard_state, can_evict=_state_in_use, secret_keys=("login_data",))
+
+# Idle locks are dropped after LOCK_IDLE_TTL; a held lock is never evicted.
+user_upload_locks = StateStore("user_locks", ttl=LOCK_IDLE_TTL, maxsize=STATE_MAX_ENTRIES,
+                               can_evict=lambda _, lock: not lock.locked())
+oauth_flows = StateStore("oauth_flows", ttl=OAUTH_FLOW_TTL, maxsize=STATE_MAX_ENTRIES)
+# Span timings of in-flight upload jobs, keyed by staging id; finished traces go to the job_traces collection.
+# A job can outlive STATE_TTL (uploads may take an hour), so a trace stays while its staging reservation does.
+active_traces = StateStore("job_traces", ttl=STATE_TTL, maxsize=STATE_MAX_ENTRIES,
+                           can_evict=lambda job_id, _: staging is None or not staging.is_live(job_id))
+tracer = JobTracer(active_traces)
 MAX_FILE_SIZE_BYTES = 0
 MAX_CONCURRENT_UPLOADS = 0
 shutdown_event = asyncio.Event()
 valid_log_channel = False
-
-# Pyrogram Client
-app = Client("upload_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+stats_service = None
+rollups = None
+activity_buffer = None
+entitlement_cache = EntitlementCache(maxsize=ENTITLEMENT_CACHE_SIZE)
+premium_sweeper = None
+# State and callback_data handlers register here; see handle_text_input / route_callback_query.
+router = Router()
+user_cache = UserSessionCache(ttl=USER_CACHE_TTL, maxsize=USER_CACHE_SIZE)
+
+# Startup phase timings, liveness and readiness (served on /healthz and /readyz)
+health = Health(required=("telegram", "mongo"))
+# Event-loop lag sampling and blocking-call capture (metrics on /metrics, stalls DM'd to the admin)
+loop_monitor = LoopMonitor(interval=LOOP_SAMPLE_INTERVAL, threshold=LOOP_STALL_THRESHOLD,
+                           alert_cooldown=LOOP_ALERT_COOLDOWN, debug=LOOP_DEBUG)
+router.attribute = loop_monitor.attribute
+
+# Pyrogram Client; handlers below are collected and registered by create_app()
+app = None
+# Admin-only handlers; the id is added once create_app() has validated ADMIN_ID.
+admin_only = filters.user()
 BOT_ID = 0 # Will be fetched on startup
 
 # --- Task Management ---
@@ -309,6 +440,16 @@ class TaskTracker:
         self._user_specific_tasks = {}
         self.loop = None
 
+    def _forget_user_task(self, user_id, task_name, task):
+        user_tasks = self._user_specific_tasks.get(user_id)
+        if user_tasks and user_tasks.get(task_name) is task:
+            del user_tasks[task_name]
+            if not user_tasks:
+                del self._user_specific_tasks[user_id]
+
+    def has_active_task(self, user_id):
+        return any(not t.done() for t in self._user_specific_tasks.get(user_id, {}).values())
+
     def create_task(self, coro, user_id=None, task_name=None):
         if self.loop is None:
             try:
@@ -325,6 +466,7 @@ class TaskTracker:
             if user_id not in self._user_specific_tasks:
                 self._user_specific_tasks[user_id] = {}
             self._user_specific_tasks[user_id][task_name] = task
+            task.add_done_callback(lambda t: self._forget_user_task(user_id, task_name, t))
         return task
 
     def cancel_user_task(self, user_id, task_name):
@@ -336,6 +478,14 @@ class TaskTracker:
             if not self._user_specific_tasks[user_id]:
                 del self._user_specific_tasks[user_id]
 
+    def task_labels(self) -> dict:
+        """Describes tracked tasks for diagnostics: owner and purpose where known."""
+        labels = {task: "tracked" for task in self._tasks}
+        for user_id, user_tasks in self._user_specific_tasks.items():
+            for task_name, task in user_tasks.items():
+                labels[task] = f"user {user_id}: {task_name}"
+        return labels
+
     async def cancel_all_user_tasks(self, user_id):
         if user_id in self._user_specific_tasks:
             user_tasks = self._user_specific_tasks.pop(user_id)
@@ -369,27 +519,15 @@ async def safe_task_wrapper(coro):
 # ==================== FONT & TEXT HELPERS ==========================
 # ===================================================================
 
-def to_bold_sans(text: str) -> str:
-    """Converts a string to bold sans-serif font."""
-    bold_sans_map = {
-        'A': '𝗔', 'B': '𝗕', 'C': '𝗖', 'D': '𝗗', 'E': '𝗘', 'F': '𝗙', 'G': '𝗚', 'H': '𝗛', 'I': '𝗜',
-        'J': '𝗝', 'K': '𝗞', 'L': '𝗟', 'M': '𝗠', 'N': '𝗡', 'O': '𝗢', 'P': '𝗣', 'Q': '𝗤', 'R': '𝗥',
-        'S': '𝗦', 'T': '𝗧', 'U': '𝗨', 'V': '𝗩', 'W': '𝗪', 'X': '𝗫', 'Y': '𝗬', 'Z': '𝗭',
-        'a': '𝗮', 'b': '𝗯', 'c': '𝗰', 'd': '𝗱', 'e': '𝗲', 'f': '𝗳', 'g': '𝗴', 'h': '𝗵', 'i': '𝗶',
-        'j': '𝗷', 'k': '𝗸', 'l': '𝗹', 'm': '𝗺', 'n': '𝗻', 'o': '𝗼', 'p': '𝗽', 'q': '𝗾', 'r': '𝗿',
-        's': '𝘀', 't': '𝘁', 'u': '𝘂', 'v': '𝘃', 'w': '𝘄', 'x': '𝘅', 'y': '𝘆', 'z': '𝘇',
-        '0': '𝟬', '1': '𝟭', '2': '𝟮', '3': '𝟯', '4': '𝟰', '5': '𝟱', '6': '𝟲', '7': '𝟳', '8': '𝟴', '9': '𝟵'
-    }
-    sanitized_text = text.encode('utf-8', 'surrogatepass').decode('utf-8')
-    return ''.join(bold_sans_map.get(char, char) for char in sanitized_text)
-
-# State dictionary to hold user states
-user_states = {}
-
-# Button Spam Protection
-user_clicks = defaultdict(lambda: {'count': 0, 'time': 0})
-SPAM_LIMIT = 10
-SPAM_WINDOW = 10
+# Flood protection for every incoming message and callback
+flood_controller = flood_control.FloodController(
+    FLOOD_LIMITS,
+    user_limits=FLOOD_USER_LIMITS,
+    mute_seconds=FLOOD_MUTE_SECONDS,
+    strikes_to_mute=FLOOD_STRIKES_TO_MUTE,
+    max_users=STATE_MAX_ENTRIES,
+    exempt=()
+)
 
 PREMIUM_PLANS = {
     "6_hour_trial": {"duration": timedelta(hours=6), "price": "Free / Free"},
@@ -407,36 +545,9 @@ PREMIUM_PLATFORMS = ["facebook", "youtube"]
 # ==================== MARKUP GENERATORS ============================
 # ===================================================================
 
-def get_main_keyboard(user_id, premium_platforms):
-    buttons = [
-        [KeyboardButton("📊 Dashboard"), KeyboardButton("👤 Account Info")],
-        [KeyboardButton("⚙️ ꜱᴇᴛᴛɪɴɢꜱ")]
-    ]
-    fb_buttons = []
-    yt_buttons = []
-    
-    if "facebook" in premium_platforms:
-        fb_buttons.extend([
-            KeyboardButton("📘 FB ᴩᴏꜱᴛ"),
-            KeyboardButton("📘 FB ᴠɪᴅᴇᴏ"),
-            KeyboardButton("📘 FB ʀᴇᴇʟꜱ"),
-        ])
-    if "youtube" in premium_platforms:
-        yt_buttons.extend([
-            KeyboardButton("▶️ YT ᴠɪᴅᴇᴏ"),
-            KeyboardButton("🟥 YT ꜱʜᴏʀᴛꜱ"),
-        ])
-    
-    if fb_buttons:
-        buttons.insert(0, fb_buttons)
-    if yt_buttons:
-        insert_index = 1 if fb_buttons else 0
-        buttons.insert(insert_index, yt_buttons)
-
-    buttons.append([KeyboardButton("⭐ ᴩʀᴇᴍɪᴜᴍ"), KeyboardButton("/premiumdetails")])
-    if is_admin(user_id):
-        buttons.append([KeyboardButton("🛠 ᴀᴅᴍɪɴ ᴩᴀɴᴇʟ"), KeyboardButton("🔄 ʀᴇꜱᴛᴀʀᴛ ʙᴏᴛ")])
-    return ReplyKeyboardMarkup(buttons, resize_keyboard=True, selective=True)
+def get_main_keyboard(user_id, premium_platforms, lang=DEFAULT_LANGUAGE):
+    platforms = tuple(p for p in PREMIUM_PLATFORMS if p in premium_platforms)
+    return rendering.main_keyboard(is_admin(user_id), platforms, lang)
 
 async def get_main_settings_markup(user_id):
     buttons = []
@@ -588,35 +699,11 @@ def get_payment_methods_markup():
     payment_buttons.append([InlineKeyboardButton("🔙 ʙᴀᴄᴋ ᴛᴏ ᴩʀᴇᴍɪᴜᴍ ᴩʟᴀɴꜱ", callback_data="back_to_premium_plans")])
     return InlineKeyboardMarkup(payment_buttons)
 
-def get_progress_markup():
-    return InlineKeyboardMarkup([
-        [InlineKeyboardButton("❌ Cancel", callback_data="cancel_upload")]
-    ])
-
-def get_upload_flow_markup(platform, step):
-    buttons = []
-    if step == "thumbnail":
-        buttons.extend([
-            [InlineKeyboardButton("🖼️ Upload Thumbnail", callback_data="upload_flow_thumbnail_custom")],
-            [InlineKeyboardButton("🤖 Auto-Generate", callback_data="upload_flow_thumbnail_auto")]
-        ])
-    elif step == "visibility":
-        buttons.extend([
-            [InlineKeyboardButton("🌍 ᴩᴜʙʟɪᴄ", callback_data="upload_flow_visibility_public")],
-            [InlineKeyboardButton("🔒 ᴩʀɪᴠᴀᴛᴇ", callback_data="upload_flow_visibility_private")],
-            [InlineKeyboardButton("🔗 ᴜɴʟɪꜱᴛᴇᴅ", callback_data="upload_flow_visibility_unlisted")]
-        ])
-    elif step == "publish":
-        buttons.extend([
-            [InlineKeyboardButton("🚀 ᴩᴜʙʟɪꜱʜ ɴᴏᴡ", callback_data="upload_flow_publish_now")],
-            [InlineKeyboardButton("⏰ ꜱᴄʜᴇᴅᴜʟᴇ ʟᴀᴛᴇʀ", callback_data="upload_flow_publish_schedule")]
-        ])
-    elif step == "input":
-        buttons.append([InlineKeyboardButton("➡️ Skip", callback_data=f"upload_flow_input_skip")])
-
+def get_progress_markup(lang=DEFAULT_LANGUAGE):
+    return rendering.progress_markup(lang)
 
-    buttons.append([InlineKeyboardButton("❌ Cancel", callback_data="cancel_upload")])
-    return InlineKeyboardMarkup(buttons)
+def get_upload_flow_markup(platform, step, lang=DEFAULT_LANGUAGE):
+    return rendering.upload_flow_markup(platform, step, lang)
 
 # ===================================================================
 # ====================== HELPER FUNCTIONS ===========================
@@ -630,11 +717,21 @@ def check_fb_response(response):
         raise ValueError(f"Facebook returned an invalid, non-JSON response: {response.text}")
     if 'error' in data:
         error_details = data['error']
-        raise requests.RequestException(
+        raise platform_sdks.http().RequestException(
             f"Facebook API Error ({error_details.get('code', 'N/A')}): {error_details.get('message', 'Unknown error')}"
         )
     return data
 
+def fb_get_json(url):
+    """Blocking Graph API GET; call through the io executor."""
+    return check_fb_response(platform_sdks.http().get(url, timeout=60))
+
+def fb_upload_file(url, data, file_path, timeout):
+    """Blocking multipart Graph API upload; call through the upload executor."""
+    with open(file_path, 'rb') as f:
+        response = platform_sdks.http().post(url, data=data, files={'source': f}, timeout=timeout)
+    return check_fb_response(response)
+
 async def safe_edit_message(message, text, reply_markup=None):
     """Safely edits a message, ignoring 'message not modified' errors."""
     try:
@@ -653,13 +750,13 @@ async def safe_edit_message(message, text, reply_markup=None):
 def is_admin(user_id):
     return user_id == ADMIN_ID
 
-async def _get_user_data(user_id):
-    if db is None:
+async def _get_user_data(user_id, projection=None):
+    if repo is None:
         return {"_id": user_id, "premium": {}}
-    return await asyncio.to_thread(db.users.find_one, {"_id": user_id})
+    return await repo.get_user(user_id, projection)
 
 async def _save_user_data(user_id, data_to_update):
-    if db is None:
+    if repo is None:
         logger.warning(f"DB not connected. Skipping save for user {user_id}.")
         return
     serializable_data = {}
@@ -668,28 +765,34 @@ async def _save_user_data(user_id, data_to_update):
             serializable_data[key] = {k: v for k, v in value.items() if not k.startswith('$')}
         else:
             serializable_data[key] = value
-    await asyncio.to_thread(
-        db.users.update_one,
-        {"_id": user_id},
-        {"$set": serializable_data},
-        upsert=True
-    )
+    await repo.update_user(user_id, serializable_data)
+
+def touch_user(user_id, **fields):
+    """Queues last_active (and any profile fields) for the next write-behind flush."""
+    if activity_buffer is None:
+        return
+    activity_buffer.touch(user_id, last_active=datetime.now(timezone.utc), **fields)
 
 async def _update_global_setting(key, value):
     global_settings[key] = value
-    if db is None:
+    if repo is None:
         logger.warning(f"DB not connected. Skipping save for global setting '{key}'.")
         return
-    await asyncio.to_thread(db.settings.update_one, {"_id": "global_settings"}, {"$set": {key: value}}, upsert=True)
+    await repo.update_global_settings({key: value})
 
 async def is_premium_for_platform(user_id, platform):
     if user_id == ADMIN_ID:
         return True
     
-    if db is None:
+    if repo is None:
         return False
 
-    user = await _get_user_data(user_id)
+    cached = entitlement_cache.check(user_id, platform)
+    if cached is not None:
+        return cached
+
+    user = await _get_user_data(user_id, "premium")
+    entitlement_cache.put(user_id, user.get("premium") if user else None)
     if not user:
         return False
 
@@ -710,70 +813,84 @@ async def is_premium_for_platform(user_id, platform):
     if premium_until and isinstance(premium_until, datetime) and premium_until > datetime.now(timezone.utc):
         return True
 
-    if premium_type and premium_until and premium_until <= datetime.now(timezone.utc):
-        await asyncio.to_thread(
-            db.users.update_one,
-            {"_id": user_id},
-            {"$set": {f"premium.{platform}.status": "expired"}}
-        )
-        logger.info(f"Premium for {platform} expired for user {user_id}. Status updated in DB.")
-        return False
-
+    # Lapsed plans are marked expired in bulk by the PremiumSweeper, not on the request path.
     return False
 
+async def send_premium_reminder(user_id, platform, until):
+    text = (
+        f"⏳ **{to_bold_sans('Premium Expiring Soon')}**\n\n"
+        f"Your **{platform.capitalize()}** premium expires on `{until.strftime('%Y-%m-%d %H:%M')}` UTC.\n"
+        f"Contact the admin to renew and keep uploading without interruption."
+    )
+    try:
+        await app.send_message(user_id, text)
+    except FloodWait as e:
+        await asyncio.sleep(e.value)
+        await app.send_message(user_id, text)
+    except (UserIsBlocked, PeerIdInvalid):
+        logger.info(f"Skipping {platform} expiry reminder for {user_id}: user unreachable.")
+
 async def save_platform_session(user_id, platform, session_data):
-    if db is None: return
+    if repo is None: return
     
+    account_id = session_data['id']
+
     # This check correctly handles the multi-login limit for non-admin users.
+    # Refreshing an account that is already logged in never counts against it.
     if not is_admin(user_id):
-        existing_sessions_count = await asyncio.to_thread(db.sessions.count_documents, {"user_id": user_id, "platform": platform})
-        if existing_sessions_count >= 2:
+        existing_sessions = await load_platform_sessions(user_id, platform)
+        if len(existing_sessions) >= 2 and all(s.get("account_id") != account_id for s in existing_sessions):
             raise ValueError("Premium users can add a maximum of 2 accounts per platform.")
 
-    account_id = session_data['id']
-    await asyncio.to_thread(
-        db.sessions.update_one,
-        {"user_id": user_id, "platform": platform, "account_id": account_id},
-        {"$set": {
-            "session_data": session_data,
-            "logged_in_at": datetime.now(timezone.utc)
-        }},
-        upsert=True
-    )
+    fields = {
+        "session_data": session_data,
+        "logged_in_at": datetime.now(timezone.utc)
+    }
+    await repo.upsert_session(user_id, platform, account_id, fields)
+    user_cache.upsert_session(user_id, platform, account_id, fields)
 
 async def load_platform_sessions(user_id, platform):
-    if db is None: return []
-    sessions = await asyncio.to_thread(list, db.sessions.find({"user_id": user_id, "platform": platform}))
+    if repo is None: return []
+    sessions = user_cache.get_sessions(user_id, platform)
+    if sessions is None:
+        sessions = await repo.list_sessions(user_id, platform)
+        user_cache.put_sessions(user_id, platform, sessions)
     return sessions
 
 async def get_active_session(user_id, platform):
-    user_settings = await get_user_settings(user_id)
+    """Resolves the active account's session data; served from the user cache when warm."""
+    if repo is None:
+        return None
+    # On a cold cache both reads go out together instead of one after the other.
+    user_settings, sessions = await asyncio.gather(
+        get_user_settings(user_id), load_platform_sessions(user_id, platform)
+    )
     active_id = user_settings.get(f"active_{platform}_id")
-    if not active_id or db is None:
+    if not active_id:
         return None
-    
-    session = await asyncio.to_thread(db.sessions.find_one, {"user_id": user_id, "platform": platform, "account_id": active_id})
+    session = next((s for s in sessions if s.get("account_id") == active_id), None)
     return session.get("session_data") if session else None
 
 async def delete_platform_session(user_id, platform, account_id):
-    if db is None: return
-    await asyncio.to_thread(db.sessions.delete_one, {"user_id": user_id, "platform": platform, "account_id": account_id})
+    if repo is None: return
+    await repo.delete_session(user_id, platform, account_id)
+    user_cache.remove_session(user_id, platform, account_id)
 
 async def save_user_settings(user_id, settings):
-    if db is None:
+    if repo is None:
         logger.warning(f"DB not connected. Skipping user settings save for user {user_id}.")
         return
-    await asyncio.to_thread(
-        db.settings.update_one,
-        {"_id": user_id},
-        {"$set": settings},
-        upsert=True
-    )
+    await repo.save_user_settings(user_id, settings)
+    user_cache.update_settings(user_id, settings)
 
 async def get_user_settings(user_id):
+    settings = user_cache.get_settings(user_id)
+    if settings is not None:
+        return settings
+
     settings = {}
-    if db is not None:
-        settings = await asyncio.to_thread(db.settings.find_one, {"_id": user_id}) or {}
+    if repo is not None:
+        settings = await repo.get_user_settings(user_id) or {}
     
     settings.setdefault("caption_facebook", "")
     settings.setdefault("description_facebook", "")
@@ -783,9 +900,15 @@ async def get_user_settings(user_id):
     settings.setdefault("tags_youtube", "")
     settings.setdefault("visibility_youtube", "private")
     settings.setdefault("active_youtube_id", None)
-    
+    settings.setdefault("language", DEFAULT_LANGUAGE)
+
+    if repo is not None:
+        user_cache.put_settings(user_id, settings)
     return settings
 
+async def get_user_language(user_id):
+    return rendering.normalize_language((await get_user_settings(user_id)).get("language"))
+
 async def safe_threaded_reply(original_media_message, new_text=None, new_markup=None, status_message=None):
     """Handles all replies and edits within the media's thread."""
     if not original_media_message:
@@ -835,6 +958,8 @@ async def monitor_progress_task(original_media_msg, status_msg, action_text="Dow
     try:
         while True:
             await asyncio.sleep(2)
+            if governor.under_pressure:
+                continue
             
             if action_text.startswith("Uploading to") and 'progress' in _upload_progress:
                 percentage = _upload_progress['progress']
@@ -886,6 +1011,20 @@ async def monitor_progress_task(original_media_msg, status_msg, action_text="Dow
         _upload_progress.clear()
 
 
+# Built by create_app(); creating it makes the staging directories.
+staging = None
+
+async def staging_protected_ids():
+    """Staging ids the janitor must keep: live conversations and not-yet-run scheduled posts."""
+    if repo is None:
+        raise RuntimeError("database is offline")
+    ids = set(await repo.scheduled_staging_ids())
+    for state in user_states.peek_values():
+        if isinstance(state, dict):
+            ids.add(state.get("file_info", {}).get("staging_id"))
+    ids.discard(None)
+    return ids
+
 def cleanup_temp_files(files_to_delete):
     for file_path in files_to_delete:
         if file_path and os.path.exists(file_path):
@@ -899,42 +1038,66 @@ def with_user_lock(func):
     @wraps(func)
     async def wrapper(client, message, *args, **kwargs):
         user_id = message.from_user.id
-        if user_id not in user_upload_locks:
-            user_upload_locks[user_id] = asyncio.Lock()
+        lock = user_upload_locks.get(user_id)
+        if lock is None:
+            lock = user_upload_locks[user_id] = asyncio.Lock()
 
-        if user_upload_locks[user_id].locked():
+        if lock.locked():
             return await message.reply("⚠️ " + to_bold_sans("Another Operation Is Already In Progress. Please Wait Or Cancel."))
         
-        async with user_upload_locks[user_id]:
+        async with lock:
             return await func(client, message, *args, **kwargs)
     return wrapper
 
-def rate_limit_callbacks(func):
-    """Decorator to prevent button spam."""
-    @wraps(func)
-    async def wrapper(client, query, *args, **kwargs):
-        user_id = query.from_user.id
-        now = time.time()
-        
-        if now - user_clicks[user_id]['time'] > SPAM_WINDOW:
-            user_clicks[user_id]['count'] = 0
-            user_clicks[user_id]['time'] = now
-
-        user_clicks[user_id]['count'] += 1
-
-        if user_clicks[user_id]['count'] > SPAM_LIMIT:
+def _flood_action_class(update):
+    if isinstance(update, types.CallbackQuery):
+        return "callback"
+    if update.media:
+        return "media"
+    if update.text and update.text.startswith("/"):
+        return "command"
+    return "text"
+
+def _mute_notice():
+    return "🚫 " + to_bold_sans(f"Too Many Requests. You Are Muted For {FLOOD_MUTE_SECONDS} Seconds.")
+
+# Group -1 runs before every other handler; stop_propagation() drops the update.
+@Client.on_message(group=-1)
+async def flood_guard_messages(_, msg):
+    await health.startup_complete.wait()
+    if not msg.from_user:
+        return
+    verdict = flood_controller.check(msg.from_user.id, _flood_action_class(msg))
+    if verdict == flood_control.ALLOW:
+        return
+    if verdict == flood_control.MUTE:
+        try:
+            await msg.reply(_mute_notice())
+        except Exception as e:
+            logger.warning(f"Could not send mute notice to {msg.from_user.id}: {e}")
+    msg.stop_propagation()
+
+@Client.on_callback_query(group=-1)
+async def flood_guard_callbacks(_, query):
+    await health.startup_complete.wait()
+    verdict = flood_controller.check(query.from_user.id, "callback")
+    if verdict == flood_control.ALLOW:
+        return
+    try:
+        if verdict == flood_control.THROTTLE:
             await query.answer("Please don't click so fast!", show_alert=True)
-            return
-
-        return await func(client, query, *args, **kwargs)
-    return wrapper
+        elif verdict == flood_control.MUTE:
+            await query.answer(_mute_notice(), show_alert=True)
+    except Exception:
+        pass
+    query.stop_propagation()
 
 
 # ===================================================================
 # ======================== COMMAND HANDLERS =========================
 # ===================================================================
 
-@app.on_message(filters.command("start"))
+@Client.on_message(filters.command("start"))
 async def start(_, msg):
     user_id = msg.from_user.id
     user_first_name = msg.from_user.first_name or "there"
@@ -958,7 +1121,12 @@ async def start(_, msg):
             "_id": user_id, "premium": {}, "added_by": "self_start", 
             "added_at": datetime.now(timezone.utc), "username": msg.from_user.username
         })
+        entitlement_cache.put(user_id, {})
         logger.info(f"New user {user_id} added via /start")
+        if stats_service:
+            stats_service.record_new_user()
+        if rollups:
+            await rollups.record_new_user()
         await send_log_to_channel(app, LOG_CHANNEL, f"🌟 New user: `{user_id}` (`{msg.from_user.username or 'N/A'}`)")
         welcome_msg = (
             f"👋 **Hi {user_first_name}!**\n\n"
@@ -973,14 +1141,14 @@ async def start(_, msg):
         await msg.reply(welcome_msg, reply_markup=trial_markup, parse_mode=enums.ParseMode.MARKDOWN)
         return
     else:
-        await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc), "username": msg.from_user.username})
+        touch_user(user_id, username=msg.from_user.username)
 
     event_toggle = global_settings.get("special_event_toggle", False)
     if event_toggle:
         event_title = global_settings.get("special_event_title", "🎉 Special Event!")
         event_message = global_settings.get("special_event_message", "Enjoy our special event features!")
         event_text = f"**{event_title}**\n\n{event_message}"
-        await msg.reply(event_text, reply_markup=get_main_keyboard(user_id, premium_platforms), parse_mode=enums.ParseMode.MARKDOWN)
+        await msg.reply(event_text, reply_markup=get_main_keyboard(user_id, premium_platforms, await get_user_language(user_id)), parse_mode=enums.ParseMode.MARKDOWN)
         return
 
     welcome_msg = to_bold_sans("Welcome Back To Telegram ➜ Direct Uploader") + "\n\n"
@@ -1014,13 +1182,68 @@ async def start(_, msg):
             f"🆔 Your ID: `{user_id}`"
         )
     welcome_msg += premium_details_text
-    await msg.reply(welcome_msg, reply_markup=get_main_keyboard(user_id, premium_platforms), parse_mode=enums.ParseMode.MARKDOWN)
+    await msg.reply(welcome_msg, reply_markup=get_main_keyboard(user_id, premium_platforms, await get_user_language(user_id)), parse_mode=enums.ParseMode.MARKDOWN)
 
-@app.on_message(filters.command("restart") & filters.user(ADMIN_ID))
+@Client.on_message(filters.command("restart") & admin_only)
 async def restart_cmd(_, msg):
     await restart_bot(msg)
 
-@app.on_message(filters.command(["fblogin", "flogin"]))
+async def _send_report(msg, file_name, data, caption):
+    document = io.BytesIO(data)
+    document.name = file_name
+    await msg.reply_document(document, file_name=file_name, caption=caption)
+
+def _profile_seconds(msg, default):
+    """The first numeric argument, capped at PROFILE_MAX_SECONDS; raises ValueError on junk."""
+    for arg in msg.command[1:]:
+        if arg.replace(".", "", 1).isdigit():
+            return max(1.0, min(float(arg), PROFILE_MAX_SECONDS))
+        if arg not in ("cpu", "sample"):
+            raise ValueError(arg)
+    return default
+
+async def _run_profile(msg, kind, seconds):
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    try:
+        if kind == "cpu":
+            data = await profiling.cpu_profile(seconds)
+        elif kind == "sample":
+            data = await executors.run("io", profiling.sample_stacks, seconds)
+        else:
+            data = await profiling.tracemalloc_diff(seconds)
+    except profiling.ProfilerBusy as e:
+        return await msg.reply("⏳ " + to_bold_sans(str(e)))
+    await _send_report(msg, f"{kind}-{stamp}.txt", data, f"{kind} profile, {seconds:.0f}s")
+
+@Client.on_message(filters.command("profile") & admin_only)
+async def profile_cmd(_, msg):
+    """/profile [seconds] [cpu|sample] - cProfile of the loop thread, or a sampling profile of all threads."""
+    try:
+        seconds = _profile_seconds(msg, 30.0)
+    except ValueError:
+        return await msg.reply("❌ " + to_bold_sans("Usage:") + " `/profile [seconds] [cpu|sample]`")
+    kind = "sample" if "sample" in msg.command[1:] else "cpu"
+    await msg.reply(f"🔬 {to_bold_sans('Profiling')} ({kind}) for `{seconds:.0f}s`...")
+    task_tracker.create_task(safe_task_wrapper(_run_profile(msg, kind, seconds)))
+
+@Client.on_message(filters.command("memdiff") & admin_only)
+async def memdiff_cmd(_, msg):
+    """/memdiff [seconds] - tracemalloc allocations that grew over the window."""
+    try:
+        seconds = _profile_seconds(msg, 60.0)
+    except ValueError:
+        return await msg.reply("❌ " + to_bold_sans("Usage:") + " `/memdiff [seconds]`")
+    await msg.reply(f"🧠 {to_bold_sans('Tracing allocations')} for `{seconds:.0f}s`...")
+    task_tracker.create_task(safe_task_wrapper(_run_profile(msg, "memory", seconds)))
+
+@Client.on_message(filters.command("tasks") & admin_only)
+async def tasks_cmd(_, msg):
+    """/tasks - stack of every asyncio task, tracked background tasks labelled."""
+    data = profiling.task_stacks(asyncio.all_tasks(), labels=task_tracker.task_labels())
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%d-%H%M%S")
+    await _send_report(msg, f"tasks-{stamp}.txt", data, f"{len(task_tracker._tasks)} tracked tasks")
+
+@Client.on_message(filters.command(["fblogin", "flogin"]))
 @with_user_lock
 async def facebook_login_cmd_new(_, msg):
     user_id = msg.from_user.id
@@ -1038,11 +1261,11 @@ async def facebook_login_cmd_new(_, msg):
         "action": "waiting_for_fb_app_id",
         "platform": "facebook",
         "login_data": {},
-        "prompt_msg": prompt_msg,
+        "prompt_msg": MessageRef.of(prompt_msg),
         "secret_messages": [msg.id] 
     }
 
-@app.on_message(filters.command(["ytlogin", "ylogin"]))
+@Client.on_message(filters.command(["ytlogin", "ylogin"]))
 @with_user_lock
 async def youtube_login_cmd_new(_, msg):
     user_id = msg.from_user.id
@@ -1060,16 +1283,16 @@ async def youtube_login_cmd_new(_, msg):
         "action": "waiting_for_yt_client_id",
         "platform": "youtube",
         "login_data": {},
-        "prompt_msg": prompt_msg,
+        "prompt_msg": MessageRef.of(prompt_msg),
         "secret_messages": [msg.id]
     }
 
 
-@app.on_message(filters.command(["buypypremium", "premiumplan"]))
-@app.on_message(filters.regex("⭐ ᴩʀᴇᴍɪᴜᴍ"))
+@Client.on_message(filters.command(["buypypremium", "premiumplan"]))
+@Client.on_message(filters.regex(rendering.label_pattern("premium")))
 async def show_premium_options(_, msg):
     user_id = msg.from_user.id
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
+    touch_user(user_id)
     premium_plans_text = (
         "⭐ " + to_bold_sans("Upgrade To Premium!") + " ⭐\n\n"
         + to_bold_sans("Unlock Full Features And Upload Unlimited Content.") + "\n\n"
@@ -1077,11 +1300,11 @@ async def show_premium_options(_, msg):
     )
     await msg.reply(premium_plans_text, reply_markup=get_premium_plan_markup(user_id), parse_mode=enums.ParseMode.MARKDOWN)
 
-@app.on_message(filters.command("premiumdetails"))
+@Client.on_message(filters.command("premiumdetails"))
 async def premium_details_cmd(_, msg):
     user_id = msg.from_user.id
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
-    user = await _get_user_data(user_id)
+    touch_user(user_id)
+    user = await _get_user_data(user_id, "premium")
     if not user:
         return await msg.reply(to_bold_sans("You Are Not Registered. Please Use /start."))
     if is_admin(user_id):
@@ -1120,19 +1343,13 @@ async def premium_details_cmd(_, msg):
 
     await msg.reply(status_text, parse_mode=enums.ParseMode.MARKDOWN)
     
-@app.on_message(filters.command("leaderboard"))
+@Client.on_message(filters.command("leaderboard"))
 async def leaderboard_cmd(_, msg):
-    if db is None:
+    if repo is None:
         return await msg.reply("⚠️ " + to_bold_sans("Database is currently unavailable."))
 
-    pipeline = [
-        {"$group": {"_id": "$user_id", "upload_count": {"$sum": 1}}},
-        {"$sort": {"upload_count": -1}},
-        {"$limit": 5}
-    ]
-    
     try:
-        leaderboard_data = await asyncio.to_thread(list, db.uploads.aggregate(pipeline))
+        leaderboard_data = await repo.top_uploaders(5)
         
         if not leaderboard_data:
             return await msg.reply("🏆 " + to_bold_sans("Leaderboard is empty. No uploads recorded yet!"))
@@ -1158,18 +1375,168 @@ async def leaderboard_cmd(_, msg):
         await msg.reply("⚠️ " + to_bold_sans("Could not fetch the leaderboard."))
 
 
+@Client.on_message(filters.command("language"))
+async def language_cmd(_, msg):
+    touch_user(msg.from_user.id)
+    lang = await get_user_language(msg.from_user.id)
+    await msg.reply(render("language_prompt", lang), reply_markup=rendering.language_markup())
+
+
+@Client.on_message(filters.command("analytics") & admin_only)
+async def analytics_cmd(_, msg):
+    """/analytics [days] or /analytics YYYY-MM-DD YYYY-MM-DD"""
+    if rollups is None:
+        return await msg.reply("⚠️ " + to_bold_sans("Database is currently unavailable."))
+
+    args = msg.command[1:]
+    try:
+        if len(args) == 2:
+            start = datetime.strptime(args[0], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            end = datetime.strptime(args[1], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+            if end < start:
+                start, end = end, start
+            summary = await rollups.summarize(start, end)
+        else:
+            days = int(args[0]) if args else 7
+            if days <= 0:
+                raise ValueError
+            summary = await rollups.last_days(days)
+    except ValueError:
+        return await msg.reply("❌ " + to_bold_sans("Usage:") + " `/analytics [days]` or `/analytics YYYY-MM-DD YYYY-MM-DD`")
+
+    await msg.reply(format_rollup_report("Analytics", summary, show_days=len(summary["days"]) <= 31), parse_mode=enums.ParseMode.MARKDOWN)
+
+
+@Client.on_message(filters.command("routes") & admin_only)
+async def routes_cmd(_, msg):
+    """/routes - per-route call counts and latencies since startup."""
+    routes = router.stats()
+    if not routes:
+        return await msg.reply("🧭 " + to_bold_sans("No routes dispatched yet."))
+
+    text = f"🧭 **{to_bold_sans('Route Statistics')}**\n\n"
+    for route in routes[:30]:
+        text += (
+            f"`{route['route']}`: {route['calls']} calls, avg `{route['avg_ms']:.1f} ms`, "
+            f"max `{route['max_ms']:.0f} ms`" + (f", {route['errors']} errors" if route['errors'] else "") + "\n"
+        )
+    await msg.reply(text[:4096], parse_mode=enums.ParseMode.MARKDOWN)
+
+
+@Client.on_message(filters.command("slowqueries") & admin_only)
+async def slow_queries_cmd(_, msg):
+    """/slowqueries [limit] - slowest profiled operations with their current query plan."""
+    if repo is None:
+        return await msg.reply("⚠️ " + to_bold_sans("Database is currently unavailable."))
+
+    try:
+        limit = max(1, min(int(msg.command[1]), 25)) if len(msg.command) > 1 else 10
+    except ValueError:
+        return await msg.reply("❌ " + to_bold_sans("Usage:") + " `/slowqueries [limit]`")
+
+    try:
+        report = await migrations.slow_query_report(repo.db, limit=limit)
+    except OperationFailure as e:
+        logger.error(f"Failed to read the database profiler: {e}")
+        return await msg.reply("⚠️ " + to_bold_sans("Could not read the database profiler."))
+
+    schema_version = await migrations.get_schema_version(repo.db)
+    if not report:
+        hint = "Set `MONGO_PROFILE_SLOW_MS` to enable it." if MONGO_PROFILE_SLOW_MS <= 0 else "Nothing slow recorded yet."
+        return await msg.reply(f"🐢 **{to_bold_sans('Slow Queries')}**\n\nSchema version: `{schema_version}`\nNo profiled operations. {hint}")
+
+    text = f"🐢 **{to_bold_sans('Slow Queries')}**\n\nSchema version: `{schema_version}`\n\n"
+    for i, entry in enumerate(report, 1):
+        plan = " → ".join(entry["stages"]) or entry["plan_summary"] or "n/a"
+        flag = " ⚠️ COLLSCAN" if entry["collscan"] else ""
+        text += (
+            f"**{i}.** `{entry['ns']}` ({entry['op']}) - `{entry['millis']} ms`{flag}\n"
+            f"    examined: {entry['docs_examined']} docs / {entry['keys_examined']} keys, returned: {entry['returned']}\n"
+            f"    plan: `{plan}`\n"
+        )
+    await msg.reply(text[:4096], parse_mode=enums.ParseMode.MARKDOWN)
+
+
+def _format_trace(doc) -> str:
+    attrs = doc.get("attributes", {})
+    text = (
+        f"**Job** `{doc['job_id']}` ({doc['status']})\n"
+        f"User `{doc['user_id']}` · {attrs.get('platform') or '?'} {attrs.get('upload_type') or ''}"
+        f"{' · scheduled' if attrs.get('scheduled') or attrs.get('scheduled_job') else ''}\n"
+        f"Started {doc['started_at'].strftime('%Y-%m-%d %H:%M:%S')} · total `{doc['seconds']:.1f}s`\n"
+    )
+    if doc.get("error"):
+        text += f"Error: `{doc['error'][:200]}`\n"
+    for span in doc.get("spans", []):
+        details = ", ".join(f"{k}={v}" for k, v in span.get("attributes", {}).items() if v is not None)
+        flag = " ❌" if span["status"] == "error" else ""
+        text += f"  - `{span['name']}` {span['seconds']:.2f}s{flag}" + (f" `{details}`" if details else "") + "\n"
+    return text
+
+
+@Client.on_message(filters.command("trace") & admin_only)
+async def trace_cmd(_, msg):
+    """/trace <job_id> | /trace user <user_id> - stage timings of a job, or a user's recent jobs."""
+    if repo is None:
+        return await msg.reply("⚠️ " + to_bold_sans("Database is currently unavailable."))
+    args = msg.command[1:]
+    if len(args) == 2 and args[0] == "user" and args[1].isdigit():
+        traces = await tracer.for_user(int(args[1]))
+        if not traces:
+            return await msg.reply("🔍 " + to_bold_sans("No traces for that user."))
+        text = f"🔍 **{to_bold_sans('Recent Jobs')}** for `{args[1]}`\n\n"
+        for doc in traces:
+            slowest = max(doc.get("spans", []), key=lambda span: span.get("seconds") or 0, default=None)
+            text += (
+                f"`{doc['job_id']}` {doc['status']} · `{doc['seconds']:.1f}s`"
+                + (f" · slowest `{slowest['name']}` {slowest['seconds']:.1f}s" if slowest else "") + "\n"
+            )
+        return await msg.reply(text[:4096])
+    if len(args) != 1:
+        return await msg.reply("❌ " + to_bold_sans("Usage:") + " `/trace <job_id>` or `/trace user <user_id>`")
+
+    traces = await tracer.find(args[0])
+    if not traces:
+        return await msg.reply("🔍 " + to_bold_sans("No trace stored for that job."))
+    text = f"🔍 **{to_bold_sans('Job Trace')}**\n\n" + "\n".join(_format_trace(doc) for doc in traces)
+    await msg.reply(text[:4096])
+
+
+@Client.on_message(filters.command("tracestats") & admin_only)
+async def trace_stats_cmd(_, msg):
+    """/tracestats [hours] [platform] - p50/p95 seconds per pipeline stage."""
+    if repo is None:
+        return await msg.reply("⚠️ " + to_bold_sans("Database is currently unavailable."))
+    try:
+        hours = max(1, min(int(msg.command[1]), 24 * 30)) if len(msg.command) > 1 else 24
+    except ValueError:
+        return await msg.reply("❌ " + to_bold_sans("Usage:") + " `/tracestats [hours] [facebook|youtube]`")
+    platform = msg.command[2] if len(msg.command) > 2 else None
+
+    summary = await tracer.stage_summary(datetime.now(timezone.utc) - timedelta(hours=hours), platform=platform)
+    if not summary:
+        return await msg.reply("📈 " + to_bold_sans("No traced jobs in that window."))
+    text = f"📈 **{to_bold_sans('Stage Timings')}** (last {hours}h{', ' + platform if platform else ''})\n\n"
+    for row in summary:
+        text += (
+            f"`{row['stage']:<13}` n={row['count']} p50 `{row['p50']:.2f}s` p95 `{row['p95']:.2f}s` "
+            f"max `{row['max']:.1f}s`" + (f" · {row['errors']} failed" if row["errors"] else "") + "\n"
+        )
+    await msg.reply(text[:4096])
+
+
 # ===================================================================
 # ======================== REGEX HANDLERS ===========================
 # ===================================================================
 
-@app.on_message(filters.regex("🔄 ʀᴇꜱᴛᴀʀᴛ ʙᴏᴛ") & filters.user(ADMIN_ID))
+@Client.on_message(filters.regex(rendering.label_pattern("restart")) & admin_only)
 async def restart_button_handler(_, msg):
     await restart_bot(msg)
 
-@app.on_message(filters.regex("⚙️ ꜱᴇᴛᴛɪɴɢꜱ"))
+@Client.on_message(filters.regex(rendering.label_pattern("settings")))
 async def settings_menu(_, msg):
     user_id = msg.from_user.id
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
+    touch_user(user_id)
     
     has_premium_any = await is_premium_for_platform(user_id, "facebook") or \
                       await is_premium_for_platform(user_id, "youtube")
@@ -1182,14 +1549,14 @@ async def settings_menu(_, msg):
         reply_markup=await get_main_settings_markup(user_id)
     )
 
-@app.on_message(filters.regex("🛠 ᴀᴅᴍɪɴ ᴩᴀɴᴇʟ") & filters.user(ADMIN_ID))
+@Client.on_message(filters.regex(rendering.label_pattern("admin_panel")) & admin_only)
 async def admin_panel_button_handler(_, msg):
     await msg.reply(
         "🛠 " + to_bold_sans("Welcome To The Admin Panel!"),
         reply_markup=admin_markup
     )
 
-@app.on_message(filters.regex("📊 Dashboard") | filters.command("stats"))
+@Client.on_message(filters.regex(rendering.label_pattern("dashboard")) | filters.command("stats"))
 @with_user_lock
 async def show_stats(_, msg_or_query):
     if hasattr(msg_or_query, 'message'): # It's a callback query
@@ -1201,8 +1568,8 @@ async def show_stats(_, msg_or_query):
         message = msg_or_query
         is_callback = False
 
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
-    if db is None: 
+    touch_user(user_id)
+    if repo is None: 
         text = "⚠️ " + to_bold_sans("Database Is Currently Unavailable.")
         if is_callback:
             return await msg_or_query.answer(text, show_alert=True)
@@ -1210,64 +1577,38 @@ async def show_stats(_, msg_or_query):
             return await message.reply(text)
 
     if not is_admin(user_id):
-        user_uploads = await asyncio.to_thread(db.uploads.count_documents, {'user_id': user_id})
+        user_stats = await stats_service.get_user(user_id)
         stats_text = (
             f"📊 **{to_bold_sans('Your Dashboard:')}**\n\n"
-            f"📈 **Total Uploads:** `{user_uploads}`\n"
+            f"📈 **Total Uploads:** `{user_stats['total']}`\n"
         )
         for p in PREMIUM_PLATFORMS:
-            platform_uploads = await asyncio.to_thread(db.uploads.count_documents, {'user_id': user_id, 'platform': p})
-            stats_text += f"    - {p.capitalize()}: `{platform_uploads}`\n"
+            stats_text += f"    - {p.capitalize()}: `{user_stats[p]}`\n"
         await message.reply(stats_text)
         return
 
     # Admin Stats
-    total_users = await asyncio.to_thread(db.users.count_documents, {})
-    
-    pipeline = [
-        {"$project": {
-            "is_premium": {"$or": [
-                {"$or": [
-                    {"$eq": [f"$premium.{p}.type", "lifetime"]},
-                    {"$gt": [f"$premium.{p}.until", datetime.now(timezone.utc)]}
-                ]} for p in PREMIUM_PLATFORMS
-            ]},
-            "platforms": {p: {"$or": [
-                {"$eq": [f"$premium.{p}.type", "lifetime"]},
-                {"$gt": [f"$premium.{p}.until", datetime.now(timezone.utc)]}
-            ]} for p in PREMIUM_PLATFORMS}
-        }},
-        {"$group": {
-            "_id": None,
-            "total_premium": {"$sum": {"$cond": ["$is_premium", 1, 0]}},
-            **{f"{p}_premium": {"$sum": {"$cond": [f"$platforms.{p}", 1, 0]}} for p in PREMIUM_PLATFORMS}
-        }}
-    ]
     try:
-        result = await asyncio.to_thread(list, db.users.aggregate(pipeline))
+        snapshot = await stats_service.get_global()
     except OperationFailure as e:
         logger.error(f"Stats aggregation failed: {e}")
         return await message.reply("⚠️ " + to_bold_sans("Could Not Fetch Bot Statistics."))
 
-    total_premium_users = result[0].get('total_premium', 0) if result else 0
-    premium_counts = {p: result[0].get(f'{p}_premium', 0) if result else 0 for p in PREMIUM_PLATFORMS}
-    total_uploads = await asyncio.to_thread(db.uploads.count_documents, {})
-    
     stats_text = (
         f"📊 **{to_bold_sans('Bot Dashboard:')}**\n\n"
         f"**Users**\n"
-        f"👥 Total Users: `{total_users}`\n"
-        f"⭐ Premium Users: `{total_premium_users}`\n"
+        f"👥 Total Users: `{snapshot['total_users']}`\n"
+        f"⭐ Premium Users: `{snapshot['total_premium']}`\n"
     )
     for p in PREMIUM_PLATFORMS:
-        stats_text += f"    - {p.capitalize()} Premium: `{premium_counts[p]}`\n"
+        stats_text += f"    - {p.capitalize()} Premium: `{snapshot['premium'][p]}`\n"
         
     stats_text += (
         f"\n**Uploads**\n"
-        f"📈 Total Uploads: `{total_uploads}`\n"
+        f"📈 Total Uploads: `{snapshot['total_uploads']}`\n"
     )
     for p in PREMIUM_PLATFORMS:
-        stats_text += f"    - {p.capitalize()}: `{await asyncio.to_thread(db.uploads.count_documents, {'platform': p})}`\n"
+        stats_text += f"    - {p.capitalize()}: `{snapshot['uploads'][p]}`\n"
 
     stats_text += f"\n**Events**\n📢 Special Event Status: `{'ON' if global_settings.get('special_event_toggle') else 'OFF'}`"
     
@@ -1276,7 +1617,7 @@ async def show_stats(_, msg_or_query):
     else:
         await message.reply(stats_text)
 
-@app.on_message(filters.regex("👤 Account Info"))
+@Client.on_message(filters.regex(rendering.label_pattern("account_info")))
 async def account_info_handler(_, msg):
     user_id = msg.from_user.id
     if is_admin(user_id):
@@ -1316,7 +1657,8 @@ async def account_info_handler(_, msg):
             channel_name = s_data.get('name', 'N/A')
             info_text += f"  - **Channel:** {channel_name}\n"
             try:
-                creds = Credentials.from_authorized_user_info(json.loads(s_data['credentials_json']))
+                google = await executors.run("io", platform_sdks.google)
+                creds = google.Credentials.from_authorized_user_info(json.loads(s_data['credentials_json']))
                 expiry = creds.expiry
                 remaining = expiry - datetime.now(timezone.utc)
                 if remaining.total_seconds() > 0:
@@ -1334,50 +1676,54 @@ async def account_info_handler(_, msg):
     await msg.reply(info_text)
 
 
-@app.on_message(filters.regex("^(📘 FB ᴩᴏꜱᴛ|📘 FB ᴠɪᴅᴇᴏ|📘 FB ʀᴇᴇʟꜱ|▶️ YT ᴠɪᴅᴇᴏ|🟥 YT ꜱʜᴏʀᴛꜱ)"))
+UPLOAD_BUTTONS = {
+    "fb_post": ("facebook", "post"),
+    "fb_video": ("facebook", "video"),
+    "fb_reels": ("facebook", "reels"),
+    "yt_video": ("youtube", "video"),
+    "yt_shorts": ("youtube", "short"),
+}
+
+@Client.on_message(filters.regex(rendering.label_pattern(*UPLOAD_BUTTONS)))
 @with_user_lock
 async def initiate_upload(_, msg):
     user_id = msg.from_user.id
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
-
-    type_map = {
-        "📘 FB ᴩᴏꜱᴛ": ("facebook", "post"),
-        "📘 FB ᴠɪᴅᴇᴏ": ("facebook", "video"),
-        "📘 FB ʀᴇᴇʟꜱ": ("facebook", "reels"),
-        "▶️ YT ᴠɪᴅᴇᴏ": ("youtube", "video"),
-        "🟥 YT ꜱʜᴏʀᴛꜱ": ("youtube", "short"),
-    }
-    platform, upload_type = type_map[msg.text]
+    touch_user(user_id)
+
+    platform, upload_type = UPLOAD_BUTTONS[rendering.label_key(msg.text)]
+    lang = await get_user_language(user_id)
     
     if not await is_premium_for_platform(user_id, platform):
-        return await msg.reply(f"❌ " + to_bold_sans(f"Your Access Is Denied. Please Upgrade To {platform.capitalize()} Premium."))
+        return await msg.reply(render("access_denied", lang, platform=platform.capitalize()))
 
     sessions = await load_platform_sessions(user_id, platform)
     if not sessions:
-        return await msg.reply(f"❌ " + to_bold_sans(f"Please Login To {platform.capitalize()} First Using `/{'f' if platform == 'facebook' else 'y'}login`"), parse_mode=enums.ParseMode.MARKDOWN)
+        return await msg.reply(render("login_first", lang, platform=platform.capitalize(), command=f"{'f' if platform == 'facebook' else 'y'}login"), parse_mode=enums.ParseMode.MARKDOWN)
     
     action = f"waiting_for_media"
     user_states[user_id] = {
         "action": action,
         "platform": platform,
         "upload_type": upload_type,
+        "lang": lang,
         "file_info": {}
     }
     
-    media_type = "photo" if upload_type == "post" else "video"
-    await msg.reply("✅ " + to_bold_sans(f"Send The {media_type} File, Ready When You Are!"), reply_markup=ReplyKeyboardRemove())
+    media_type = render("media_photo" if upload_type == "post" else "media_video", lang)
+    await msg.reply(render("send_media", lang, media_type=media_type), reply_markup=ReplyKeyboardRemove())
 
 
 # ===================================================================
 # ======================== TEXT HANDLERS ============================
 # ===================================================================
 
-@app.on_message(filters.text & filters.private & ~filters.command(""))
+@Client.on_message(filters.text & filters.private & ~filters.command(""))
 @with_user_lock
 async def handle_text_input(_, msg):
+    """Routes a text reply to the handler registered for the user's conversation state."""
     user_id = msg.from_user.id
     state_data = user_states.get(user_id)
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
+    touch_user(user_id)
 
     if not state_data:
         return
@@ -1385,384 +1731,466 @@ async def handle_text_input(_, msg):
     if "secret_messages" in state_data:
         state_data["secret_messages"].append(msg.id)
 
-    action = state_data.get("action")
+    await router.dispatch_state(state_data.get("action"), msg, state_data)
+
+
+# --- Conversation state handlers (registered with the router) ---
+
+@router.state("waiting_for_fb_app_id")
+async def state_fb_app_id(msg, state_data):
     prompt_msg = state_data.get("prompt_msg")
+    state_data["login_data"]["app_id"] = msg.text.strip()
+    state_data["action"] = "waiting_for_fb_app_secret"
+    await prompt_msg.edit(to_bold_sans("🔑 Please Enter Your Facebook App Secret."))
+
+@router.state("waiting_for_fb_app_secret")
+async def state_fb_app_secret(msg, state_data):
+    prompt_msg = state_data.get("prompt_msg")
+    state_data["login_data"]["app_secret"] = msg.text.strip()
+    state_data["action"] = "waiting_for_fb_page_token"
+    await prompt_msg.edit(
+        to_bold_sans("🔑 Please Enter Your Facebook Page API Token.") +
+        "\n\nThis is a Page Access Token, not a User Token."
+    )
+
+@router.state("waiting_for_fb_page_token")
+async def state_fb_page_token(msg, state_data):
+    user_id = msg.from_user.id
+    prompt_msg = state_data.get("prompt_msg")
+    token = msg.text.strip()
+    app_id = state_data["login_data"]["app_id"]
+    app_secret = state_data["login_data"]["app_secret"]
+    
+    await prompt_msg.edit("🔐 " + to_bold_sans("Validating and extending token..."))
+    
+    try:
+        # Exchange for a long-lived token
+        exchange_url = (f"{FB_GRAPH_URL}/v19.0/oauth/access_token?"
+                        f"grant_type=fb_exchange_token&"
+                        f"client_id={app_id}&"
+                        f"client_secret={app_secret}&"
+                        f"fb_exchange_token={token}")
+        token_data = await executors.run("io", fb_get_json, exchange_url)
+        long_lived_token = token_data['access_token']
+        expires_in = token_data.get('expires_in', 5184000) # Default to 60 days
+        expires_at = int(time.time()) + expires_in
+
+        # Get Page ID and Name
+        page_url = f"{FB_GRAPH_URL}/v19.0/me?access_token={long_lived_token}&fields=id,name,picture.type(large)"
+        page_data = await executors.run("io", fb_get_json, page_url)
         
-    if action == "waiting_for_fb_app_id":
-        state_data["login_data"]["app_id"] = msg.text.strip()
-        state_data["action"] = "waiting_for_fb_app_secret"
-        await prompt_msg.edit(to_bold_sans("🔑 Please Enter Your Facebook App Secret."))
-    
-    elif action == "waiting_for_fb_app_secret":
-        state_data["login_data"]["app_secret"] = msg.text.strip()
-        state_data["action"] = "waiting_for_fb_page_token"
-        await prompt_msg.edit(
-            to_bold_sans("🔑 Please Enter Your Facebook Page API Token.") +
-            "\n\nThis is a Page Access Token, not a User Token."
-        )
+        page_id = page_data.get('id')
+        page_name = page_data.get('name')
+        page_picture_url = page_data.get('picture', {}).get('data', {}).get('url')
+
+        if not page_id or not page_name:
+            raise ValueError("Could not fetch Page ID/Name. Please ensure it's a valid Page Access Token.")
 
-    elif action == "waiting_for_fb_page_token":
-        token = msg.text.strip()
-        app_id = state_data["login_data"]["app_id"]
-        app_secret = state_data["login_data"]["app_secret"]
+        session_data = {
+            'id': page_id, 'name': page_name, 'picture_url': page_picture_url,
+            'app_id': app_id, 'app_secret': app_secret,
+            'access_token': long_lived_token, 'expires_at': expires_at
+        }
+        await save_platform_session(user_id, "facebook", session_data)
         
-        await prompt_msg.edit("🔐 " + to_bold_sans("Validating and extending token..."))
+        user_settings = await get_user_settings(user_id)
+        user_settings["active_facebook_id"] = page_id
+        await save_user_settings(user_id, user_settings)
         
-        try:
-            # Exchange for a long-lived token
-            exchange_url = (f"https://graph.facebook.com/v19.0/oauth/access_token?"
-                            f"grant_type=fb_exchange_token&"
-                            f"client_id={app_id}&"
-                            f"client_secret={app_secret}&"
-                            f"fb_exchange_token={token}")
-            exchange_res = requests.get(exchange_url)
-            token_data = check_fb_response(exchange_res)
-            long_lived_token = token_data['access_token']
-            expires_in = token_data.get('expires_in', 5184000) # Default to 60 days
-            expires_at = int(time.time()) + expires_in
-
-            # Get Page ID and Name
-            page_url = f"https://graph.facebook.com/v19.0/me?access_token={long_lived_token}&fields=id,name,picture.type(large)"
-            page_res = requests.get(page_url)
-            page_data = check_fb_response(page_res)
-            
-            page_id = page_data.get('id')
-            page_name = page_data.get('name')
-            page_picture_url = page_data.get('picture', {}).get('data', {}).get('url')
-
-            if not page_id or not page_name:
-                raise ValueError("Could not fetch Page ID/Name. Please ensure it's a valid Page Access Token.")
-
-            session_data = {
-                'id': page_id, 'name': page_name, 'picture_url': page_picture_url,
-                'app_id': app_id, 'app_secret': app_secret,
-                'access_token': long_lived_token, 'expires_at': expires_at
-            }
-            await save_platform_session(user_id, "facebook", session_data)
-            
-            user_settings = await get_user_settings(user_id)
-            user_settings["active_facebook_id"] = page_id
-            await save_user_settings(user_id, user_settings)
-            
-            success_caption = (
-                f"✅ **Login Successful!**\n\n"
-                f"**Page Name:** `{page_name}`\n"
-                f"**Page ID:** `{page_id}`\n\n"
-                "This is now your active Facebook account."
-            )
-            await prompt_msg.delete()
-            if state_data.get("secret_messages"):
-                await app.delete_messages(user_id, state_data["secret_messages"])
+        success_caption = (
+            f"✅ **Login Successful!**\n\n"
+            f"**Page Name:** `{page_name}`\n"
+            f"**Page ID:** `{page_id}`\n\n"
+            "This is now your active Facebook account."
+        )
+        await prompt_msg.delete()
+        if state_data.get("secret_messages"):
+            await app.delete_messages(user_id, state_data["secret_messages"])
 
-            if page_picture_url:
-                await msg.reply_photo(photo=page_picture_url, caption=success_caption)
-            else:
-                await msg.reply(success_caption)
-            
-            await send_log_to_channel(app, LOG_CHANNEL, f"📝 FB Login: User `{user_id}`, Page: `{page_name}`")
+        if page_picture_url:
+            await msg.reply_photo(photo=page_picture_url, caption=success_caption)
+        else:
+            await msg.reply(success_caption)
         
-        except (requests.RequestException, ValueError) as e:
-            await prompt_msg.edit(f"❌ **Login Failed:**\n`{e}`\n\nPlease try `/fblogin` again.")
-        finally:
-            if user_id in user_states: del user_states[user_id]
+        await send_log_to_channel(app, LOG_CHANNEL, f"📝 FB Login: User `{user_id}`, Page: `{page_name}`")
+    
+    except (platform_sdks.http().RequestException, ValueError) as e:
+        await prompt_msg.edit(f"❌ **Login Failed:**\n`{e}`\n\nPlease try `/fblogin` again.")
+    finally:
+        if user_id in user_states: del user_states[user_id]
 
-    elif action == "waiting_for_yt_client_id":
-        state_data["login_data"]["client_id"] = msg.text.strip()
-        state_data["action"] = "waiting_for_yt_client_secret"
-        await prompt_msg.edit(to_bold_sans("🔑 Please Enter Your YouTube OAuth Client Secret."))
+@router.state("waiting_for_yt_client_id")
+async def state_yt_client_id(msg, state_data):
+    prompt_msg = state_data.get("prompt_msg")
+    state_data["login_data"]["client_id"] = msg.text.strip()
+    state_data["action"] = "waiting_for_yt_client_secret"
+    await prompt_msg.edit(to_bold_sans("🔑 Please Enter Your YouTube OAuth Client Secret."))
 
-    elif action == "waiting_for_yt_client_secret":
-        state_data["login_data"]["client_secret"] = msg.text.strip()
-        client_id = state_data["login_data"]["client_id"]
-        client_secret = state_data["login_data"]["client_secret"]
+@router.state("waiting_for_yt_client_secret")
+async def state_yt_client_secret(msg, state_data):
+    user_id = msg.from_user.id
+    prompt_msg = state_data.get("prompt_msg")
+    state_data["login_data"]["client_secret"] = msg.text.strip()
+    client_id = state_data["login_data"]["client_id"]
+    client_secret = state_data["login_data"]["client_secret"]
+    
+    try:
+        client_config = { "web": {
+                "client_id": client_id, "client_secret": client_secret,
+                "auth_uri": "https://accounts.google.com/o/oauth2/auth",
+                "token_uri": "https://oauth2.googleapis.com/token",
+                "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
+        }}
         
-        try:
-            client_config = { "web": {
-                    "client_id": client_id, "client_secret": client_secret,
-                    "auth_uri": "https://accounts.google.com/o/oauth2/auth",
-                    "token_uri": "https://oauth2.googleapis.com/token",
-                    "auth_provider_x509_cert_url": "https://www.googleapis.com/oauth2/v1/certs",
-            }}
-            
-            flow = Flow.from_client_config(
-                client_config,
-                scopes=['https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube'],
-                redirect_uri=REDIRECT_URI
-            )
-            auth_url, state = flow.authorization_url(access_type='offline', prompt='consent')
-            oauth_flows[state] = flow
-            state_data["oauth_state"] = state
-            state_data["action"] = "waiting_for_yt_auth_code"
+        google = await executors.run("io", platform_sdks.google)
+        flow = google.Flow.from_client_config(
+            client_config,
+            scopes=['https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube'],
+            redirect_uri=REDIRECT_URI
+        )
+        auth_url, state = flow.authorization_url(access_type='offline', prompt='consent')
+        oauth_flows[state] = {"user_id": user_id, "flow": flow}
+        state_data["oauth_state"] = state
+        state_data["action"] = "waiting_for_yt_auth_code"
 
-            markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔗 Google OAuth Link", url=auth_url)]])
-            
-            await prompt_msg.edit(
-                "✅ " + to_bold_sans("Credentials accepted.") + "\n\n"
-                "⬇️ " + to_bold_sans("Click the link, allow access, and copy the code/URL.") + "\n\n"
-                "Copy the **full URL** from the page you are redirected to and send it back to me.\n\n"
-                "**Note:** If you see 'Access blocked' or '401 invalid_client', ensure your app is **Published** in Google Cloud and you are a **Test User**.",
-                reply_markup=markup
-            )
-        except Exception as e:
-            await prompt_msg.edit(f"❌ " + to_bold_sans(f"Failed to process credentials. Error: {e}"))
-            if user_id in user_states: del user_states[user_id]
-            
-    elif action == "waiting_for_yt_auth_code":
-        auth_code_or_url = msg.text.strip()
-        await prompt_msg.edit("🔐 " + to_bold_sans("Exchanging code for tokens..."))
+        markup = InlineKeyboardMarkup([[InlineKeyboardButton("🔗 Google OAuth Link", url=auth_url)]])
         
-        state = state_data.get("oauth_state")
-        if not state or state not in oauth_flows:
-            return await prompt_msg.edit("❌ " + to_bold_sans("Invalid/expired session. Please try /ytlogin again."))
+        await prompt_msg.edit(
+            "✅ " + to_bold_sans("Credentials accepted.") + "\n\n"
+            "⬇️ " + to_bold_sans("Click the link, allow access, and copy the code/URL.") + "\n\n"
+            "When the page you are redirected to confirms the login, you're done. Otherwise copy the **full URL** from it and send it back to me.\n\n"
+            "**Note:** If you see 'Access blocked' or '401 invalid_client', ensure your app is **Published** in Google Cloud and you are a **Test User**.",
+            reply_markup=markup
+        )
+    except Exception as e:
+        await prompt_msg.edit(f"❌ " + to_bold_sans(f"Failed to process credentials. Error: {e}"))
+        if user_id in user_states: del user_states[user_id]
 
-        flow = oauth_flows[state]
-        try:
-            if "localhost" in auth_code_or_url or "code=" in auth_code_or_url:
-                await asyncio.to_thread(flow.fetch_token, authorization_response=auth_code_or_url)
-            else:
-                await asyncio.to_thread(flow.fetch_token, code=auth_code_or_url)
-            
-            credentials = flow.credentials
-            
-            youtube = build('youtube', 'v3', credentials=credentials)
-            channels_response = await asyncio.to_thread(youtube.channels().list(part='snippet,contentDetails', mine=True).execute)
-            
-            if not channels_response.get('items'):
-                return await prompt_msg.edit("❌ " + to_bold_sans("No YouTube Channel Found For This Account."))
-            
-            channel = channels_response['items'][0]
-            channel_id = channel['id']
-            channel_name = channel['snippet']['title']
-            
-            session_data = {
-                'id': channel_id, 'name': channel_name,
-                'credentials_json': credentials.to_json(),
-                'client_id': flow.client_config.get('client_id')
-            }
-            await save_platform_session(user_id, "youtube", session_data)
-            
-            user_settings = await get_user_settings(user_id)
-            user_settings["active_youtube_id"] = channel_id
-            await save_user_settings(user_id, user_settings)
-            
+async def complete_youtube_login(state, auth_code_or_url):
+    """Exchanges an OAuth code for tokens and saves the channel; returns (ok, message for the user).
+
+    Reached from the redirect endpoint, or when the user pastes the code/URL into the chat.
+    """
+    entry = oauth_flows.pop(state, None) if state else None
+    if entry is None:
+        return False, "Invalid/expired session. Please try /ytlogin again."
+    user_id, flow = entry["user_id"], entry["flow"]
+    state_data = user_states.get(user_id) or {}
+    prompt_msg = state_data.get("prompt_msg")
+    if prompt_msg:
+        await safe_edit_message(prompt_msg, "🔐 " + to_bold_sans("Exchanging code for tokens..."))
+
+    try:
+        if "localhost" in auth_code_or_url or "code=" in auth_code_or_url:
+            await executors.run("io", flow.fetch_token, authorization_response=auth_code_or_url)
+        else:
+            await executors.run("io", flow.fetch_token, code=auth_code_or_url)
+        
+        credentials = flow.credentials
+        
+        google = await executors.run("io", platform_sdks.google)
+        youtube = await executors.run("io", google.build, 'youtube', 'v3', credentials=credentials,
+                                      client_options=YOUTUBE_CLIENT_OPTIONS)
+        channels_response = await executors.run("io", youtube.channels().list(part='snippet,contentDetails', mine=True).execute)
+        
+        if not channels_response.get('items'):
+            if prompt_msg:
+                await safe_edit_message(prompt_msg, "❌ " + to_bold_sans("No YouTube Channel Found For This Account."))
+            return False, "No YouTube channel was found for this Google account."
+        
+        channel = channels_response['items'][0]
+        channel_id = channel['id']
+        channel_name = channel['snippet']['title']
+        
+        session_data = {
+            'id': channel_id, 'name': channel_name,
+            'credentials_json': credentials.to_json(),
+            'client_id': flow.client_config.get('client_id')
+        }
+        await save_platform_session(user_id, "youtube", session_data)
+        
+        user_settings = await get_user_settings(user_id)
+        user_settings["active_youtube_id"] = channel_id
+        await save_user_settings(user_id, user_settings)
+        
+        if prompt_msg:
             await prompt_msg.delete()
-            if state_data.get("secret_messages"):
-                await app.delete_messages(user_id, state_data["secret_messages"])
+        if state_data.get("secret_messages"):
+            await app.delete_messages(user_id, state_data["secret_messages"])
 
-            await msg.reply(
-                f"✅ {to_bold_sans('Successfully logged in!')}\n\n"
-                f"**Channel Name:** `{channel_name}`\n"
-                f"**Channel ID:** `{channel_id}`"
-            )
-            
-            await send_log_to_channel(app, LOG_CHANNEL, f"📝 YT Login: User `{user_id}`, Channel: `{channel_name}`")
-        except Exception as e:
-            await prompt_msg.edit(
+        await app.send_message(
+            user_id,
+            f"✅ {to_bold_sans('Successfully logged in!')}\n\n"
+            f"**Channel Name:** `{channel_name}`\n"
+            f"**Channel ID:** `{channel_id}`"
+        )
+        
+        await send_log_to_channel(app, LOG_CHANNEL, f"📝 YT Login: User `{user_id}`, Channel: `{channel_name}`")
+        return True, f"Logged in as {channel_name}. You can close this window and return to the bot."
+    except Exception as e:
+        if prompt_msg:
+            await safe_edit_message(
+                prompt_msg,
                 f"❌ {to_bold_sans('Login Failed.')}\n"
                 f"Error: `{e}`\n\n"
                 "Please check your credentials and ensure your Google Cloud project is configured correctly."
             )
-            logger.error(f"YouTube token exchange failed for {user_id}: {e}")
-        finally:
-            if state in oauth_flows: del oauth_flows[state]
-            if user_id in user_states: del user_states[user_id]
-
-    elif action.startswith("waiting_for_caption_"):
-        platform = action.split("_")[-1]
-        settings = await get_user_settings(user_id)
-        settings[f"caption_{platform}"] = msg.text
-        await save_user_settings(user_id, settings)
-        await msg.reply("✅ " + to_bold_sans(f"Default Caption For {platform.capitalize()} Has Been Set."))
-        if user_id in user_states: del user_states[user_id]
+        logger.error(f"YouTube token exchange failed for {user_id}: {e}")
+        return False, "Login failed. Check the bot chat for details."
+    finally:
+        if user_states.get(user_id) is state_data and state_data:
+            del user_states[user_id]
+
+@router.state("waiting_for_yt_auth_code")
+async def state_yt_auth_code(msg, state_data):
+    state = state_data.get("oauth_state")
+    if not state or state not in oauth_flows:
+        if msg.from_user.id in user_states: del user_states[msg.from_user.id]
+        return await state_data["prompt_msg"].edit("❌ " + to_bold_sans("Invalid/expired session. Please try /ytlogin again."))
+    await complete_youtube_login(state, msg.text.strip())
+
+@router.state("waiting_for_caption_", prefix=True)
+async def state_default_caption(msg, state_data):
+    user_id = msg.from_user.id
+    action = state_data["action"]
+    platform = action.split("_")[-1]
+    settings = await get_user_settings(user_id)
+    settings[f"caption_{platform}"] = msg.text
+    await save_user_settings(user_id, settings)
+    await msg.reply("✅ " + to_bold_sans(f"Default Caption For {platform.capitalize()} Has Been Set."))
+    if user_id in user_states: del user_states[user_id]
 
-    elif action.startswith("waiting_for_description_"):
-        platform = action.split("_")[-1]
-        settings = await get_user_settings(user_id)
-        settings[f"description_{platform}"] = msg.text
-        await save_user_settings(user_id, settings)
-        await msg.reply("✅ " + to_bold_sans(f"Default Description For {platform.capitalize()} Has Been Set."))
-        if user_id in user_states: del user_states[user_id]
+@router.state("waiting_for_description_", prefix=True)
+async def state_default_description(msg, state_data):
+    user_id = msg.from_user.id
+    action = state_data["action"]
+    platform = action.split("_")[-1]
+    settings = await get_user_settings(user_id)
+    settings[f"description_{platform}"] = msg.text
+    await save_user_settings(user_id, settings)
+    await msg.reply("✅ " + to_bold_sans(f"Default Description For {platform.capitalize()} Has Been Set."))
+    if user_id in user_states: del user_states[user_id]
 
-    elif action.startswith("waiting_for_title_"):
-        platform = action.split("_")[-1]
-        settings = await get_user_settings(user_id)
-        settings[f"title_{platform}"] = msg.text
-        await save_user_settings(user_id, settings)
-        await msg.reply("✅ " + to_bold_sans(f"Default Title For {platform.capitalize()} Has Been Set."))
-        if user_id in user_states: del user_states[user_id]
+@router.state("waiting_for_title_", prefix=True)
+async def state_default_title(msg, state_data):
+    user_id = msg.from_user.id
+    action = state_data["action"]
+    platform = action.split("_")[-1]
+    settings = await get_user_settings(user_id)
+    settings[f"title_{platform}"] = msg.text
+    await save_user_settings(user_id, settings)
+    await msg.reply("✅ " + to_bold_sans(f"Default Title For {platform.capitalize()} Has Been Set."))
+    if user_id in user_states: del user_states[user_id]
 
-    elif action == "waiting_for_tags_youtube":
-        settings = await get_user_settings(user_id)
-        settings["tags_youtube"] = msg.text
-        await save_user_settings(user_id, settings)
-        await msg.reply("✅ " + to_bold_sans("Default Tags For YouTube Have Been Set."))
-        if user_id in user_states: del user_states[user_id]
+@router.state("waiting_for_tags_youtube")
+async def state_default_tags(msg, state_data):
+    user_id = msg.from_user.id
+    settings = await get_user_settings(user_id)
+    settings["tags_youtube"] = msg.text
+    await save_user_settings(user_id, settings)
+    await msg.reply("✅ " + to_bold_sans("Default Tags For YouTube Have Been Set."))
+    if user_id in user_states: del user_states[user_id]
 
-    elif action == "waiting_for_title":
-        state_data["file_info"]["title"] = msg.text
-        await process_upload_step(msg)
-    elif action == "waiting_for_description":
-        state_data["file_info"]["description"] = msg.text
-        await process_upload_step(msg)
-    elif action == "waiting_for_tags":
-        state_data["file_info"]["tags"] = msg.text
-        await process_upload_step(msg)
-    elif action == "waiting_for_schedule_time":
-        try:
-            dt_naive = datetime.strptime(msg.text.strip(), "%Y-%m-%d %H:%M")
-            schedule_time_utc = dt_naive.replace(tzinfo=timezone.utc)
-            
-            if schedule_time_utc <= datetime.now(timezone.utc):
-                await safe_threaded_reply(
-                    state_data["file_info"]["original_media_msg"],
-                    "❌ " + to_bold_sans("Scheduled time must be in the future."),
-                    status_message=state_data.get("status_msg")
-                )
-                return
-            
-            state_data['file_info']['schedule_time'] = schedule_time_utc
-            await process_upload_step(msg)
-        except ValueError:
+@router.state("waiting_for_title")
+async def state_upload_title(msg, state_data):
+    state_data["file_info"]["title"] = msg.text
+    await process_upload_step(msg)
+
+@router.state("waiting_for_description")
+async def state_upload_description(msg, state_data):
+    state_data["file_info"]["description"] = msg.text
+    await process_upload_step(msg)
+
+@router.state("waiting_for_tags")
+async def state_upload_tags(msg, state_data):
+    state_data["file_info"]["tags"] = msg.text
+    await process_upload_step(msg)
+
+@router.state("waiting_for_schedule_time")
+async def state_schedule_time(msg, state_data):
+    try:
+        dt_naive = datetime.strptime(msg.text.strip(), "%Y-%m-%d %H:%M")
+        schedule_time_utc = dt_naive.replace(tzinfo=timezone.utc)
+        
+        if schedule_time_utc <= datetime.now(timezone.utc):
             await safe_threaded_reply(
                 state_data["file_info"]["original_media_msg"],
-                "❌ " + to_bold_sans("Invalid format. Please use `YYYY-MM-DD HH:MM` in UTC."),
+                render("schedule_in_past", state_data.get("lang", DEFAULT_LANGUAGE)),
                 status_message=state_data.get("status_msg")
             )
-
-    elif action in ["waiting_for_thumbnail_choice", "waiting_for_thumbnail"]:
-        original_media_msg = state_data.get("file_info", {}).get("original_media_msg")
-        correction_text = "❌ " + to_bold_sans("Invalid input. Please either click a button below or send a PHOTO for the thumbnail.")
-        if original_media_msg:
-            await original_media_msg.reply(correction_text)
-        else:
-            await msg.reply(correction_text)
-        return
+            return
         
-    elif action == "waiting_for_broadcast_message":
-        if not is_admin(user_id): return
+        state_data['file_info']['schedule_time'] = schedule_time_utc
+        await process_upload_step(msg)
+    except ValueError:
+        await safe_threaded_reply(
+            state_data["file_info"]["original_media_msg"],
+            render("schedule_bad_format", state_data.get("lang", DEFAULT_LANGUAGE)),
+            status_message=state_data.get("status_msg")
+        )
+
+@router.state("waiting_for_thumbnail_choice", "waiting_for_thumbnail")
+async def state_thumbnail_expected(msg, state_data):
+    original_media_msg = state_data.get("file_info", {}).get("original_media_msg")
+    correction_text = render("thumbnail_expected", state_data.get("lang", DEFAULT_LANGUAGE))
+    if original_media_msg:
+        await original_media_msg.reply(correction_text)
+    else:
+        await msg.reply(correction_text)
+
+@router.state("waiting_for_broadcast_message")
+async def state_broadcast_message(msg, state_data):
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    
+    if msg.text:
+        await broadcast_message(msg, text=msg.text, reply_markup=msg.reply_markup)
+    elif msg.photo:
+        await broadcast_message(msg, photo=msg.photo.file_id, caption=msg.caption, reply_markup=msg.reply_markup)
+    elif msg.video:
+        await broadcast_message(msg, video=msg.video.file_id, caption=msg.caption, reply_markup=msg.reply_markup)
+    else:
+        await msg.reply("Unsupported broadcast format.")
         
-        if msg.text:
-            await broadcast_message(msg, text=msg.text, reply_markup=msg.reply_markup)
-        elif msg.photo:
-            await broadcast_message(msg, photo=msg.photo.file_id, caption=msg.caption, reply_markup=msg.reply_markup)
-        elif msg.video:
-            await broadcast_message(msg, video=msg.video.file_id, caption=msg.caption, reply_markup=msg.reply_markup)
-        else:
-            await msg.reply("Unsupported broadcast format.")
-            
+    if user_id in user_states: del user_states[user_id]
+
+@router.state("waiting_for_target_user_id_premium_management")
+async def state_premium_target_user(msg, state_data):
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    try:
+        target_user_id = int(msg.text)
+        user_states[user_id] = {"action": "select_platforms_for_premium", "target_user_id": target_user_id, "selected_platforms": {}}
+        await msg.reply(
+            f"✅ " + to_bold_sans(f"User `{target_user_id}`. Select Platforms:"),
+            reply_markup=get_platform_selection_markup(user_id, {})
+        )
+    except ValueError:
+        await msg.reply("❌ " + to_bold_sans("Invalid User Id."))
         if user_id in user_states: del user_states[user_id]
 
-    elif action == "waiting_for_target_user_id_premium_management":
-        if not is_admin(user_id): return
-        try:
-            target_user_id = int(msg.text)
-            user_states[user_id] = {"action": "select_platforms_for_premium", "target_user_id": target_user_id, "selected_platforms": {}}
-            await msg.reply(
-                f"✅ " + to_bold_sans(f"User `{target_user_id}`. Select Platforms:"),
-                reply_markup=get_platform_selection_markup(user_id, {})
-            )
-        except ValueError:
-            await msg.reply("❌ " + to_bold_sans("Invalid User Id."))
-            if user_id in user_states: del user_states[user_id]
+@router.state("waiting_for_user_id_for_details")
+async def state_user_details_target(msg, state_data):
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    try:
+        target_user_id = int(msg.text)
+        await show_user_details(msg, target_user_id)
+    except ValueError:
+        await msg.reply("❌ " + to_bold_sans("Invalid User Id."))
+    finally:
+        if user_id in user_states: del user_states[user_id]
 
-    elif action == "waiting_for_user_id_for_details":
-        if not is_admin(user_id): return
-        try:
-            target_user_id = int(msg.text)
-            await show_user_details(msg, target_user_id)
-        except ValueError:
-            await msg.reply("❌ " + to_bold_sans("Invalid User Id."))
-        finally:
-            if user_id in user_states: del user_states[user_id]
-            
-    elif action == "waiting_for_max_uploads":
-        if not is_admin(user_id): return
-        try:
-            new_limit = int(msg.text)
-            if new_limit <= 0: return await msg.reply("❌ " + to_bold_sans("Must Be A Positive Integer."))
-            await _update_global_setting("max_concurrent_uploads", new_limit)
-            global upload_semaphore
-            upload_semaphore = asyncio.Semaphore(new_limit)
-            await msg.reply(f"✅ " + to_bold_sans(f"Max Concurrent Uploads Set To `{new_limit}`."))
-            if user_id in user_states: del user_states[user_id]
-            await show_global_settings_panel(msg)
-        except ValueError:
-            await msg.reply("❌ " + to_bold_sans("Invalid Input."))
-
-    elif action == "waiting_for_max_file_size":
-        if not is_admin(user_id): return
-        try:
-            new_limit = int(msg.text)
-            if new_limit <= 0: return await msg.reply("❌ " + to_bold_sans("Must Be A Positive Integer."))
-            await _update_global_setting("max_file_size_mb", new_limit)
-            global MAX_FILE_SIZE_BYTES
-            MAX_FILE_SIZE_BYTES = new_limit * 1024 * 1024
-            await msg.reply(f"✅ " + to_bold_sans(f"Max File Size Set To `{new_limit}` MB."))
-            if user_id in user_states: del user_states[user_id]
-            await show_global_settings_panel(msg)
-        except ValueError:
-            await msg.reply("❌ " + to_bold_sans("Invalid Input."))
-
-    elif action in ["waiting_for_event_title", "waiting_for_event_message"]:
-        if not is_admin(user_id): return
-        setting_key = "special_event_title" if action == "waiting_for_event_title" else "special_event_message"
-        await _update_global_setting(setting_key, msg.text)
-        await msg.reply(f"✅ " + to_bold_sans(f"Special Event `{setting_key.split('_')[-1]}` Updated!"))
+@router.state("waiting_for_max_uploads")
+async def state_max_uploads(msg, state_data):
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    try:
+        new_limit = int(msg.text)
+        if new_limit <= 0: return await msg.reply("❌ " + to_bold_sans("Must Be A Positive Integer."))
+        await _update_global_setting("max_concurrent_uploads", new_limit)
+        await upload_limiter.set_max(new_limit)
+        await msg.reply(f"✅ " + to_bold_sans(f"Max Concurrent Uploads Set To `{new_limit}`."))
         if user_id in user_states: del user_states[user_id]
         await show_global_settings_panel(msg)
+    except ValueError:
+        await msg.reply("❌ " + to_bold_sans("Invalid Input."))
 
-    elif action.startswith("waiting_for_payment_details_"):
-        if not is_admin(user_id): return
-        payment_method = action.replace("waiting_for_payment_details_", "")
-        new_payment_settings = global_settings.get("payment_settings", {})
-        new_payment_settings[payment_method] = msg.text
-        await _update_global_setting("payment_settings", new_payment_settings)
-        await msg.reply(f"✅ " + to_bold_sans(f"Payment Details For **{payment_method.upper()}** Updated."), reply_markup=payment_settings_markup)
+@router.state("waiting_for_max_file_size")
+async def state_max_file_size(msg, state_data):
+    global MAX_FILE_SIZE_BYTES
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    try:
+        new_limit = int(msg.text)
+        if new_limit <= 0: return await msg.reply("❌ " + to_bold_sans("Must Be A Positive Integer."))
+        await _update_global_setting("max_file_size_mb", new_limit)
+        MAX_FILE_SIZE_BYTES = new_limit * 1024 * 1024
+        await msg.reply(f"✅ " + to_bold_sans(f"Max File Size Set To `{new_limit}` MB."))
         if user_id in user_states: del user_states[user_id]
+        await show_global_settings_panel(msg)
+    except ValueError:
+        await msg.reply("❌ " + to_bold_sans("Invalid Input."))
 
-    elif action == "waiting_for_payment_instructions":
-        if not is_admin(user_id): return
-        new_payment_settings = global_settings.get("payment_settings", {})
-        new_payment_settings["instructions"] = msg.text
-        await _update_global_setting("payment_settings", new_payment_settings)
-        await msg.reply(f"✅ " + to_bold_sans("Payment Instructions Updated."), reply_markup=payment_settings_markup)
-        if user_id in user_states: del user_states[user_id]
+@router.state("waiting_for_event_title", "waiting_for_event_message")
+async def state_event_text(msg, state_data):
+    user_id = msg.from_user.id
+    action = state_data["action"]
+    if not is_admin(user_id): return
+    setting_key = "special_event_title" if action == "waiting_for_event_title" else "special_event_message"
+    await _update_global_setting(setting_key, msg.text)
+    await msg.reply(f"✅ " + to_bold_sans(f"Special Event `{setting_key.split('_')[-1]}` Updated!"))
+    if user_id in user_states: del user_states[user_id]
+    await show_global_settings_panel(msg)
 
-    elif action == "waiting_for_custom_button_name":
-        if not is_admin(user_id): return
-        user_states[user_id]['button_name'] = msg.text.strip()
-        user_states[user_id]['action'] = "waiting_for_custom_button_details"
-        await msg.reply("✍️ " + to_bold_sans("Enter Payment Details (text/Number/Address/Link):"))
+@router.state("waiting_for_payment_details_", prefix=True)
+async def state_payment_details(msg, state_data):
+    user_id = msg.from_user.id
+    action = state_data["action"]
+    if not is_admin(user_id): return
+    payment_method = action.replace("waiting_for_payment_details_", "")
+    new_payment_settings = global_settings.get("payment_settings", {})
+    new_payment_settings[payment_method] = msg.text
+    await _update_global_setting("payment_settings", new_payment_settings)
+    await msg.reply(f"✅ " + to_bold_sans(f"Payment Details For **{payment_method.upper()}** Updated."), reply_markup=payment_settings_markup)
+    if user_id in user_states: del user_states[user_id]
 
-    elif action == "waiting_for_custom_button_details":
-        if not is_admin(user_id): return
-        button_name = state_data['button_name']
-        button_details = msg.text.strip()
-        payment_settings = global_settings.get("payment_settings", {})
-        if "custom_buttons" not in payment_settings:
-            payment_settings["custom_buttons"] = {}
-        payment_settings["custom_buttons"][button_name] = button_details
-        await _update_global_setting("payment_settings", payment_settings)
-        await msg.reply(f"✅ " + to_bold_sans(f"Payment Button `{button_name}` Created."), reply_markup=payment_settings_markup)
-        if user_id in user_states: del user_states[user_id]
+@router.state("waiting_for_payment_instructions")
+async def state_payment_instructions(msg, state_data):
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    new_payment_settings = global_settings.get("payment_settings", {})
+    new_payment_settings["instructions"] = msg.text
+    await _update_global_setting("payment_settings", new_payment_settings)
+    await msg.reply(f"✅ " + to_bold_sans("Payment Instructions Updated."), reply_markup=payment_settings_markup)
+    if user_id in user_states: del user_states[user_id]
 
-    elif action == "waiting_for_payment_proof":
-        if 'payment_proof_message' in user_states[user_id]:
-            await msg.forward(ADMIN_ID)
-            await app.send_message(
-                ADMIN_ID, 
-                f"👆 Payment proof from user: `{user_id}` (@{msg.from_user.username or 'N/A'})"
-            )
-            await msg.reply("✅ Your proof has been sent to the admin for verification.")
-            if user_id in user_states: del user_states[user_id]
+@router.state("waiting_for_custom_button_name")
+async def state_custom_button_name(msg, state_data):
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    user_states[user_id]['button_name'] = msg.text.strip()
+    user_states[user_id]['action'] = "waiting_for_custom_button_details"
+    await msg.reply("✍️ " + to_bold_sans("Enter Payment Details (text/Number/Address/Link):"))
+
+@router.state("waiting_for_custom_button_details")
+async def state_custom_button_details(msg, state_data):
+    user_id = msg.from_user.id
+    if not is_admin(user_id): return
+    button_name = state_data['button_name']
+    button_details = msg.text.strip()
+    payment_settings = global_settings.get("payment_settings", {})
+    if "custom_buttons" not in payment_settings:
+        payment_settings["custom_buttons"] = {}
+    payment_settings["custom_buttons"][button_name] = button_details
+    await _update_global_setting("payment_settings", payment_settings)
+    await msg.reply(f"✅ " + to_bold_sans(f"Payment Button `{button_name}` Created."), reply_markup=payment_settings_markup)
+    if user_id in user_states: del user_states[user_id]
+
+@router.state("waiting_for_payment_proof")
+async def state_payment_proof(msg, state_data):
+    user_id = msg.from_user.id
+    if 'payment_proof_message' in user_states[user_id]:
+        await msg.forward(ADMIN_ID)
+        await app.send_message(
+            ADMIN_ID, 
+            f"👆 Payment proof from user: `{user_id}` (@{msg.from_user.username or 'N/A'})"
+        )
+        await msg.reply("✅ Your proof has been sent to the admin for verification.")
+        if user_id in user_states: del user_states[user_id]
 
 
 # ===================================================================
 # =================== CALLBACK QUERY HANDLERS =======================
 # ===================================================================
 
-@app.on_callback_query(filters.regex("^select_platform_"))
-@rate_limit_callbacks
+@Client.on_callback_query()
+async def route_callback_query(client, query):
+    """Single entry point for callback queries; handlers below register with the router."""
+    if not await router.dispatch_callback(query.data, client, query):
+        logger.debug(f"No route for callback data {query.data!r} from user {query.from_user.id}.")
+
+@router.callback("select_platform_", prefix=True)
 async def select_platform_for_premium_cb(_, query):
     user_id = query.from_user.id
     if not is_admin(user_id):
@@ -1784,8 +2212,7 @@ async def select_platform_for_premium_cb(_, query):
         reply_markup=get_platform_selection_markup(user_id, selected_platforms)
     )
 
-@app.on_callback_query(filters.regex("^confirm_platform_selection$"))
-@rate_limit_callbacks
+@router.callback("confirm_platform_selection")
 async def confirm_platform_selection_cb(_, query):
     user_id = query.from_user.id
     if not is_admin(user_id): return await query.answer("❌ Admin access required", show_alert=True)
@@ -1808,12 +2235,11 @@ async def confirm_platform_selection_cb(_, query):
         reply_markup=get_premium_plan_markup(user_id)
     )
 
-@app.on_callback_query(filters.regex("^grant_plan_"))
-@rate_limit_callbacks
+@router.callback("grant_plan_", prefix=True)
 async def grant_plan_cb(_, query):
     user_id = query.from_user.id
     if not is_admin(user_id): return await query.answer("❌ Admin access required", show_alert=True)
-    if db is None: return await query.answer("⚠️ Database unavailable.", show_alert=True)
+    if repo is None: return await query.answer("⚠️ Database unavailable.", show_alert=True)
     
     state_data = user_states.get(user_id)
     if not isinstance(state_data, dict) or state_data.get("action") != "select_premium_plan_for_platforms":
@@ -1827,7 +2253,7 @@ async def grant_plan_cb(_, query):
     if not plan_details:
         return await query.answer("Invalid premium plan.", show_alert=True)
     
-    target_user_data = await _get_user_data(target_user_id) or {"_id": target_user_id, "premium": {}}
+    target_user_data = await _get_user_data(target_user_id, "premium") or {"_id": target_user_id, "premium": {}}
     premium_data = target_user_data.get("premium", {})
     
     for platform in selected_platforms:
@@ -1844,6 +2270,9 @@ async def grant_plan_cb(_, query):
         premium_data[platform] = platform_premium_data
     
     await _save_user_data(target_user_id, {"premium": premium_data})
+    entitlement_cache.put(target_user_id, premium_data)
+    for platform in selected_platforms:
+        await rollups.record_premium_grant(platform, premium_plan_key)
     
     admin_confirm_text = f"✅ Premium granted to user `{target_user_id}` for:\n"
     user_msg_text = "🎉 **Congratulations!** 🎉\n\nYou have been granted premium access for:\n"
@@ -1872,8 +2301,7 @@ async def grant_plan_cb(_, query):
     
     await query.answer()
 
-@app.on_callback_query(filters.regex("^hub_settings_"))
-@rate_limit_callbacks
+@router.callback("hub_settings_", prefix=True)
 async def hub_settings_cb(_, query):
     platform = query.data.split("_")[-1]
     if platform == "facebook":
@@ -1882,8 +2310,7 @@ async def hub_settings_cb(_, query):
         await safe_edit_message(query.message, "⚙️ " + to_bold_sans("Configure YouTube Settings:"), reply_markup=get_youtube_settings_markup())
 
 # --- Account Management Callbacks ---
-@app.on_callback_query(filters.regex("^manage_(fb|yt)_accounts$"))
-@rate_limit_callbacks
+@router.callback("manage_fb_accounts", "manage_yt_accounts")
 async def manage_accounts_cb(_, query):
     user_id = query.from_user.id
     platform = "facebook" if "fb" in query.data else "youtube"
@@ -1911,8 +2338,7 @@ async def manage_accounts_cb(_, query):
         reply_markup=await get_account_markup(user_id, platform, logged_in_accounts)
     )
 
-@app.on_callback_query(filters.regex("^select_acc_"))
-@rate_limit_callbacks
+@router.callback("select_acc_", prefix=True)
 async def select_account_cb(_, query):
     user_id = query.from_user.id
     _, _, platform, acc_id = query.data.split("_")
@@ -1931,8 +2357,7 @@ async def select_account_cb(_, query):
             pass
     await manage_accounts_cb(app, MockQuery(query.from_user, query.message, f'manage_{"fb" if platform == "facebook" else "yt"}_accounts'))
 
-@app.on_callback_query(filters.regex("^manage_logout_"))
-@rate_limit_callbacks
+@router.callback("manage_logout_", prefix=True)
 async def manage_logout_cb(_, query):
     _, _, platform, acc_id = query.data.split("_")
     sessions = await load_platform_sessions(query.from_user.id, platform)
@@ -1944,13 +2369,12 @@ async def manage_logout_cb(_, query):
         reply_markup=get_logout_options_markup(platform, acc_id, acc_name)
     )
 
-@app.on_callback_query(filters.regex("^change_page_token_"))
-@rate_limit_callbacks
+@router.callback("change_page_token_", prefix=True)
 async def change_page_token_cb(_, query):
     user_id = query.from_user.id
     _, _, platform, acc_id = query.data.split("_")
     
-    session_doc = await asyncio.to_thread(db.sessions.find_one, {"user_id": user_id, "platform": platform, "account_id": acc_id})
+    session_doc = await repo.get_session(user_id, platform, acc_id)
     if not session_doc:
         return await query.answer("Account session not found.", show_alert=True)
         
@@ -1963,7 +2387,7 @@ async def change_page_token_cb(_, query):
             "app_id": session_data.get('app_id'),
             "app_secret": session_data.get('app_secret')
         },
-        "prompt_msg": prompt_msg, "secret_messages": []
+        "prompt_msg": MessageRef.of(prompt_msg), "secret_messages": []
     }
     await delete_platform_session(user_id, platform, acc_id)
     
@@ -1973,8 +2397,7 @@ async def change_page_token_cb(_, query):
         await save_user_settings(user_id, user_settings)
 
 
-@app.on_callback_query(filters.regex("^confirm_logout_"))
-@rate_limit_callbacks
+@router.callback("confirm_logout_", prefix=True)
 async def confirm_logout_cb(_, query):
     _, _, platform, acc_id = query.data.split("_")
     sessions = await load_platform_sessions(query.from_user.id, platform)
@@ -1986,8 +2409,7 @@ async def confirm_logout_cb(_, query):
         reply_markup=get_logout_confirm_markup(platform, acc_id, acc_name)
     )
 
-@app.on_callback_query(filters.regex("^logout_acc_"))
-@rate_limit_callbacks
+@router.callback("logout_acc_", prefix=True)
 async def logout_account_cb(_, query):
     user_id = query.from_user.id
     _, _, platform, acc_id_to_logout = query.data.split("_")
@@ -2010,8 +2432,7 @@ async def logout_account_cb(_, query):
             pass
     await manage_accounts_cb(app, MockQuery(query.from_user, query.message, f'manage_{"fb" if platform == "facebook" else "yt"}_accounts'))
 
-@app.on_callback_query(filters.regex("^add_account_"))
-@rate_limit_callbacks
+@router.callback("add_account_", prefix=True)
 async def add_account_cb(_, query):
     user_id = query.from_user.id
     platform = query.data.split("add_account_")[-1]
@@ -2035,8 +2456,7 @@ async def add_account_cb(_, query):
 
 
 # --- General Callbacks ---
-@app.on_callback_query(filters.regex("^cancel_upload$"))
-@rate_limit_callbacks
+@router.callback("cancel_upload")
 async def cancel_upload_cb(_, query):
     user_id = query.from_user.id
     await query.answer("Upload cancelled.", show_alert=True)
@@ -2047,7 +2467,7 @@ async def cancel_upload_cb(_, query):
 
     await safe_threaded_reply(
         original_media_msg,
-        "❌ **" + to_bold_sans("Upload Cancelled") + "**\n\n" + to_bold_sans("Your Operation Has Been Cancelled."),
+        render("upload_cancelled", state_data.get("lang", DEFAULT_LANGUAGE)),
         status_message=status_msg
     )
 
@@ -2055,12 +2475,13 @@ async def cancel_upload_cb(_, query):
     files_to_clean = [file_info.get("downloaded_path"), file_info.get("processed_path"), file_info.get("thumbnail_path")]
     
     cleanup_temp_files(files_to_clean)
+    staging.discard(file_info.get("staging_id"))
     if user_id in user_states: del user_states[user_id]
     await task_tracker.cancel_all_user_tasks(user_id)
+    await tracer.finish(file_info.get("staging_id"), "cancelled")
     logger.info(f"User {user_id} cancelled their upload.")
 
-@app.on_callback_query(filters.regex("^upload_flow_"))
-@rate_limit_callbacks
+@router.callback("upload_flow_", prefix=True)
 async def upload_flow_cb(_, query):
     user_id = query.from_user.id
     data = query.data.replace("upload_flow_", "")
@@ -2069,7 +2490,7 @@ async def upload_flow_cb(_, query):
     if not state_data or "file_info" not in state_data:
         return await query.answer("❌ Error: State lost, please start over.", show_alert=True)
     
-    state_data["status_msg"] = query.message
+    state_data["status_msg"] = MessageRef.of(query.message)
 
     parts = data.split("_")
     step = parts[0]
@@ -2115,11 +2536,10 @@ async def upload_flow_cb(_, query):
 
 
 # --- Premium & Payment Callbacks ---
-@app.on_callback_query(filters.regex("^buypypremium$"))
-@rate_limit_callbacks
+@router.callback("buypypremium")
 async def buypypremium_cb(_, query):
     user_id = query.from_user.id
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
+    touch_user(user_id)
     
     premium_plans_text = (
         "⭐ " + to_bold_sans("Upgrade To Premium!") + " ⭐\n\n"
@@ -2128,8 +2548,7 @@ async def buypypremium_cb(_, query):
     )
     await safe_edit_message(query.message, premium_plans_text, reply_markup=get_premium_plan_markup(user_id))
 
-@app.on_callback_query(filters.regex("^show_plan_details_"))
-@rate_limit_callbacks
+@router.callback("show_plan_details_", prefix=True)
 async def show_plan_details_cb(_, query):
     user_id = query.from_user.id
     plan_key = query.data.split("show_plan_details_")[1]
@@ -2153,15 +2572,13 @@ async def show_plan_details_cb(_, query):
         reply_markup=get_premium_details_markup(plan_key, is_admin_flow=is_admin_adding_premium)
     )
 
-@app.on_callback_query(filters.regex("^show_payment_methods$"))
-@rate_limit_callbacks
+@router.callback("show_payment_methods")
 async def show_payment_methods_cb(_, query):
     payment_methods_text = "**" + to_bold_sans("Available Payment Methods") + "**\n\n"
     payment_methods_text += to_bold_sans("Choose Your Preferred Method To Proceed.")
     await safe_edit_message(query.message, payment_methods_text, reply_markup=get_payment_methods_markup())
 
-@app.on_callback_query(filters.regex("^submit_payment_proof$"))
-@rate_limit_callbacks
+@router.callback("submit_payment_proof")
 async def submit_payment_proof_cb(_, query):
     user_id = query.from_user.id
     instructions = global_settings.get("payment_settings", {}).get("instructions")
@@ -2169,8 +2586,7 @@ async def submit_payment_proof_cb(_, query):
     await query.answer()
     await safe_edit_message(query.message, f"🧾 **Submit Payment Proof**\n\n{instructions}")
 
-@app.on_callback_query(filters.regex("^show_payment_qr_google_play$"))
-@rate_limit_callbacks
+@router.callback("show_payment_qr_google_play")
 async def show_payment_qr_google_play_cb(_, query):
     qr_file_id = global_settings.get("payment_settings", {}).get("google_play_qr_file_id")
     if not qr_file_id:
@@ -2182,8 +2598,7 @@ async def show_payment_qr_google_play_cb(_, query):
     await query.message.reply_photo(photo=qr_file_id, caption=caption_text)
     await query.answer()
 
-@app.on_callback_query(filters.regex("^show_payment_details_"))
-@rate_limit_callbacks
+@router.callback("show_payment_details_", prefix=True)
 async def show_payment_details_cb(_, query):
     method = query.data.split("show_payment_details_")[1]
     payment_details = global_settings.get("payment_settings", {}).get(method, "No details available.")
@@ -2194,8 +2609,7 @@ async def show_payment_details_cb(_, query):
     )
     await safe_edit_message(query.message, text, reply_markup=get_payment_methods_markup())
 
-@app.on_callback_query(filters.regex("^show_custom_payment_"))
-@rate_limit_callbacks
+@router.callback("show_custom_payment_", prefix=True)
 async def show_custom_payment_cb(_, query):
     button_name = query.data.split("show_custom_payment_")[1]
     payment_details = global_settings.get("payment_settings", {}).get("custom_buttons", {}).get(button_name, "No details available.")
@@ -2206,8 +2620,7 @@ async def show_custom_payment_cb(_, query):
     )
     await safe_edit_message(query.message, text, reply_markup=get_payment_methods_markup())
 
-@app.on_callback_query(filters.regex("^buy_now$"))
-@rate_limit_callbacks
+@router.callback("buy_now")
 async def buy_now_cb(_, query):
     text = (
         f"**{to_bold_sans('Purchase Confirmation')}**\n\n"
@@ -2216,8 +2629,14 @@ async def buy_now_cb(_, query):
     await safe_edit_message(query.message, text)
 
 # --- Admin Panel Callbacks ---
-@app.on_callback_query(filters.regex("^(admin_panel|users_list|admin_user_details|manage_premium|broadcast_message|admin_stats_panel)$"))
-@rate_limit_callbacks
+@router.callback(
+    "admin_panel",
+    "users_list",
+    "admin_user_details",
+    "manage_premium",
+    "broadcast_message",
+    "admin_stats_panel"
+)
 async def admin_panel_actions_cb(_, query):
     user_id = query.from_user.id
     if not is_admin(user_id):
@@ -2228,13 +2647,13 @@ async def admin_panel_actions_cb(_, query):
     if action == "admin_panel":
         await safe_edit_message(query.message, "🛠 " + to_bold_sans("Welcome To The Admin Panel!"), reply_markup=admin_markup)
     elif action == "users_list":
-        if db is None: return await query.answer("DB connection failed.", show_alert=True)
+        if repo is None: return await query.answer("DB connection failed.", show_alert=True)
         await query.answer("Fetching users...")
-        users = await asyncio.to_thread(list, db.users.find({}))
-        user_list_text = f"👥 **Total Users: {len(users)}**\n\n"
-        for i, user in enumerate(users[:50]):
+        total_users, users = await asyncio.gather(repo.count_users(), repo.list_users(limit=50))
+        user_list_text = f"👥 **Total Users: {total_users}**\n\n"
+        for i, user in enumerate(users):
             user_list_text += f"`{user['_id']}` - @{user.get('username', 'N/A')}\n"
-        if len(users) > 50:
+        if total_users > 50:
             user_list_text += "\n...and more."
         await safe_edit_message(query.message, user_list_text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back to Admin", callback_data="admin_panel")]]))
 
@@ -2255,9 +2674,11 @@ async def admin_panel_actions_cb(_, query):
 
 async def show_user_details(message, target_user_id):
     """Helper to fetch and display user details for the admin."""
-    user_data = await _get_user_data(target_user_id)
+    user_data = await _get_user_data(target_user_id, "profile")
     if not user_data:
         return await message.reply("❌ User not found in the database.")
+    if activity_buffer is not None:
+        user_data.update(activity_buffer.pending(target_user_id))
 
     details_text = f"👤 **Details for User ID:** `{target_user_id}`\n"
     details_text += f"**Username:** @{user_data.get('username', 'N/A')}\n"
@@ -2270,15 +2691,16 @@ async def show_user_details(message, target_user_id):
     if isinstance(last_active, datetime):
         details_text += f"**Last Active:** {last_active.strftime('%Y-%m-%d %H:%M')}\n\n"
 
-    total_uploads = await asyncio.to_thread(db.uploads.count_documents, {'user_id': target_user_id})
-    details_text += f"**Uploads:**\n- Total: `{total_uploads}`\n"
+    user_stats = await stats_service.get_user(target_user_id)
+    details_text += f"**Uploads:**\n- Total: `{user_stats['total']}`\n"
 
     details_text += "\n**Login & Token Status:**\n"
     yt_sessions = await load_platform_sessions(target_user_id, 'youtube')
     if yt_sessions:
         for session in yt_sessions:
             try:
-                creds = Credentials.from_authorized_user_info(json.loads(session['session_data']['credentials_json']))
+                google = await executors.run("io", platform_sdks.google)
+                creds = google.Credentials.from_authorized_user_info(json.loads(session['session_data']['credentials_json']))
                 expiry = creds.expiry.strftime('%Y-%m-%d %H:%M UTC')
                 details_text += f"- **YouTube Channel:** {session['session_data'].get('name', 'N/A')}\n  - Token Expires: `{expiry}`\n"
             except:
@@ -2301,8 +2723,26 @@ async def show_global_settings_panel(message_or_query):
     )
     await safe_edit_message(message, settings_text, reply_markup=get_admin_global_settings_markup())
 
-@app.on_callback_query(filters.regex("^(global_settings_panel|toggle_special_event|set_event_title|set_event_message|set_max_uploads|set_max_file_size|set_payment_instructions|toggle_multiple_logins|reset_stats|show_system_stats|confirm_reset_stats|payment_settings_panel|create_custom_payment_button|set_payment_google_play_qr|set_payment_upi|set_payment_usdt|set_payment_btc|set_payment_others)$"))
-@rate_limit_callbacks
+@router.callback(
+    "global_settings_panel",
+    "toggle_special_event",
+    "set_event_title",
+    "set_event_message",
+    "set_max_uploads",
+    "set_max_file_size",
+    "set_payment_instructions",
+    "toggle_multiple_logins",
+    "reset_stats",
+    "show_system_stats",
+    "confirm_reset_stats",
+    "payment_settings_panel",
+    "create_custom_payment_button",
+    "set_payment_google_play_qr",
+    "set_payment_upi",
+    "set_payment_usdt",
+    "set_payment_btc",
+    "set_payment_others"
+)
 async def global_settings_actions_cb(_, query):
     user_id = query.from_user.id
     if not is_admin(user_id):
@@ -2353,22 +2793,51 @@ async def global_settings_actions_cb(_, query):
         await safe_edit_message(query.message, "⚠️ " + to_bold_sans("Are you sure? This will delete all upload records permanently."), reply_markup=markup)
 
     elif action == "confirm_reset_stats":
-        if db is None: return await query.answer("DB connection failed.", show_alert=True)
-        await asyncio.to_thread(db.uploads.delete_many, {})
+        if repo is None: return await query.answer("DB connection failed.", show_alert=True)
+        await repo.delete_all_uploads()
+        stats_service.invalidate()
         await query.answer("All upload stats have been reset.", show_alert=True)
         await send_log_to_channel(app, LOG_CHANNEL, f"🗑️ Admin `{user_id}` reset all upload stats.")
         await show_global_settings_panel(query)
 
     elif action == "show_system_stats":
-        cpu = psutil.cpu_percent(interval=1)
+        cpu = await executors.run("io", psutil.cpu_percent, 1)
         ram = psutil.virtual_memory()
         disk = psutil.disk_usage('/')
         stats_text = (
             f"💻 **{to_bold_sans('System Statistics')}**\n\n"
             f"**CPU:** `{cpu}%`\n"
             f"**RAM:** `{ram.percent}%` (Used: {ram.used / (1024**3):.2f} GB)\n"
-            f"**Disk:** `{disk.percent}%` (Used: {disk.used / (1024**3):.2f} GB / {disk.total / (1024**3):.2f} GB)"
+            f"**Disk:** `{disk.percent}%` (Used: {disk.used / (1024**3):.2f} GB / {disk.total / (1024**3):.2f} GB)\n\n"
+            f"**Thread Pools:**\n"
+        )
+        for pool in executors.snapshot_all():
+            stats_text += (
+                f"  - `{pool['name']}`: {pool['active']}/{pool['max_workers']} busy "
+                f"({pool['utilization'] * 100:.0f}%), {pool['queued']} queued, {pool['completed']} done\n"
+            )
+        gov = governor.snapshot()
+        readings = gov["readings"]
+        stats_text += (
+            f"\n**Governor:** pressure `{gov['pressure']:.2f}`"
+            f"{' ⚠️ throttling' if gov['under_pressure'] else ''}\n"
+            f"  - CPU `{readings['cpu']:.0f}%`, RSS `{readings['rss'] / (1024**2):.0f} MB`, "
+            f"disk `{readings['disk'] / (1024**2):.1f} MB/s`, net `{readings['net'] / (1024**2):.1f} MB/s`\n"
+            f"  - ffmpeg threads: `{gov['ffmpeg_threads'] or 'auto'}`\n"
+        )
+        for limiter in gov["limiters"]:
+            stats_text += (
+                f"  - `{limiter['name']}`: {limiter['active']} active / limit {limiter['limit']} "
+                f"(max {limiter['max']}), {limiter['waiting']} waiting\n"
+            )
+        loop_stats = loop_monitor.snapshot()
+        stats_text += (
+            f"\n**Event Loop:** lag `{loop_stats['last_lag'] * 1000:.0f} ms` "
+            f"(max `{loop_stats['max_lag'] * 1000:.0f} ms`), {loop_stats['stalls']} stalls"
+            f"{' (debug mode)' if loop_stats['debug'] else ''}\n"
         )
+        for stall in loop_stats["recent"]:
+            stats_text += f"  - `{stall['culprit']}` {stall['seconds']:.2f}s ({stall['handler'] or 'unknown'})\n"
         await safe_edit_message(query.message, stats_text, reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton("🔙 Back to Settings", callback_data="global_settings_panel")]]))
     
     elif action == "payment_settings_panel":
@@ -2389,12 +2858,11 @@ async def global_settings_actions_cb(_, query):
 
 
 # --- Back Callbacks ---
-@app.on_callback_query(filters.regex("^back_to_"))
-@rate_limit_callbacks
+@router.callback("back_to_", prefix=True)
 async def back_to_cb(_, query):
     data = query.data
     user_id = query.from_user.id
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
+    touch_user(user_id)
     
     await task_tracker.cancel_all_user_tasks(user_id)
     if user_id in user_states: del user_states[user_id]
@@ -2403,9 +2871,10 @@ async def back_to_cb(_, query):
         try: await query.message.delete()
         except Exception: pass
         premium_platforms = [p for p in PREMIUM_PLATFORMS if await is_premium_for_platform(user_id, p) or is_admin(user_id)]
+        lang = await get_user_language(user_id)
         await app.send_message(
-            query.message.chat.id, "🏠 " + to_bold_sans("Main Menu"),
-            reply_markup=get_main_keyboard(user_id, premium_platforms)
+            query.message.chat.id, render("main_menu", lang),
+            reply_markup=get_main_keyboard(user_id, premium_platforms, lang)
         )
     elif data == "back_to_settings":
         await safe_edit_message(query.message, "⚙️ " + to_bold_sans("Settings Panel"), reply_markup=await get_main_settings_markup(user_id))
@@ -2421,8 +2890,7 @@ async def back_to_cb(_, query):
         await show_global_settings_panel(query)
 
 # --- Trial Activation ---
-@app.on_callback_query(filters.regex("^activate_trial_"))
-@rate_limit_callbacks
+@router.callback("activate_trial_", prefix=True)
 async def activate_trial_cb(_, query):
     user_id = query.from_user.id
     platform = query.data.split("_")[-1]
@@ -2431,7 +2899,7 @@ async def activate_trial_cb(_, query):
         return await query.answer(f"You already have an active premium/trial for {platform.capitalize()}!", show_alert=True)
 
     premium_until = datetime.now(timezone.utc) + timedelta(hours=6)
-    user_data = await _get_user_data(user_id) or {}
+    user_data = await _get_user_data(user_id, "premium") or {}
     user_premium_data = user_data.get("premium", {})
     user_premium_data[platform] = {
         "type": "6_hour_trial", "added_by": "callback_trial",
@@ -2439,6 +2907,9 @@ async def activate_trial_cb(_, query):
         "status": "active"
     }
     await _save_user_data(user_id, {"premium": user_premium_data})
+    entitlement_cache.put(user_id, user_premium_data)
+    if rollups:
+        await rollups.record_premium_grant(platform, "6_hour_trial")
 
     logger.info(f"User {user_id} activated a 6-hour {platform} trial.")
     await send_log_to_channel(app, LOG_CHANNEL, f"✨ User `{user_id}` activated a 6-hour {platform.capitalize()} trial.")
@@ -2451,11 +2922,22 @@ async def activate_trial_cb(_, query):
         + f"To get started, please log in with: `/{platform[0]}login`"
     )
     premium_platforms = [p for p in PREMIUM_PLATFORMS if await is_premium_for_platform(user_id, p) or is_admin(user_id)]
-    await query.message.reply(welcome_msg, reply_markup=get_main_keyboard(user_id, premium_platforms))
+    await query.message.reply(welcome_msg, reply_markup=get_main_keyboard(user_id, premium_platforms, await get_user_language(user_id)))
     await query.message.delete()
 
-@app.on_callback_query(filters.regex("^set_visibility_"))
-@rate_limit_callbacks
+@router.callback("set_language_", prefix=True)
+async def set_language_cb(_, query):
+    user_id = query.from_user.id
+    lang = rendering.normalize_language(query.data.replace("set_language_", ""))
+    settings = await get_user_settings(user_id)
+    settings["language"] = lang
+    await save_user_settings(user_id, settings)
+    await safe_edit_message(query.message, render("language_set", lang))
+
+    premium_platforms = [p for p in PREMIUM_PLATFORMS if await is_premium_for_platform(user_id, p) or is_admin(user_id)]
+    await app.send_message(query.message.chat.id, render("main_menu", lang), reply_markup=get_main_keyboard(user_id, premium_platforms, lang))
+
+@router.callback("set_visibility_", prefix=True)
 async def set_visibility_cb(_, query):
     user_id = query.from_user.id
     visibility = query.data.split("_")[-1]
@@ -2470,7 +2952,7 @@ async def set_visibility_cb(_, query):
 # ===================================================================
 # ======================== MEDIA HANDLERS ===========================
 # ===================================================================
-@app.on_message(filters.document)
+@Client.on_message(filters.document)
 async def handle_yt_json(_, msg):
     user_id = msg.from_user.id
     state_data = user_states.get(user_id, {})
@@ -2497,47 +2979,49 @@ async def process_upload_step(msg_or_query):
     
     original_media_msg = file_info.get("original_media_msg")
     status_msg = state_data.get("status_msg")
+    lang = state_data.get("lang", DEFAULT_LANGUAGE)
     
     next_prompt_text, next_markup = None, None
     
     if "title" not in file_info:
         state_data["action"] = "waiting_for_title"
-        next_prompt_text = to_bold_sans("Please send a Title for your post.")
-        next_markup = get_upload_flow_markup(platform, 'input')
+        next_prompt_text = render("ask_title", lang)
+        next_markup = get_upload_flow_markup(platform, 'input', lang)
 
     elif "description" not in file_info:
         state_data["action"] = "waiting_for_description"
-        next_prompt_text = to_bold_sans("Next, send a Description.")
-        next_markup = get_upload_flow_markup(platform, 'input')
+        next_prompt_text = render("ask_description", lang)
+        next_markup = get_upload_flow_markup(platform, 'input', lang)
 
     elif platform == 'youtube' and "tags" not in file_info:
         state_data["action"] = "waiting_for_tags"
-        next_prompt_text = to_bold_sans("Now, send comma-separated Tags.")
-        next_markup = get_upload_flow_markup(platform, 'input')
+        next_prompt_text = render("ask_tags", lang)
+        next_markup = get_upload_flow_markup(platform, 'input', lang)
 
     elif platform == 'youtube' and upload_type == 'video' and "thumbnail_path" not in file_info:
         state_data["action"] = "waiting_for_thumbnail_choice"
-        next_prompt_text = to_bold_sans("A thumbnail is required for YouTube Videos. Please upload one or let the bot generate one.")
-        next_markup = get_upload_flow_markup(platform, 'thumbnail')
+        next_prompt_text = render("ask_thumbnail", lang)
+        next_markup = get_upload_flow_markup(platform, 'thumbnail', lang)
     
     elif platform == 'youtube' and "visibility" not in file_info:
         state_data["action"] = "waiting_for_visibility_choice"
-        next_prompt_text = to_bold_sans("Set Video Visibility:")
-        next_markup = get_upload_flow_markup(platform, 'visibility')
+        next_prompt_text = render("ask_visibility", lang)
+        next_markup = get_upload_flow_markup(platform, 'visibility', lang)
 
     elif "schedule_time" not in file_info:
         if platform == 'facebook':
             file_info['visibility'] = 'public'
         state_data["action"] = "waiting_for_publish_choice"
-        next_prompt_text = to_bold_sans("When To Publish?")
-        next_markup = get_upload_flow_markup(platform, 'publish')
+        next_prompt_text = render("ask_publish", lang)
+        next_markup = get_upload_flow_markup(platform, 'publish', lang)
 
     else:
         # Final step: start upload/schedule
         schedule_time = file_info.get("schedule_time")
         if schedule_time:
-            new_status_msg = await safe_threaded_reply(original_media_msg, "⏳ " + to_bold_sans("Scheduling your post..."), status_message=status_msg)
-            state_data['status_msg'] = new_status_msg
+            new_status_msg = await safe_threaded_reply(original_media_msg, render("scheduling", lang), status_message=status_msg)
+            state_data['status_msg'] = MessageRef.of(new_status_msg)
+            scheduled = False
             try:
                 job_details = {
                     "user_id": user_id, "platform": platform, "upload_type": upload_type,
@@ -2545,18 +3029,26 @@ async def process_upload_step(msg_or_query):
                     "original_message_id": original_media_msg.id,
                     "schedule_time": schedule_time,
                     "status": "pending", "created_at": datetime.now(timezone.utc),
-                    "metadata": {k: file_info.get(k) for k in ["title", "description", "tags", "visibility", "thumbnail_path"]}
+                    "metadata": {k: file_info.get(k) for k in ["title", "description", "tags", "visibility", "thumbnail_path", "staging_id"]}
                 }
-                if db is not None:
-                    await asyncio.to_thread(db.scheduled_jobs.insert_one, job_details)
+                if repo is not None:
+                    await repo.insert_scheduled_job(job_details)
+                    scheduled = True
                     schedule_markup = InlineKeyboardMarkup([[InlineKeyboardButton("🗓️ Manage Schedules", callback_data=f"manage_schedules_{platform}")]])
-                    await safe_threaded_reply(original_media_msg, f"✅ **Scheduled!**\n\nYour post will be uploaded on `{schedule_time.strftime('%Y-%m-%d %H:%M')}` UTC.", schedule_markup, new_status_msg)
+                    await safe_threaded_reply(original_media_msg, render("scheduled", lang, when=schedule_time.strftime('%Y-%m-%d %H:%M')), schedule_markup, new_status_msg)
                 else:
                     await safe_threaded_reply(original_media_msg, "❌ **Scheduling Failed:** Database is offline.", status_message=new_status_msg)
             except Exception as e:
                 logger.error(f"Failed to schedule job: {e}", exc_info=True)
                 await safe_threaded_reply(original_media_msg, f"❌ **Scheduling Failed:** Could not save the job. Error: {e}", status_message=new_status_msg)
             finally:
+                # The media is fetched again when the job runs; only a custom thumbnail has to wait for it.
+                if scheduled:
+                    staging.discard_file(file_info.get("downloaded_path"))
+                    staging.release(file_info.get("staging_id"))
+                else:
+                    staging.discard(file_info.get("staging_id"))
+                await tracer.finish(file_info.get("staging_id"), "scheduled" if scheduled else "failed")
                 if user_id in user_states: del user_states[user_id]
         else:
             state_data["action"] = "finalizing"
@@ -2564,13 +3056,13 @@ async def process_upload_step(msg_or_query):
             
     if next_prompt_text:
         new_status_msg = await safe_threaded_reply(original_media_msg, next_prompt_text, next_markup, status_msg)
-        state_data["status_msg"] = new_status_msg
+        state_data["status_msg"] = MessageRef.of(new_status_msg)
 
 
-@app.on_message(filters.media & ~filters.document & filters.private)
+@Client.on_message(filters.media & ~filters.document & filters.private)
 async def handle_media_upload(_, msg):
     user_id = msg.from_user.id
-    await _save_user_data(user_id, {"last_active": datetime.now(timezone.utc)})
+    touch_user(user_id)
     state_data = user_states.get(user_id, {})
 
     if state_data and state_data.get("action") == "waiting_for_payment_proof":
@@ -2594,16 +3086,18 @@ async def handle_media_upload(_, msg):
         if not msg.photo:
             await safe_threaded_reply(
                 state_data["file_info"]["original_media_msg"],
-                "❌ " + to_bold_sans("That's not an image. Please send an image for the thumbnail."),
+                render("thumbnail_not_image", state_data.get("lang", DEFAULT_LANGUAGE)),
                 status_message=state_data.get("status_msg")
             )
             return
         
         status_msg = state_data.get("status_msg")
-        new_status_msg = await safe_threaded_reply(state_data["file_info"]["original_media_msg"], "🖼️ " + to_bold_sans("Downloading thumbnail..."), status_message=status_msg)
-        state_data['status_msg'] = new_status_msg
+        new_status_msg = await safe_threaded_reply(state_data["file_info"]["original_media_msg"], render("thumbnail_downloading", state_data.get("lang", DEFAULT_LANGUAGE)), status_message=status_msg)
+        state_data['status_msg'] = MessageRef.of(new_status_msg)
         
-        thumb_path = await app.download_media(msg.photo)
+        thumb_path = await app.download_media(
+            msg.photo, file_name=staging.job_dir(state_data['file_info']['staging_id'], msg.photo.file_size)
+        )
         state_data['file_info']['thumbnail_path'] = thumb_path
         await process_upload_step(msg)
         return
@@ -2612,27 +3106,45 @@ async def handle_media_upload(_, msg):
     if not action or action != "waiting_for_media":
         return
 
+    lang = state_data.get("lang", DEFAULT_LANGUAGE)
     media = msg.video or msg.photo or msg.document
-    if not media: return await msg.reply("❌ " + to_bold_sans("Unsupported Media Type."))
+    if not media: return await msg.reply(render("unsupported_media", lang))
 
     if media.file_size > MAX_FILE_SIZE_BYTES:
         if user_id in user_states: del user_states[user_id]
-        return await msg.reply(f"❌ " + to_bold_sans(f"File Size Exceeds The Limit Of `{MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f}` MB."))
+        return await msg.reply(render("file_too_large", lang, limit_mb=f"{MAX_FILE_SIZE_BYTES / (1024 * 1024):.0f}"))
+
+    staging_id = StagingArea.new_job_id()
+    try:
+        staging.admit(staging_id, media.file_size)
+    except StagingFull as e:
+        if user_id in user_states: del user_states[user_id]
+        logger.warning(f"Rejected upload from user {user_id}: staging volume is full ({e}).")
+        await send_log_to_channel(app, LOG_CHANNEL, f"⚠️ Staging volume is full, rejected an upload from `{user_id}` ({e}).", urgent=True)
+        return await msg.reply(render("storage_full", lang))
 
-    status_msg = await safe_threaded_reply(msg, "⏳ " + to_bold_sans("Starting Download..."))
-    state_data['status_msg'] = status_msg
-    state_data["file_info"] = { "original_media_msg": msg }
+    status_msg = await safe_threaded_reply(msg, render("download_starting", lang))
+    state_data['status_msg'] = MessageRef.of(status_msg)
+    state_data["file_info"] = { "original_media_msg": MessageRef.of(msg), "staging_id": staging_id }
+    trace = tracer.start(staging_id, user_id, platform=state_data.get("platform"), upload_type=state_data.get("upload_type"),
+                         size=media.file_size, mime_type=getattr(media, "mime_type", None))
 
     try:
         start_time = time.time()
         last_update_time = [0]
         task_tracker.create_task(monitor_progress_task(msg, status_msg, action_text="Downloading"), user_id=user_id, task_name="progress_monitor")
         
-        downloaded_path = await app.download_media(
-            msg,
-            progress=download_progress_callback,
-            progress_args=("Download", status_msg.id, msg.chat.id, start_time, last_update_time)
-        )
+        async with download_limiter:
+            download_started = time.perf_counter()
+            with trace.span("download", source="chat", size=media.file_size):
+                downloaded_path = await app.download_media(
+                    msg,
+                    file_name=staging.job_dir(staging_id, media.file_size),
+                    progress=download_progress_callback,
+                    progress_args=("Download", status_msg.id, msg.chat.id, start_time, last_update_time)
+                )
+            metrics.DOWNLOAD_SECONDS.labels("chat").observe(time.perf_counter() - download_started)
+            metrics.DOWNLOAD_BYTES.labels("chat").inc(media.file_size or 0)
         
         task_tracker.cancel_user_task(user_id, "progress_monitor")
         
@@ -2643,7 +3155,9 @@ async def handle_media_upload(_, msg):
 
     except Exception as e:
         logger.error(f"Error during file download for user {user_id}: {e}", exc_info=True)
-        await safe_threaded_reply(msg, f"❌ " + to_bold_sans(f"Download Failed: {e}"), status_message=status_msg)
+        await safe_threaded_reply(msg, render("download_failed", lang, error=e), status_message=status_msg)
+        staging.discard(staging_id)
+        await tracer.finish(staging_id, "failed", e)
         if user_id in user_states: del user_states[user_id]
 
 
@@ -2672,10 +3186,10 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
         platform = state_data["platform"]
         upload_type = state_data["upload_type"]
     else: # Scheduled job
-        if db is None:
+        if repo is None:
             logger.error("Cannot process scheduled job: DB is not connected.")
             return
-        job = await asyncio.to_thread(db.scheduled_jobs.find_one, {"_id": ObjectId(job_id)})
+        job = await repo.get_scheduled_job(job_id)
         if not job:
             logger.error(f"Scheduled job with ID {job_id} not found.")
             return
@@ -2684,8 +3198,10 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
         final_title = job.get('metadata', {}).get('title', 'Scheduled Upload')
         status_msg = await app.send_message(user_id, "⏳ " + to_bold_sans(f"Starting your scheduled {upload_type}..."))
 
-    async with upload_semaphore:
-        logger.info(f"Semaphore acquired for user {user_id}. Starting upload to {platform}.")
+    trace_key = file_info.get("staging_id")
+    trace = tracer.get(trace_key, user_id, platform=platform, upload_type=upload_type, scheduled=from_schedule)
+    async with upload_limiter:
+        logger.info(f"Upload slot acquired for user {user_id}. Starting upload to {platform}.")
         files_to_clean = [file_info.get("downloaded_path"), file_info.get("processed_path"), file_info.get("thumbnail_path")]
         try:
             user_settings = await get_user_settings(user_id)
@@ -2698,9 +3214,14 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
             upload_path = path
 
             if is_video:
-                if await asyncio.to_thread(needs_conversion, path):
+                with metrics.PROBE_SECONDS.time(), trace.span("probe", size=os.path.getsize(path)) as span:
+                    conversion_needed = await executors.run("media", needs_conversion, path)
+                    span.set(conversion_needed=conversion_needed)
+                if conversion_needed:
                     processed_path = path.rsplit(".", 1)[0] + "_processed.mp4"
-                    upload_path = await process_video_for_upload(app, status_msg, original_media_msg, path, processed_path)
+                    async with transcode_limiter:
+                        with trace.span("convert", size=os.path.getsize(path)) as span:
+                            upload_path = await process_video_for_upload(app, status_msg, original_media_msg, path, processed_path, span)
                     files_to_clean.append(processed_path)
                 else:
                     status_msg = await safe_threaded_reply(original_media_msg, "✅ " + to_bold_sans("Video format is already compatible. No conversion needed."), status_message=status_msg)
@@ -2708,7 +3229,9 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
             if platform == 'youtube' and upload_type == 'video' and file_info.get("thumbnail_path") == "auto":
                 status_msg = await safe_threaded_reply(original_media_msg, "🖼️ " + to_bold_sans("Generating Smart Thumbnail..."), status_message=status_msg)
                 thumb_output_path = upload_path + ".jpg"
-                generated_thumb = await asyncio.to_thread(generate_thumbnail, upload_path, thumb_output_path)
+                async with transcode_limiter:
+                    with metrics.THUMBNAIL_SECONDS.time(), trace.span("thumbnail"):
+                        generated_thumb = await executors.run("media", generate_thumbnail, upload_path, thumb_output_path, governor.ffmpeg_threads())
                 file_info["thumbnail_path"] = generated_thumb
                 files_to_clean.append(generated_thumb)
 
@@ -2719,6 +3242,8 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
                 
             final_description = file_info.get("description") or user_settings.get(f"description_{platform}") or ""
             
+            upload_started = time.perf_counter()
+            upload_span = trace.begin("upload", platform=platform, upload_type=upload_type, size=os.path.getsize(upload_path))
             if platform == "facebook":
                 status_msg = await safe_threaded_reply(original_media_msg, "⬆️ " + to_bold_sans(f"Uploading {upload_type} to Facebook..."), status_message=status_msg)
                 session = await get_active_session(user_id, 'facebook')
@@ -2728,24 +3253,26 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
                 fb_caption = f"{final_title}\n\n{final_description}".strip()
 
                 if upload_type == 'post':
-                    with open(upload_path, 'rb') as f:
-                        response = await asyncio.to_thread(requests.post, f"https://graph.facebook.com/v19.0/{page_id}/photos", data={'access_token': token, 'caption': fb_caption}, files={'source': f}, timeout=600)
-                        post_data = check_fb_response(response)
-                        post_id = post_data.get('post_id', post_data.get('id', 'N/A'))
-                        url = f"https://facebook.com/{post_id}"
+                    post_data = await executors.run(
+                        "upload", fb_upload_file, f"{FB_GRAPH_URL}/v19.0/{page_id}/photos",
+                        {'access_token': token, 'caption': fb_caption}, upload_path, 600
+                    )
+                    post_id = post_data.get('post_id', post_data.get('id', 'N/A'))
+                    url = f"https://facebook.com/{post_id}"
 
                 elif upload_type in ['video', 'reels']:
-                    with open(upload_path, 'rb') as f:
-                        params = {'access_token': token, 'description': fb_caption}
-                        r = await asyncio.to_thread(requests.post, f"https://graph-video.facebook.com/{page_id}/videos", data=params, files={'source': f}, timeout=3600)
-                        video_data = check_fb_response(r)
-                        media_id = video_data['id']
-                        url = f"https://facebook.com/video.php?v={media_id}"
-                        logger.info(f"Facebook {upload_type} {media_id} published.")
+                    params = {'access_token': token, 'description': fb_caption}
+                    video_data = await executors.run(
+                        "upload", fb_upload_file, f"{FB_GRAPH_VIDEO_URL}/{page_id}/videos",
+                        params, upload_path, 3600
+                    )
+                    media_id = video_data['id']
+                    url = f"https://facebook.com/video.php?v={media_id}"
+                    logger.info(f"Facebook {upload_type} {media_id} published.")
             
             elif platform == "youtube":
                 if upload_type == 'short':
-                    meta = get_video_metadata(upload_path)
+                    meta = await executors.run("media", get_video_metadata, upload_path)
                     v_stream = next((s for s in meta.get('streams', []) if s.get('codec_type') == 'video'), None)
                     duration = float(meta.get('format', {}).get('duration', '999'))
                     if v_stream and (v_stream.get('width', 0) > v_stream.get('height', 1) or duration > 60):
@@ -2758,16 +3285,19 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
                 session = await get_active_session(user_id, 'youtube')
                 if not session: raise ConnectionError("YouTube session not found. Please /ytlogin.")
                 
-                creds = Credentials.from_authorized_user_info(json.loads(session['credentials_json']))
+                google = await executors.run("io", platform_sdks.google)
+                creds = google.Credentials.from_authorized_user_info(json.loads(session['credentials_json']))
                 if creds.expired and creds.refresh_token:
                     try:
-                        creds.refresh(Request())
-                        session['credentials_json'] = creds.to_json()
-                        await save_platform_session(user_id, "youtube", session)
-                    except RefreshError as e:
+                        with trace.span("token_refresh", platform="youtube"):
+                            await executors.run("io", creds.refresh, google.Request())
+                            session['credentials_json'] = creds.to_json()
+                            await save_platform_session(user_id, "youtube", session)
+                    except google.RefreshError as e:
                         raise ConnectionError(f"YouTube token expired/failed to refresh. Please /ytlogin. Error: {e}")
 
-                youtube = build('youtube', 'v3', credentials=creds)
+                youtube = await executors.run("io", google.build, 'youtube', 'v3', credentials=creds,
+                                          client_options=YOUTUBE_CLIENT_OPTIONS)
                 tags = (file_info.get("tags") or user_settings.get("tags_youtube", "")).split(',')
                 visibility = file_info.get("visibility") or user_settings.get("visibility_youtube", "private")
                 thumbnail = file_info.get("thumbnail_path")
@@ -2780,190 +3310,414 @@ async def process_and_upload(status_msg, file_info, user_id, from_schedule=False
                 if schedule_time:
                     body["status"]["publishAt"] = schedule_time.isoformat().replace("+00:00", "Z")
 
-                media_file = MediaFileUpload(upload_path, chunksize=-1, resumable=True)
+                media_file = google.MediaFileUpload(upload_path, chunksize=-1, resumable=True)
                 request = youtube.videos().insert(part=",".join(body.keys()), body=body, media_body=media_file)
                 
                 response = None
+                chunks = 0
                 while response is None:
-                    status, response = await asyncio.to_thread(request.next_chunk)
+                    status, response = await executors.run("upload", request.next_chunk)
+                    chunks += 1
                     if status: 
                         _upload_progress['progress'] = int(status.progress() * 100)
+                upload_span.set(chunks=chunks)
                 
                 media_id = response['id']
                 url = f"https://youtu.be/{media_id}"
 
                 if thumbnail and os.path.exists(thumbnail):
-                    await asyncio.to_thread(
-                        youtube.thumbnails().set(videoId=media_id, media_body=MediaFileUpload(thumbnail)).execute
+                    await executors.run(
+                        "io", youtube.thumbnails().set(videoId=media_id, media_body=google.MediaFileUpload(thumbnail)).execute
                     )
 
             _upload_progress['status'] = 'complete'
             task_tracker.cancel_user_task(user_id, "upload_monitor")
+            upload_span.end()
             
-            if db is not None:
+            db_span = trace.begin("db_write")
+            if repo is not None:
                 db_payload = {
                     "user_id": user_id, "media_id": str(media_id), "platform": platform, 
                     "upload_type": upload_type, "timestamp": datetime.now(timezone.utc),
                     "url": url, "title": final_title
                 }
                 if not from_schedule:
-                    await asyncio.to_thread(db.uploads.insert_one, db_payload)
+                    await repo.insert_upload(db_payload)
+                    stats_service.record_upload(user_id, platform)
                 else:
-                    await asyncio.to_thread(db.scheduled_jobs.update_one, {"_id": ObjectId(job_id)}, {"$set": {"status": "completed", "final_url": url}})
+                    await repo.update_scheduled_job(job_id, {"status": "completed", "final_url": url})
                     await app.send_message(user_id, f"✅ **Scheduled Upload Complete!**\n\nYour {upload_type} '{final_title}' is published:\n{url}")
+                await rollups.record_upload(platform, upload_type, os.path.getsize(upload_path))
+            db_span.end()
+
+            metrics.observe_upload(platform, upload_type, time.perf_counter() - upload_started, os.path.getsize(upload_path))
+            metrics.UPLOADS.labels(platform, "ok").inc()
 
             log_msg = f"📤 New {platform} {upload_type}\n👤 User: `{user_id}`\n🔗 URL: {url}"
             success_msg = f"✅ {to_bold_sans('Uploaded Successfully!')}\n\n**Title**: {final_title}\n**Link**: {url}"
             
-            await safe_threaded_reply(original_media_msg, success_msg, status_message=status_msg)
-            await send_log_to_channel(app, LOG_CHANNEL, log_msg)
+            with trace.span("notify"):
+                await safe_threaded_reply(original_media_msg, success_msg, status_message=status_msg)
+                await send_log_to_channel(app, LOG_CHANNEL, log_msg)
+            await tracer.finish(trace_key, "ok")
 
         except Exception as e:
             error_msg = f"❌ " + to_bold_sans(f"An Unexpected Error Occurred: {str(e)}")
             await safe_threaded_reply(original_media_msg, error_msg, status_message=status_msg)
-            if from_schedule and db is not None:
-                await asyncio.to_thread(db.scheduled_jobs.update_one, {"_id": ObjectId(job_id)}, {"$set": {"status": "failed", "error_message": str(e)}})
+            if from_schedule and repo is not None:
+                await repo.update_scheduled_job(job_id, {"status": "failed", "error_message": str(e)})
+            if rollups:
+                await rollups.record_failure(platform)
+            metrics.UPLOADS.labels(platform or "unknown", "error").inc()
+            await tracer.finish(trace_key, "failed", e)
             logger.error(f"Upload failed for user {user_id}: {e}", exc_info=True)
+            await send_log_to_channel(app, LOG_CHANNEL, f"❗ {platform} upload failed\n👤 User: `{user_id}`\n⚠️ `{e}`", urgent=True)
             
         finally:
             cleanup_temp_files(files_to_clean)
+            staging.discard(file_info.get("staging_id"))
             if not from_schedule and user_id in user_states:
                 del user_states[user_id]
             _upload_progress.clear()
-            logger.info(f"Semaphore released for user {user_id}.")
+            logger.info(f"Upload slot released for user {user_id}.")
 
 # === HTTP Server for OAuth and Health Checks ===
-class OAuthHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-        
-        query_components = parse_qs(urlparse(self.path).query)
-        state = query_components.get('state', [None])[0]
-        
-        if state:
-            html_content = """
-            <html><head><title>Authentication Successful</title></head>
-            <body><h1>✅ Authentication Successful!</h1>
-            <p>You can close this window. Please copy the full URL from your browser's address bar and paste it back to the bot.</p>
-            </body></html>"""
-            self.wfile.write(html_content.encode('utf-8'))
-        else:
-            self.wfile.write(b"Bot is running. This is the OAuth redirect endpoint.")
+http_server = HttpServer("0.0.0.0", PORT)
+
+_OAUTH_PAGE = """<html><head><title>{title}</title></head>
+<body><h1>{title}</h1><p>{message}</p></body></html>"""
+
+@http_server.route("/")
+async def oauth_redirect(request):
+    """Google redirects here after consent; the token exchange completes without the user pasting anything."""
+    state = request.arg("state")
+    if not state:
+        return Response("Bot is running. This is the OAuth redirect endpoint.")
+    if request.arg("error"):
+        oauth_flows.pop(state, None)
+        ok, message = False, f"Google reported: {html.escape(request.arg('error'))}. Please try /ytlogin again."
+    elif request.arg("code"):
+        ok, message = await complete_youtube_login(state, REDIRECT_URI.rstrip("/") + "/?" + urlencode(request.query, doseq=True))
+        message = html.escape(message)
+    else:
+        ok, message = False, "The redirect did not include an authorization code. Please try /ytlogin again."
+    title = "✅ Authentication Successful!" if ok else "❌ Authentication Failed"
+    return Response(_OAUTH_PAGE.format(title=title, message=message), status=200 if ok else 400,
+                    content_type="text/html; charset=utf-8")
+
+@http_server.route("/healthz")
+async def healthz(request):
+    return Response(json.dumps(health.snapshot(), default=str), status=200 if health.is_healthy() else 503,
+                    content_type="application/json")
+
+@http_server.route("/readyz")
+async def readyz(request):
+    return Response(json.dumps(health.snapshot(), default=str), status=200 if health.is_ready() else 503,
+                    content_type="application/json")
+
+@http_server.route("/metrics")
+async def metrics_endpoint(request):
+    from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+    return Response(generate_latest(REGISTRY), content_type=CONTENT_TYPE_LATEST)
+
+async def _deliver_channel_log(text):
+    await app.send_message(LOG_CHANNEL, text, disable_web_page_preview=True, parse_mode=enums.ParseMode.MARKDOWN)
+
+log_digest = log_pipeline.LogChannelDigest(_deliver_channel_log, LOG_DIGEST_INTERVAL, LOG_DIGEST_MAX_ITEMS)
 
-def run_server():
+def _on_loop_stall(stall, alert):
+    metrics.LOOP_STALLS.labels(stall.culprit).inc()
+    if alert and app is not None and ADMIN_ID:
+        task_tracker.create_task(safe_task_wrapper(_send_stall_alert(stall)))
+
+async def _send_stall_alert(stall):
+    text = (
+        f"🐢 **Event loop blocked for {stall.seconds:.2f}s**\n\n"
+        f"**Where:** `{stall.culprit}`\n"
+        f"**Handler:** `{stall.handler or 'unknown'}`\n"
+    )
+    if stall.stack:
+        text += f"\n```\n{stall.stack[-2500:]}\n```"
     try:
-        server = HTTPServer(('0.0.0.0', PORT), OAuthHandler)
-        logger.info(f"HTTP OAuth/health server started on port {PORT}.")
-        server.serve_forever()
+        await app.send_message(ADMIN_ID, text)
     except Exception as e:
-        logger.error(f"HTTP server failed: {e}")
+        logger.error(f"Failed to send loop stall alert to admin: {e}")
+
+def _attributed(callback):
+    """Names the handler in loop stall and slow-callback reports."""
+    @wraps(callback)
+    async def wrapper(client, *args):
+        with loop_monitor.attribute(callback.__name__):
+            return await callback(client, *args)
+    return wrapper
 
-async def send_log_to_channel(client, channel_id, text):
-    global valid_log_channel
+async def send_log_to_channel(client, channel_id, text, urgent=False):
+    """Queues an event for the next log-channel digest; `urgent` (errors) goes out immediately."""
     if not channel_id or not valid_log_channel:
         return
-    try:
-        await client.send_message(channel_id, text, disable_web_page_preview=True, parse_mode=enums.ParseMode.MARKDOWN)
-    except Exception as e:
-        logger.error(f"Failed to log to channel {channel_id}: {e}")
+    await log_digest.post(text, urgent=urgent)
 
 
 # ===================================================================
 # ======================== BOT STARTUP ============================
 # ===================================================================
-async def start_bot():
-    global mongo, db, global_settings, upload_semaphore, MAX_CONCURRENT_UPLOADS, MAX_FILE_SIZE_BYTES, task_tracker, valid_log_channel, BOT_ID
+def create_app():
+    """Sets up logging, validates the required configuration and builds the client.
+
+    Importing this module has no side effects; every handler defined above is
+    collected from its Pyrogram decorator and registered here. Raises RuntimeError
+    when a required environment variable is missing.
+    """
+    global app, API_ID, ADMIN_ID, LOG_CHANNEL, staging
+    log_pipeline.setup_logging(LOG_FILE, LOG_MAX_BYTES, LOG_BACKUP_COUNT, json_file=LOG_JSON)
+
+    required = {"TELEGRAM_API_ID": API_ID_STR, "TELEGRAM_API_HASH": API_HASH, "TELEGRAM_BOT_TOKEN": BOT_TOKEN,
+                "ADMIN_ID": ADMIN_ID_STR, "MONGO_DB": MONGO_URI}
+    missing = [name for name, value in required.items() if not value]
+    if missing:
+        raise RuntimeError(f"Required environment variables are missing: {', '.join(missing)}")
+
+    API_ID = int(API_ID_STR)
+    ADMIN_ID = int(ADMIN_ID_STR)
+    LOG_CHANNEL = int(LOG_CHANNEL_STR) if LOG_CHANNEL_STR else None
+    admin_only.add(ADMIN_ID)
+    flood_controller.exempt.add(ADMIN_ID)
+
+    staging = StagingArea(
+        STAGING_DIR,
+        small_root=STAGING_SMALL_DIR,
+        small_threshold=STAGING_SMALL_MAX_MB * 1024 * 1024,
+        min_free_bytes=STAGING_MIN_FREE_MB * 1024 * 1024,
+        size_factor=STAGING_SIZE_FACTOR,
+        orphan_age=STAGING_ORPHAN_HOURS * 3600
+    )
+
+    app = metrics.InstrumentedClient("upload_bot", api_id=API_ID, api_hash=API_HASH, bot_token=BOT_TOKEN)
+    MessageRef.client = app
+    metrics.watch_session_flood_waits()
+    from prometheus_client import REGISTRY
+    REGISTRY.register(HealthCollector(health))
+    REGISTRY.register(metrics.RuntimeCollector([download_limiter, transcode_limiter, upload_limiter], governor, executors.snapshot_all))
+    for limiter in (download_limiter, transcode_limiter, upload_limiter):
+        limiter.observe_wait = metrics.LIMITER_WAIT_SECONDS.labels(limiter.name).observe
+    loop_monitor.observe_lag = metrics.LOOP_LAG_SECONDS.observe
+    loop_monitor.on_stall = _on_loop_stall
+    loop_monitor.on_slow_callback = lambda label, seconds: metrics.LOOP_SLOW_CALLBACKS.labels(label).inc()
+    for handler_func in list(globals().values()):
+        if asyncio.iscoroutinefunction(handler_func):
+            for handler, group in getattr(handler_func, "handlers", ()):
+                handler.callback = _attributed(handler.callback)
+                app.add_handler(handler, group)
+    return app
+
+async def _setup_database():
+    """Connects to MongoDB, then migrates, restores state and loads settings concurrently. Raises on failure."""
+    global repo, stats_service, rollups, activity_buffer, premium_sweeper
+
+    repo = Repository(
+        MONGO_URI,
+        max_pool_size=MONGO_MAX_POOL_SIZE,
+        min_pool_size=MONGO_MIN_POOL_SIZE,
+        max_idle_time_ms=MONGO_MAX_IDLE_MS,
+        event_listeners=[metrics.MongoCommandMetrics()]
+    )
+    await health.phase("mongo_connect", repo.connect(), STARTUP_STEP_TIMEOUT)
+    stats_service = StatsService(repo.db, PREMIUM_PLATFORMS, ttl=STATS_CACHE_TTL)
+    rollups = DailyRollups(repo.db)
+    tracer.collection = repo.db.job_traces
+    activity_buffer = ActivityBuffer(repo.users, flush_interval=ACTIVITY_FLUSH_INTERVAL, max_pending=ACTIVITY_MAX_PENDING)
+    premium_sweeper = PremiumSweeper(
+        repo.users, entitlement_cache, PREMIUM_PLATFORMS,
+        notify=send_premium_reminder,
+        interval=PREMIUM_SWEEP_INTERVAL,
+        remind_before=timedelta(hours=PREMIUM_REMINDER_HOURS),
+        batch_size=PREMIUM_REMINDER_BATCH
+    )
+    logger.info("✅ Connected to MongoDB successfully.")
+
+    async def migrate():
+        schema_version = await migrations.run_migrations(repo.db, PREMIUM_PLATFORMS)
+        logger.info(f"Database schema is at version {schema_version}.")
+        if MONGO_PROFILE_SLOW_MS > 0:
+            await migrations.enable_profiler(repo.db, MONGO_PROFILE_SLOW_MS)
+
+    async def restore_state():
+        if STATE_PERSISTENCE:
+            restored = await user_states.load(repo.collection("conversation_states"))
+            logger.info(f"Restored {restored} in-progress conversations.")
+        # Nothing is in flight yet, so anything unclaimed in staging was left by a crash.
+        await executors.run("io", staging.sweep, await staging_protected_ids(), 0)
+
+    async def load_settings():
+        global global_settings
+        settings_from_db = await repo.get_global_settings() or {}
 
-    try:
-        mongo = MongoClient(MONGO_URI, serverSelectionTimeoutMS=5000)
-        mongo.admin.command('ping')
-        db = mongo.UploaderBotDB
-        logger.info("✅ Connected to MongoDB successfully.")
-        
-        await asyncio.to_thread(db.scheduled_jobs.create_index, [("schedule_time", 1), ("status", 1)])
-        
-        settings_from_db = await asyncio.to_thread(db.settings.find_one, {"_id": "global_settings"}) or {}
-        
         def merge_dicts(d1, d2):
             for k, v in d2.items():
                 if k in d1 and isinstance(d1[k], dict) and isinstance(v, dict):
                     merge_dicts(d1[k], v)
                 else:
                     d1[k] = v
-        
+
         global_settings = DEFAULT_GLOBAL_SETTINGS.copy()
         merge_dicts(global_settings, settings_from_db)
-
-        await asyncio.to_thread(db.settings.update_one, {"_id": "global_settings"}, {"$set": global_settings}, upsert=True)
+        await repo.update_global_settings(global_settings)
         logger.info("Global settings loaded and synchronized.")
+
+    migrated, restored, loaded = await asyncio.gather(
+        health.phase("migrations", migrate(), STARTUP_MIGRATION_TIMEOUT),
+        health.phase("restore_state", restore_state(), STARTUP_STEP_TIMEOUT),
+        health.phase("global_settings", load_settings(), STARTUP_STEP_TIMEOUT),
+        return_exceptions=True
+    )
+    # Indexes are an optimisation and leftovers can wait for the janitor; keep serving and retry on the next start.
+    if isinstance(migrated, Exception):
+        logger.error(f"Schema migration failed: {migrated!r}")
+    if isinstance(restored, Exception):
+        logger.warning(f"Startup state restore/cleanup failed: {restored!r}")
+    if isinstance(loaded, Exception):
+        raise loaded
+
+async def _check_log_channel():
+    """Validates LOG_CHANNEL and announces the bot there; returns a problem for the admin, or ''."""
+    global valid_log_channel
+    try:
+        chat, member = await asyncio.gather(app.get_chat(LOG_CHANNEL), app.get_chat_member(LOG_CHANNEL, BOT_ID))
+        if hasattr(chat, 'is_public') and chat.is_public:
+            raise ValueError("LOG_CHANNEL must be a private channel.")
+        if member.status not in [enums.ChatMemberStatus.ADMINISTRATOR, enums.ChatMemberStatus.OWNER]:
+            raise PermissionError("Bot is not an admin in LOG_CHANNEL.")
+        valid_log_channel = True
+        await app.send_message(LOG_CHANNEL, "✅ **" + to_bold_sans("Bot Is Now Online!") + "**")
+        return ""
     except Exception as e:
-        logger.critical(f"❌ DATABASE SETUP FAILED: {e}. Running in degraded mode.")
-        db = None
-        global_settings = DEFAULT_GLOBAL_SETTINGS
+        error = f"Could not access LOG_CHANNEL ({LOG_CHANNEL}). Logging disabled. Error: {e!r}"
+        logger.error(error)
+        valid_log_channel = False
+        return f"**LOGGING ERROR**: {error}\n\n"
+
+async def _setup_telegram():
+    """Starts the client and checks the log channel; returns problems for the admin DM."""
+    global BOT_ID
+    await health.phase("telegram_start", app.start(), STARTUP_TELEGRAM_TIMEOUT)
+    me = await health.phase("telegram_get_me", app.get_me(), STARTUP_STEP_TIMEOUT)
+    BOT_ID = me.id
+    if not LOG_CHANNEL:
+        return ""
+    try:
+        return await health.phase("log_channel", _check_log_channel(), STARTUP_STEP_TIMEOUT)
+    except asyncio.TimeoutError:
+        return f"**LOGGING ERROR**: LOG_CHANNEL ({LOG_CHANNEL}) did not respond within {STARTUP_STEP_TIMEOUT}s.\n\n"
 
-    MAX_CONCURRENT_UPLOADS = global_settings.get("max_concurrent_uploads")
-    upload_semaphore = asyncio.Semaphore(MAX_CONCURRENT_UPLOADS)
-    MAX_FILE_SIZE_BYTES = global_settings.get("max_file_size_mb") * 1024 * 1024
+async def _probe_telegram():
+    if not app.is_connected:
+        raise ConnectionError("Telegram client is disconnected")
 
-    server_thread = threading.Thread(target=run_server, daemon=True)
-    server_thread.start()
-    
-    await app.start()
-    me = await app.get_me()
-    BOT_ID = me.id
-    
-    task_tracker.loop = asyncio.get_running_loop()
+async def _probe_mongo():
+    if repo is None:
+        raise ConnectionError("running without a database")
+    await repo.ping()
 
-    admin_dm_text = ""
-    if LOG_CHANNEL:
+async def start_bot():
+    global MAX_CONCURRENT_UPLOADS, MAX_FILE_SIZE_BYTES
+
+    task_tracker.loop = asyncio.get_running_loop()
+    task_tracker.create_task(safe_task_wrapper(health.run_heartbeat()))
+    task_tracker.create_task(safe_task_wrapper(loop_monitor.run()))
+    # Liveness answers while the slower phases below run.
+    await http_server.start()
+
+    executors.configure({
+        "io": EXECUTOR_IO_WORKERS,
+        "upload": EXECUTOR_UPLOAD_WORKERS,
+        "media": EXECUTOR_MEDIA_WORKERS
+    })
+
+    async def database_side():
+        global repo, global_settings, stats_service, rollups, activity_buffer, premium_sweeper
         try:
-            chat = await app.get_chat(LOG_CHANNEL)
-            if hasattr(chat, 'is_public') and chat.is_public:
-                raise ValueError("LOG_CHANNEL must be a private channel.")
-            member = await app.get_chat_member(LOG_CHANNEL, BOT_ID)
-            if member.status not in [enums.ChatMemberStatus.ADMINISTRATOR, enums.ChatMemberStatus.OWNER]:
-                raise PermissionError("Bot is not an admin in LOG_CHANNEL.")
-            valid_log_channel = True
-            await app.send_message(LOG_CHANNEL, "✅ **" + to_bold_sans("Bot Is Now Online!") + "**")
+            await _setup_database()
         except Exception as e:
-            error = f"Could not access LOG_CHANNEL ({LOG_CHANNEL}). Logging disabled. Error: {e}"
-            logger.error(error)
-            admin_dm_text += f"**LOGGING ERROR**: {error}\n\n"
-            valid_log_channel = False
-    
+            logger.critical(f"❌ DATABASE SETUP FAILED: {e!r}. Running in degraded mode.")
+            if repo is not None:
+                await repo.close()
+            repo = None
+            stats_service = None
+            rollups = None
+            activity_buffer = None
+            premium_sweeper = None
+            tracer.collection = None
+            global_settings = DEFAULT_GLOBAL_SETTINGS
+
+    # Telegram and MongoDB don't depend on each other; updates that arrive before both
+    # are done wait at the flood guards for health.startup_complete.
+    _, admin_dm_text = await asyncio.gather(database_side(), _setup_telegram())
+
+    MAX_CONCURRENT_UPLOADS = global_settings.get("max_concurrent_uploads")
+    await upload_limiter.set_max(MAX_CONCURRENT_UPLOADS)
+    MAX_FILE_SIZE_BYTES = global_settings.get("max_file_size_mb") * 1024 * 1024
+
+    health.set_component("telegram", True)
+    health.set_component("mongo", repo is not None, None if repo is not None else "database setup failed")
+    health.mark_started()
+    task_tracker.create_task(safe_task_wrapper(health.run_probes(
+        {"telegram": _probe_telegram, "mongo": _probe_mongo}, interval=HEALTH_PROBE_INTERVAL
+    )))
+
     if admin_dm_text:
         try:
             await app.send_message(ADMIN_ID, "⚠️ **Configuration Issues Detected**\n\n" + admin_dm_text + "Please fix and restart.")
         except Exception as e:
             logger.error(f"Failed to send configuration error DM to admin: {e}")
 
-
     logger.info(f"Bot is now online! ID: {BOT_ID}. Waiting for tasks...")
+    # Updates are already being served; pull the platform SDKs in before the first login/upload needs them.
+    task_tracker.create_task(safe_task_wrapper(executors.run("io", platform_sdks.warm)))
     task_tracker.create_task(weekly_report_scheduler())
     task_tracker.create_task(schedule_checker_task())
+    if activity_buffer is not None:
+        task_tracker.create_task(safe_task_wrapper(activity_buffer.run()))
+    if premium_sweeper is not None:
+        task_tracker.create_task(safe_task_wrapper(premium_sweeper.run()))
+    task_tracker.create_task(safe_task_wrapper(user_cache.run()))
+    for store in (user_states, oauth_flows, user_upload_locks, active_traces):
+        task_tracker.create_task(safe_task_wrapper(store.run(STATE_SWEEP_INTERVAL)))
+    task_tracker.create_task(safe_task_wrapper(flood_controller.run(STATE_SWEEP_INTERVAL)))
+    task_tracker.create_task(safe_task_wrapper(governor.run()))
+    task_tracker.create_task(safe_task_wrapper(staging.run(STAGING_SWEEP_INTERVAL, staging_protected_ids)))
+    if valid_log_channel:
+        task_tracker.create_task(safe_task_wrapper(log_digest.run()))
     await idle()
 
     logger.info("Shutting down...")
     await task_tracker.cancel_and_wait_all()
+    if valid_log_channel:
+        await log_digest.flush()
+    if activity_buffer is not None:
+        flushed = await activity_buffer.flush()
+        logger.info(f"Flushed pending activity for {flushed} users.")
+    if STATE_PERSISTENCE and repo is not None:
+        try:
+            saved = await user_states.save(repo.collection("conversation_states"))
+            logger.info(f"Persisted {saved} in-progress conversations.")
+        except Exception as e:
+            logger.error(f"Failed to persist conversation state: {e}")
+    await http_server.stop()
     await app.stop()
-    if mongo:
-        mongo.close()
+    if repo is not None:
+        await repo.close()
+    executors.shutdown_all()
     logger.info("Bot has been shut down gracefully.")
     
 async def broadcast_message(admin_msg, text=None, photo=None, video=None, reply_markup=None):
-    if db is None:
+    if repo is None:
         return await admin_msg.reply("DB connection failed, cannot get user list.")
 
-    users_cursor = await asyncio.to_thread(db.users.find, {})
-    users = await asyncio.to_thread(list, users_cursor)
     sent_count, failed_count = 0, 0
     status_msg = await admin_msg.reply(f"📢 {to_bold_sans('Starting Broadcast...')}")
     
-    for user in users:
+    async for user_id in repo.iter_user_ids():
         try:
-            user_id = user["_id"]
             if user_id == ADMIN_ID or user_id == BOT_ID:
                 continue
             
@@ -3003,60 +3757,90 @@ async def weekly_report_scheduler():
         await send_weekly_report()
         await _update_global_setting("last_weekly_report", now.isoformat())
 
-async def send_weekly_report():
-    if db is None or not valid_log_channel:
-        return
-
-    one_week_ago = datetime.now(timezone.utc) - timedelta(days=7)
-
-    new_users = await asyncio.to_thread(db.users.count_documents, {"added_at": {"$gte": one_week_ago}})
-    total_uploads_week = await asyncio.to_thread(db.uploads.count_documents, {"timestamp": {"$gte": one_week_ago}})
-    
-    new_premium_fb_count = await asyncio.to_thread(db.users.count_documents, {"premium.facebook.added_at": {"$gte": one_week_ago}})
-    new_premium_yt_count = await asyncio.to_thread(db.users.count_documents, {"premium.youtube.added_at": {"$gte": one_week_ago}})
-
+def format_rollup_report(title, summary, show_days=False):
+    """Renders a rollup summary for the log channel or the admin."""
     report_text = (
-        "📊 **" + to_bold_sans("Weekly Analytics Report") + "** 📊\n\n"
-        f"📅 **Period:** {one_week_ago.strftime('%Y-%m-%d')} to {datetime.now(timezone.utc).strftime('%Y-%m-%d')}\n\n"
-        f"**New Users:** `{new_users}`\n"
-        f"**Total Uploads This Week:** `{total_uploads_week}`\n"
-        f"**New Premium Members:**\n"
-        f"  - Facebook: `{new_premium_fb_count}`\n"
-        f"  - YouTube: `{new_premium_yt_count}`\n"
+        f"📊 **{to_bold_sans(title)}** 📊\n\n"
+        f"📅 **Period:** {summary['start']} to {summary['end']}\n\n"
+        f"**New Users:** `{summary['new_users']}`\n"
+        f"**Total Uploads:** `{summary['uploads_total']}`\n"
     )
+    for platform in PREMIUM_PLATFORMS:
+        by_type = summary["uploads"].get(platform, {})
+        breakdown = ", ".join(f"{t}: {n}" for t, n in sorted(by_type.items())) or "none"
+        report_text += f"  - {platform.capitalize()}: `{sum(by_type.values())}` ({breakdown})\n"
+    report_text += "**New Premium Members:**\n"
+    for platform in PREMIUM_PLATFORMS:
+        report_text += f"  - {platform.capitalize()}: `{summary['premium_grants'].get(platform, 0)}`\n"
+    report_text += (
+        f"**Failed Uploads:** `{summary['failures_total']}`\n"
+        f"**Data Processed:** `{summary['bytes_processed'] / (1024**3):.2f} GB`\n"
+    )
+    if show_days and summary["days"]:
+        report_text += "\n**Daily:**\n"
+        for day in summary["days"]:
+            report_text += f"`{day['day']}` 👥 {day['new_users']}  📈 {day['uploads_total']}  ❌ {day['failures_total']}\n"
+    if summary.get("backfilled_days"):
+        report_text += (
+            f"\n_{summary['backfilled_days']} day(s) in this period predate daily rollups and were rebuilt from "
+            "users and uploads; failures and data processed were not recorded for them._\n"
+        )
+    return report_text
+
+async def send_weekly_report():
+    if rollups is None or not valid_log_channel:
+        return
 
-    await send_log_to_channel(app, LOG_CHANNEL, report_text)
+    summary = await rollups.last_days(7)
+    await send_log_to_channel(app, LOG_CHANNEL, format_rollup_report("Weekly Analytics Report", summary))
     
 async def schedule_checker_task():
     logger.info("Scheduler worker started.")
     while not shutdown_event.is_set():
-        if db is not None:
+        if repo is not None:
             try:
                 now = datetime.now(timezone.utc)
-                due_jobs_cursor = db.scheduled_jobs.find({
-                    "schedule_time": {"$lte": now},
-                    "status": "pending"
-                })
-                
-                due_jobs = await asyncio.to_thread(list, due_jobs_cursor)
+                due_jobs = await repo.due_scheduled_jobs(now)
 
                 for job in due_jobs:
                     job_id_str = str(job['_id'])
                     logger.info(f"Processing scheduled job: {job_id_str}")
                     
-                    await asyncio.to_thread(db.scheduled_jobs.update_one, {"_id": job['_id']}, {"$set": {"status": "processing"}})
+                    await repo.update_scheduled_job(job['_id'], {"status": "processing"})
+                    due_at = job.get('schedule_time')
+                    if due_at:
+                        if due_at.tzinfo is None:
+                            due_at = due_at.replace(tzinfo=timezone.utc)
+                        metrics.SCHEDULER_LAG_SECONDS.observe(max((now - due_at).total_seconds(), 0))
+                    staging_id = job['metadata'].get('staging_id') or StagingArea.new_job_id()
                     
                     try:
                         stored_msg = await app.get_messages(job['original_chat_id'], job['original_message_id'])
                         if not stored_msg:
                             raise FileNotFoundError(f"Message {job['original_message_id']} not found in chat {job['original_chat_id']}.")
                         
-                        downloaded_path = await app.download_media(stored_msg)
+                        media = stored_msg.video or stored_msg.photo or stored_msg.document
+                        media_size = media.file_size if media else 0
+                        try:
+                            staging.admit(staging_id, media_size)
+                        except StagingFull as e:
+                            logger.warning(f"Deferring scheduled job {job_id_str}: staging volume is full ({e}).")
+                            await repo.update_scheduled_job(job['_id'], {"status": "pending"})
+                            continue
+                        trace = tracer.start(staging_id, job['user_id'], platform=job['platform'],
+                                             upload_type=job.get('upload_type', 'video'), scheduled_job=job_id_str, size=media_size)
+                        async with download_limiter:
+                            download_started = time.perf_counter()
+                            with trace.span("download", source="scheduled", size=media_size):
+                                downloaded_path = await app.download_media(stored_msg, file_name=staging.job_dir(staging_id, media_size))
+                            metrics.DOWNLOAD_SECONDS.labels("scheduled").observe(time.perf_counter() - download_started)
+                            metrics.DOWNLOAD_BYTES.labels("scheduled").inc(media_size or 0)
 
                         file_info = {
                             "original_media_msg": stored_msg,
                             "downloaded_path": downloaded_path,
-                            **job['metadata']
+                            **job['metadata'],
+                            "staging_id": staging_id
                         }
                         
                         task_tracker.create_task(
@@ -3065,7 +3849,10 @@ async def schedule_checker_task():
 
                     except Exception as e:
                         logger.error(f"Failed to process scheduled job {job_id_str}: {e}", exc_info=True)
-                        await asyncio.to_thread(db.scheduled_jobs.update_one, {"_id": job['_id']}, {"$set": {"status": "failed", "error_message": str(e)}})
+                        staging.discard(staging_id)
+                        await tracer.finish(staging_id, "failed", e)
+                        await repo.update_scheduled_job(job['_id'], {"status": "failed", "error_message": str(e)})
+                        await rollups.record_failure(job.get('platform'))
                         try:
                             await app.send_message(job['user_id'], f"❌ Your scheduled upload for '{job['metadata']['title']}' failed. Error: {e}")
                         except Exception as notify_e:
@@ -3077,22 +3864,15 @@ async def schedule_checker_task():
         await asyncio.sleep(60)
     logger.info("Scheduler worker stopped.")
     
-@app.on_callback_query(filters.regex("^manage_schedules_"))
-@rate_limit_callbacks
+@router.callback("manage_schedules_", prefix=True)
 async def manage_schedules_cb(_, query):
     user_id = query.from_user.id
     platform = query.data.split("_")[-1]
     
-    if db is None:
+    if repo is None:
         return await query.answer("Database is offline.", show_alert=True)
         
-    jobs_cursor = db.scheduled_jobs.find({
-        "user_id": user_id,
-        "platform": platform,
-        "status": "pending"
-    }).sort("schedule_time", 1)
-    
-    jobs = await asyncio.to_thread(list, jobs_cursor)
+    jobs = await repo.pending_scheduled_jobs(user_id, platform)
     
     if not jobs:
         await safe_edit_message(query.message, f"You have no pending scheduled posts for {platform.capitalize()}.", reply_markup=InlineKeyboardMarkup([[InlineKeyboardButton(f"🔙 Back to {platform.capitalize()} Settings", callback_data=f"hub_settings_{platform}")]]))
@@ -3114,16 +3894,15 @@ async def manage_schedules_cb(_, query):
     
     await safe_edit_message(query.message, text, reply_markup=InlineKeyboardMarkup(buttons))
 
-@app.on_callback_query(filters.regex("^cancel_schedule_"))
-@rate_limit_callbacks
+@router.callback("cancel_schedule_", prefix=True)
 async def cancel_schedule_cb(_, query):
     user_id = query.from_user.id
     job_id = query.data.split("_")[-1]
 
-    if db is None:
+    if repo is None:
         return await query.answer("Database is offline.", show_alert=True)
     
-    job = await asyncio.to_thread(db.scheduled_jobs.find_one_and_delete, {"_id": ObjectId(job_id), "user_id": user_id})
+    job = await repo.delete_scheduled_job(job_id, user_id)
     
     if job:
         await query.answer("Scheduled post cancelled successfully!", show_alert=True)
@@ -3141,6 +3920,11 @@ async def cancel_schedule_cb(_, query):
 
 
 if __name__ == "__main__":
+    try:
+        create_app()
+    except RuntimeError as e:
+        logger.critical(f"FATAL ERROR: {e}")
+        sys.exit(1)
     task_tracker = TaskTracker()
     try:
         app.run(start_bot())
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+import re
+import time
+
+from prometheus_client import Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from pymongo import monitoring
+from pyrogram import Client
+from pyrogram.errors import FloodWait, RPCError
+
+logger = logging.getLogger("YTFBUser.metrics")
+
+# Buckets sized for the pipeline: sub-second probes up to hour-long uploads.
+_STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+_FAST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_LAG_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_RATE_BUCKETS = tuple(mb * 1024 * 1024 for mb in (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 50, 100))
+
+DOWNLOAD_SECONDS = Histogram("bot_download_seconds", "Telegram media download time", ["source"], buckets=_STAGE_BUCKETS)
+DOWNLOAD_BYTES = Counter("bot_download_bytes_total", "Bytes downloaded from Telegram", ["source"])
+PROBE_SECONDS = Histogram("bot_probe_seconds", "needs_conversion (ffprobe) time", buckets=_STAGE_BUCKETS)
+TRANSCODE_SECONDS = Histogram("bot_transcode_seconds", "process_video_for_upload time", ["mode", "outcome"],
+                              buckets=_STAGE_BUCKETS)
+THUMBNAIL_SECONDS = Histogram("bot_thumbnail_seconds", "Thumbnail generation time", buckets=_STAGE_BUCKETS)
+UPLOAD_SECONDS = Histogram("bot_upload_seconds", "Platform upload time", ["platform", "upload_type"],
+                           buckets=_STAGE_BUCKETS)
+UPLOAD_BYTES = Counter("bot_upload_bytes_total", "Bytes uploaded to platforms", ["platform"])
+UPLOAD_THROUGHPUT = Histogram("bot_upload_throughput_bytes_per_second", "Per-upload throughput", ["platform"],
+                              buckets=_RATE_BUCKETS)
+UPLOADS = Counter("bot_uploads_total", "Finished upload jobs", ["platform", "outcome"])
+LIMITER_WAIT_SECONDS = Histogram("bot_limiter_wait_seconds", "Time spent waiting for a concurrency slot", ["stage"],
+                                 buckets=_STAGE_BUCKETS)
+SCHEDULER_LAG_SECONDS = Histogram("bot_scheduler_lag_seconds", "Delay between a job's due time and its start",
+                                  buckets=_STAGE_BUCKETS)
+MONGO_COMMAND_SECONDS = Histogram("bot_mongo_command_seconds", "MongoDB command latency", ["command", "outcome"],
+                                  buckets=_FAST_BUCKETS)
+TELEGRAM_REQUEST_SECONDS = Histogram("bot_telegram_request_seconds", "Telegram API call latency", ["method"],
+                                     buckets=_FAST_BUCKETS)
+TELEGRAM_ERRORS = Counter("bot_telegram_errors_total", "Telegram API errors", ["method", "error"])
+TELEGRAM_FLOOD_WAIT_SECONDS = Counter("bot_telegram_flood_wait_seconds_total", "Seconds Telegram asked us to wait",
+                                      ["method"])
+LOOP_LAG_SECONDS = Histogram("bot_event_loop_lag_seconds", "How late the loop sampler woke up", buckets=_LAG_BUCKETS)
+LOOP_STALLS = Counter("bot_event_loop_stalls_total", "Loop blocked past the stall threshold", ["culprit"])
+LOOP_SLOW_CALLBACKS = Counter("bot_event_loop_slow_callbacks_total", "Slow callbacks seen in asyncio debug mode",
+                              ["callback"])
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Feeds per-command latency from the driver's own monitoring events."""
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        MONGO_COMMAND_SECONDS.labels(event.command_name, "ok").observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        MONGO_COMMAND_SECONDS.labels(event.command_name, "error").observe(event.duration_micros / 1e6)
+
+
+class InstrumentedClient(Client):
+    """Pyrogram client that times every raw API call and counts errors and FloodWaits.
+
+    Pyrogram's session sleeps through FloodWaits up to `sleep_threshold` and
+    retries on its own, so short waits would never reach invoke(). Calls go
+    down with a threshold of 0 instead and the sleep-and-retry happens here,
+    where each wait is counted and kept out of the request latency.
+    """
+
+    async def invoke(self, query, *args, sleep_threshold=None, **kwargs):
+        method = type(query).__name__
+        threshold = self.sleep_threshold if sleep_threshold is None else sleep_threshold
+        while True:
+            started = time.perf_counter()
+            try:
+                return await super().invoke(query, *args, sleep_threshold=0, **kwargs)
+            except FloodWait as e:
+                wait = e.value or 0
+                TELEGRAM_ERRORS.labels(method, "FLOOD_WAIT").inc()
+                TELEGRAM_FLOOD_WAIT_SECONDS.labels(method).inc(wait)
+                if wait > threshold >= 0:  # same rule as Session.invoke; -1 means always wait
+                    raise
+            except RPCError as e:
+                TELEGRAM_ERRORS.labels(method, e.ID or type(e).__name__).inc()
+                raise
+            finally:
+                TELEGRAM_REQUEST_SECONDS.labels(method).observe(time.perf_counter() - started)
+            logger.warning(f"Waiting for {wait} seconds before continuing (required by \"{method}\")")
+            await asyncio.sleep(wait)
+
+
+# Session.invoke's log line when it sleeps through a FloodWait itself.
+_SESSION_FLOOD_WAIT_RE = re.compile(r'Waiting for (?P<seconds>[\d.]+) seconds before continuing \(required by "(?P<query>[^"]+)"\)')
+
+
+class SessionFloodWaitHandler(logging.Handler):
+    """Counts FloodWaits slept through inside Pyrogram's media sessions.
+
+    get_file/save_file call their DC sessions directly, bypassing
+    InstrumentedClient.invoke; the session's own warning is the only trace.
+    """
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+
+    def emit(self, record):
+        try:
+            match = _SESSION_FLOOD_WAIT_RE.search(record.getMessage())
+        except Exception:
+            return
+        if match:
+            method = match.group("query").rsplit(".", 1)[-1]
+            TELEGRAM_ERRORS.labels(method, "FLOOD_WAIT").inc()
+            TELEGRAM_FLOOD_WAIT_SECONDS.labels(method).inc(float(match.group("seconds")))
+
+
+def watch_session_flood_waits():
+    session_logger = logging.getLogger("pyrogram.session.session")
+    if not any(isinstance(h, SessionFloodWaitHandler) for h in session_logger.handlers):
+        session_logger.addHandler(SessionFloodWaitHandler())
+
+
+def observe_upload(platform, upload_type, seconds, size):
+    UPLOAD_SECONDS.labels(platform, upload_type).observe(seconds)
+    UPLOAD_BYTES.labels(platform).inc(size)
+    if seconds > 0:
+        UPLOAD_THROUGHPUT.labels(platform).observe(size / seconds)
+
+
+class RuntimeCollector:
+    """Scrape-time gauges for queues the bot already tracks: limiters, thread pools, governor readings."""
+
+    def __init__(self, limiters, governor, executor_snapshots):
+        self.limiters = limiters
+        self.governor = governor
+        self.executor_snapshots = executor_snapshots
+
+    def collect(self):
+        limit = GaugeMetricFamily("bot_stage_limit", "Current concurrency limit per stage", labels=["stage"])
+        active = GaugeMetricFamily("bot_stage_active", "Jobs holding a slot per stage", labels=["stage"])
+        waiting = GaugeMetricFamily("bot_stage_waiting", "Jobs queued for a slot per stage", labels=["stage"])
+        for limiter in self.limiters:
+            snap = limiter.snapshot()
+            limit.add_metric([snap["name"]], snap["limit"])
+            active.add_metric([snap["name"]], snap["active"])
+            waiting.add_metric([snap["name"]], snap["waiting"])
+        yield from (limit, active, waiting)
+
+        pool_active = GaugeMetricFamily("bot_executor_active", "Busy threads per pool", labels=["pool"])
+        pool_queued = GaugeMetricFamily("bot_executor_queued", "Calls waiting for a thread per pool", labels=["pool"])
+        pool_done = CounterMetricFamily("bot_executor_completed", "Calls finished per pool", labels=["pool"])
+        for pool in self.executor_snapshots():
+            pool_active.add_metric([pool["name"]], pool["active"])
+            pool_queued.add_metric([pool["name"]], pool["queued"])
+            pool_done.add_metric([pool["name"]], pool["completed"])
+        yield from (pool_active, pool_queued, pool_done)
+
+        snap = self.governor.snapshot()
+        readings = GaugeMetricFamily("bot_governor_reading", "Last governor sample", labels=["resource"])
+        for name, value in snap["readings"].items():
+            readings.add_metric([name], value)
+        yield readings
+        yield GaugeMetricFamily("bot_governor_pressure", "Worst reading/target ratio", value=snap["pressure"])
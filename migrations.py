@@ -0,0 +1,231 @@
+import logging
+from datetime import datetime, timezone
+
+from pymongo import UpdateOne
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger("YTFBUser.migrations")
+
+SCHEMA_DOC_ID = "schema"
+JOB_TRACES_BYTES = 64 * 1024 * 1024  # capped: oldest traces roll off
+
+# Keys MongoDB adds to a logged command that explain() does not accept back.
+_PROFILE_ONLY_KEYS = {"lsid", "$db", "$clusterTime", "$readPreference", "txnNumber", "signature", "apiVersion"}
+
+
+async def _v1_scheduled_jobs(db, platforms):
+    await db.scheduled_jobs.create_index([("schedule_time", 1), ("status", 1)])
+    await db.scheduled_jobs.create_index([("user_id", 1), ("platform", 1), ("status", 1), ("schedule_time", 1)])
+
+
+async def _v2_uploads(db, platforms):
+    await db.uploads.create_index([("user_id", 1), ("platform", 1)])
+    await db.uploads.create_index([("platform", 1), ("timestamp", -1)])
+    await db.uploads.create_index([("timestamp", -1)])
+
+
+async def _v3_sessions(db, platforms):
+    # Sessions used to be upserted without a unique index, so older databases may hold
+    # duplicates that would fail the index build; keep the newest login of each.
+    cursor = await db.sessions.aggregate([
+        {"$sort": {"logged_in_at": -1}},
+        {"$group": {"_id": {"user_id": "$user_id", "platform": "$platform", "account_id": "$account_id"},
+                    "ids": {"$push": "$_id"}, "count": {"$sum": 1}}},
+        {"$match": {"count": {"$gt": 1}}}
+    ], allowDiskUse=True)
+    removed = 0
+    async for group in cursor:
+        result = await db.sessions.delete_many({"_id": {"$in": group["ids"][1:]}})
+        removed += result.deleted_count
+    if removed:
+        logger.warning(f"Removed {removed} duplicate session documents before adding the unique index.")
+    await db.sessions.create_index([("user_id", 1), ("platform", 1), ("account_id", 1)], unique=True)
+
+
+async def _v4_users(db, platforms):
+    await db.users.create_index([("added_at", 1)])
+    for platform in platforms:
+        await db.users.create_index([(f"premium.{platform}.added_at", 1)])
+        await db.users.create_index([(f"premium.{platform}.status", 1), (f"premium.{platform}.until", 1)])
+
+
+async def _v5_job_traces(db, platforms):
+    existing = await (await db.list_collections(filter={"name": "job_traces"})).to_list()
+    if not existing:
+        await db.create_collection("job_traces", capped=True, size=JOB_TRACES_BYTES)
+    elif not existing[0].get("options", {}).get("capped"):
+        # Created implicitly by an insert before this migration ran (e.g. an earlier one failed).
+        logger.warning("job_traces exists uncapped; converting it to a capped collection.")
+        await db.command("convertToCapped", "job_traces", size=JOB_TRACES_BYTES)
+    await db.job_traces.create_index([("job_id", 1)])
+    await db.job_traces.create_index([("user_id", 1), ("started_at", -1)])
+    await db.job_traces.create_index([("started_at", -1)])
+
+
+async def _grouped_by_day(collection, date_field, cutoff, extra_keys=None):
+    """(group key, count) pairs per UTC day (plus `extra_keys`) of documents dated before `cutoff`."""
+    group_id = {"day": {"$dateToString": {"format": "%Y-%m-%d", "date": f"${date_field}"}}}
+    group_id.update(extra_keys or {})
+    cursor = await collection.aggregate([
+        {"$match": {date_field: {"$type": "date", "$lt": cutoff}}},
+        {"$group": {"_id": group_id, "n": {"$sum": 1}}}
+    ], allowDiskUse=True)
+    return [(doc["_id"], doc["n"]) async for doc in cursor]
+
+
+async def _v6_rollup_backfill(db, platforms):
+    # daily_rollups only counts events from the deploy that introduced it; rebuild the days
+    # before that from the collections the old weekly report counted. Failures and bytes
+    # processed were never stored, so backfilled days carry neither. The first live day is
+    # left as counted, so events earlier on the deploy day itself are not added.
+    first_live = await db.daily_rollups.find_one({"backfilled": {"$ne": True}}, sort=[("_id", 1)])
+    cutoff = (datetime.strptime(first_live["_id"], "%Y-%m-%d").replace(tzinfo=timezone.utc) if first_live
+              else datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0))
+
+    days = {}
+    for key, n in await _grouped_by_day(db.users, "added_at", cutoff):
+        days.setdefault(key["day"], {})["new_users"] = n
+    uploads = await _grouped_by_day(db.uploads, "timestamp", cutoff, {
+        "platform": {"$ifNull": ["$platform", "unknown"]}, "upload_type": {"$ifNull": ["$upload_type", "video"]}
+    })
+    for key, n in uploads:
+        increments = days.setdefault(key["day"], {})
+        increments["uploads_total"] = increments.get("uploads_total", 0) + n
+        increments[f"uploads.{key['platform']}.{key['upload_type']}"] = n
+    for platform in platforms:
+        # Only each user's current grant survives, as in the weekly report this replaces.
+        grants = await _grouped_by_day(db.users, f"premium.{platform}.added_at", cutoff,
+                                       {"plan": {"$ifNull": [f"$premium.{platform}.type", "unknown"]}})
+        for key, n in grants:
+            increments = days.setdefault(key["day"], {})
+            increments[f"premium_grants.{platform}"] = increments.get(f"premium_grants.{platform}", 0) + n
+            plan_field = f"premium_plans.{key['plan']}"
+            increments[plan_field] = increments.get(plan_field, 0) + n
+
+    # Re-running replaces earlier backfilled values; live days are at or after the cutoff and untouched.
+    ops = [
+        UpdateOne({"_id": day}, {"$set": {**increments, "backfilled": True,
+                                          "date": datetime.strptime(day, "%Y-%m-%d").replace(tzinfo=timezone.utc)}},
+                  upsert=True)
+        for day, increments in days.items()
+    ]
+    if ops:
+        await db.daily_rollups.bulk_write(ops, ordered=False)
+    logger.info(f"Backfilled {len(ops)} daily rollups before {cutoff:%Y-%m-%d}.")
+
+
+# (version, description, migration). Append only; never renumber a shipped entry.
+MIGRATIONS = [
+    (1, "scheduled_jobs: due-job and per-user pending indexes", _v1_scheduled_jobs),
+    (2, "uploads: per-user, per-platform and time-range indexes", _v2_uploads),
+    (3, "sessions: unique (user_id, platform, account_id)", _v3_sessions),
+    (4, "users: signup date, premium grant date and premium status/expiry indexes", _v4_users),
+    (5, "job_traces: capped collection with job, per-user and time indexes", _v5_job_traces),
+    (6, "daily_rollups: backfill users, uploads and premium grants from before rollups existed", _v6_rollup_backfill),
+]
+
+
+async def get_schema_version(db) -> int:
+    doc = await db.schema_migrations.find_one({"_id": SCHEMA_DOC_ID})
+    return doc.get("version", 0) if doc else 0
+
+
+async def run_migrations(db, platforms):
+    """Applies every migration newer than the stored schema version, in order.
+
+    Each step is idempotent (create_index is a no-op for an existing index), so a
+    crash between a migration and its version bump is safe to re-run.
+    """
+    current = await get_schema_version(db)
+    for version, description, migration in MIGRATIONS:
+        if version <= current:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        await migration(db, platforms)
+        await db.schema_migrations.update_one(
+            {"_id": SCHEMA_DOC_ID},
+            {"$set": {"version": version, "updated_at": datetime.now(timezone.utc)},
+             "$push": {"history": {"version": version, "description": description,
+                                   "applied_at": datetime.now(timezone.utc)}}},
+            upsert=True
+        )
+        current = version
+    return current
+
+
+# --- Slow query reporting ---
+
+async def enable_profiler(db, slow_ms: int) -> bool:
+    """Turns on level-1 profiling (slow operations only). Managed clusters may refuse it."""
+    try:
+        await db.command("profile", 1, slowms=slow_ms)
+        logger.info(f"Database profiler enabled for operations slower than {slow_ms} ms.")
+        return True
+    except OperationFailure as e:
+        logger.warning(f"Could not enable the database profiler: {e}")
+        return False
+
+
+def _plan_stages(node) -> list[str]:
+    stages = []
+    while isinstance(node, dict):
+        if "stage" in node:
+            stages.append(node["stage"])
+        if "inputStages" in node:
+            for child in node["inputStages"]:
+                stages.extend(_plan_stages(child))
+            break
+        node = node.get("inputStage") or node.get("queryPlan")
+    return stages
+
+
+def _find_winning_plan(explain):
+    if isinstance(explain, dict):
+        if "winningPlan" in explain:
+            return explain["winningPlan"]
+        for value in explain.values():
+            found = _find_winning_plan(value)
+            if found is not None:
+                return found
+    elif isinstance(explain, list):
+        for value in explain:
+            found = _find_winning_plan(value)
+            if found is not None:
+                return found
+    return None
+
+
+async def explain_plan(db, command: dict) -> list[str]:
+    """Re-runs a profiled command through explain and returns its winning plan's stages."""
+    command = {k: v for k, v in command.items() if k not in _PROFILE_ONLY_KEYS}
+    try:
+        explain = await db.command({"explain": command, "verbosity": "queryPlanner"})
+    except OperationFailure as e:
+        logger.debug(f"explain failed for {command}: {e}")
+        return []
+    return _plan_stages(_find_winning_plan(explain))
+
+
+async def slow_query_report(db, limit=10) -> list[dict]:
+    """The slowest profiled operations, each annotated with how the planner executes it today."""
+    docs = await db["system.profile"].find(
+        {"op": {"$in": ["query", "command", "update", "remove", "getmore"]}, "ns": {"$not": {"$regex": r"\.system\."}}}
+    ).sort("millis", -1).limit(limit).to_list()
+
+    report = []
+    for doc in docs:
+        command = doc.get("command") or {}
+        stages = await explain_plan(db, command) if command else []
+        report.append({
+            "ns": doc.get("ns"),
+            "op": doc.get("op"),
+            "millis": doc.get("millis", 0),
+            "docs_examined": doc.get("docsExamined"),
+            "keys_examined": doc.get("keysExamined"),
+            "returned": doc.get("nreturned"),
+            "plan_summary": doc.get("planSummary"),
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages or doc.get("planSummary") == "COLLSCAN",
+            "ts": doc.get("ts")
+        })
+    return report
@@ -0,0 +1,36 @@
+import functools
+import logging
+import time
+from types import SimpleNamespace
+
+logger = logging.getLogger("YTFBUser.platform_sdks")
+
+
+@functools.cache
+def google() -> SimpleNamespace:
+    """The Google API client pieces the bot uses, imported on first YouTube use."""
+    started = time.perf_counter()
+    from google.auth.exceptions import RefreshError
+    from google.auth.transport.requests import Request
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import Flow
+    from googleapiclient.discovery import build
+    from googleapiclient.http import MediaFileUpload
+    logger.info(f"Loaded Google API client libraries in {(time.perf_counter() - started) * 1000:.0f} ms.")
+    return SimpleNamespace(
+        Flow=Flow, build=build, MediaFileUpload=MediaFileUpload,
+        Credentials=Credentials, Request=Request, RefreshError=RefreshError
+    )
+
+
+@functools.cache
+def http():
+    """`requests`, imported on first Facebook Graph API call."""
+    import requests
+    return requests
+
+
+def warm():
+    """Loads every SDK; run it off the event loop once the bot is serving updates."""
+    google()
+    http()
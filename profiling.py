@@ -0,0 +1,146 @@
+import asyncio
+import collections
+import cProfile
+import io
+import linecache
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+
+logger = logging.getLogger("YTFBUser.profiling")
+
+# Only one profile at a time: cProfile and tracemalloc are process-wide.
+_busy = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    pass
+
+
+class _Exclusive:
+    def __enter__(self):
+        if not _busy.acquire(blocking=False):
+            raise ProfilerBusy("Another profile is already running.")
+        return self
+
+    def __exit__(self, *exc):
+        _busy.release()
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+async def cpu_profile(seconds, sort="cumulative", limit=60) -> bytes:
+    """cProfile of the event-loop thread for `seconds` while the bot keeps serving."""
+    with _Exclusive():
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.disable()
+    out = io.StringIO()
+    out.write(f"cProfile of the event-loop thread for {seconds:.0f}s (sorted by {sort})\n\n")
+    pstats.Stats(profiler, stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue().encode("utf-8")
+
+
+def sample_stacks(seconds, interval=0.005, top=40) -> bytes:
+    """Statistical profile of every thread; blocking, run it in an executor.
+
+    Output is a summary of the hottest frames followed by collapsed stacks
+    ("thread;outer;...;inner count"), which flamegraph.pl and speedscope read.
+    """
+    with _Exclusive():
+        me = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        stacks = collections.Counter()
+        own = collections.Counter()
+        samples = 0
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == me:
+                    continue
+                labels = []
+                while frame is not None:
+                    labels.append(_frame_label(frame))
+                    frame = frame.f_back
+                if not labels:
+                    continue
+                own[labels[0]] += 1
+                thread = names.get(thread_id) or str(thread_id)
+                stacks[";".join([thread] + labels[::-1])] += 1
+            samples += 1
+            time.sleep(interval)
+
+    out = io.StringIO()
+    out.write(f"Sampling profile: {samples} samples every {interval * 1000:.0f} ms over {seconds:.0f}s\n\n")
+    out.write(f"{'samples':>8}  {'%':>6}  frame (innermost, all threads)\n")
+    total = sum(own.values()) or 1
+    for label, count in own.most_common(top):
+        out.write(f"{count:>8}  {count / total * 100:>5.1f}%  {label}\n")
+    out.write("\n# collapsed stacks\n")
+    for stack, count in stacks.most_common():
+        out.write(f"{stack} {count}\n")
+    return out.getvalue().encode("utf-8")
+
+
+def task_stacks(tasks, labels=None, limit=20) -> bytes:
+    """Current stack of every asyncio task; `labels` maps a task to a description (e.g. owner)."""
+    labels = labels or {}
+    tasks = sorted((t for t in tasks if not t.done()), key=lambda t: t.get_name())
+    out = io.StringIO()
+    out.write(f"{len(tasks)} running tasks\n")
+    for task in tasks:
+        coro = task.get_coro()
+        name = getattr(coro, "__qualname__", None) or repr(coro)
+        out.write(f"\n=== {task.get_name()} {name}" + (f" [{labels[task]}]" if task in labels else "") + "\n")
+        frames = task.get_stack(limit=limit)
+        if not frames:
+            out.write("  (no frames: not started yet)\n")
+        for frame in frames:
+            filename, lineno = frame.f_code.co_filename, frame.f_lineno
+            out.write(f"  File \"{filename}\", line {lineno}, in {frame.f_code.co_name}\n")
+            line = linecache.getline(filename, lineno).strip()
+            if line:
+                out.write(f"    {line}\n")
+    return out.getvalue().encode("utf-8")
+
+
+async def tracemalloc_diff(seconds, limit=30, frames=10) -> bytes:
+    """Allocations that grew over `seconds`, grouped by traceback.
+
+    Tracing is switched on for the window only (unless it was already on),
+    so the slowdown it causes does not outlive the command.
+    """
+    with _Exclusive():
+        started_here = not tracemalloc.is_tracing()
+        if started_here:
+            tracemalloc.start(frames)
+        try:
+            before = tracemalloc.take_snapshot()
+            await asyncio.sleep(seconds)
+            after = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+        finally:
+            if started_here:
+                tracemalloc.stop()
+
+    ignore = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, "<frozen importlib._bootstrap>")]
+    stats = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), "traceback")
+    out = io.StringIO()
+    out.write(f"tracemalloc diff over {seconds:.0f}s; traced {current / 1024**2:.1f} MB (peak {peak / 1024**2:.1f} MB)"
+              + (" — tracing was started for this window, older allocations are not counted" if started_here else "")
+              + "\n")
+    for stat in stats[:limit]:
+        out.write(f"\n{stat.size_diff / 1024:+.1f} KiB ({stat.count_diff:+d} blocks), now {stat.size / 1024:.1f} KiB\n")
+        for line in stat.traceback.format(most_recent_first=True):
+            out.write(f"  {line}\n")
+    return out.getvalue().encode("utf-8")
@@ -0,0 +1,243 @@
+import re
+import string
+from functools import lru_cache
+
+from pyrogram.types import InlineKeyboardButton, InlineKeyboardMarkup, KeyboardButton, ReplyKeyboardMarkup
+
+DEFAULT_LANGUAGE = "en"
+LANGUAGES = {"en": "🇬🇧 English", "fa": "🇮🇷 فارسی"}
+
+# --- Bold sans-serif ---
+
+_BOLD_SANS_SOURCE = string.ascii_uppercase + string.ascii_lowercase + string.digits
+_BOLD_SANS_TARGET = (
+    "𝗔𝗕𝗖𝗗𝗘𝗙𝗚𝗛𝗜𝗝𝗞𝗟𝗠𝗡𝗢𝗣𝗤𝗥𝗦𝗧𝗨𝗩𝗪𝗫𝗬𝗭"
+    "𝗮𝗯𝗰𝗱𝗲𝗳𝗴𝗵𝗶𝗷𝗸𝗹𝗺𝗻𝗼𝗽𝗾𝗿𝘀𝘁𝘂𝘃𝘄𝘅𝘆𝘇"
+    "𝟬𝟭𝟮𝟯𝟰𝟱𝟲𝟳𝟴𝟵"
+)
+BOLD_SANS_TABLE = str.maketrans(dict(zip(_BOLD_SANS_SOURCE, _BOLD_SANS_TARGET)))
+
+
+def to_bold_sans(text: str) -> str:
+    """Converts a string to bold sans-serif font."""
+    return text.encode('utf-8', 'surrogatepass').decode('utf-8').translate(BOLD_SANS_TABLE)
+
+
+# --- Templates ---
+
+_BOLD_REGION = re.compile(r"<<(.*?)>>", re.S)
+_formatter = string.Formatter()
+
+
+class Template:
+    """A message parsed once at import: literal runs are pre-rendered, `{fields}` filled per call.
+
+    Text inside `<<...>>` is rendered in bold sans-serif, including any fields it contains.
+    """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, text: str):
+        parts = []
+        position = 0
+        for match in _BOLD_REGION.finditer(text):
+            parts.extend(self._parse(text[position:match.start()], bold=False))
+            parts.extend(self._parse(match.group(1), bold=True))
+            position = match.end()
+        parts.extend(self._parse(text[position:], bold=False))
+        self.parts = tuple(parts)
+
+    @staticmethod
+    def _parse(text, bold):
+        for literal, field, spec, _ in _formatter.parse(text):
+            if literal:
+                yield (to_bold_sans(literal) if bold else literal, None, None, False)
+            if field is not None:
+                yield ("", field, spec or "", bold)
+
+    def render(self, **values) -> str:
+        out = []
+        for literal, field, spec, bold in self.parts:
+            out.append(literal)
+            if field is not None:
+                value = format(values[field], spec)
+                out.append(to_bold_sans(value) if bold else value)
+        return "".join(out)
+
+
+_TEXTS = {
+    "en": {
+        "main_menu": "🏠 <<Main Menu>>",
+        "send_media": "✅ <<Send The {media_type} File, Ready When You Are!>>",
+        "access_denied": "❌ <<Your Access Is Denied. Please Upgrade To {platform} Premium.>>",
+        "login_first": "❌ <<Please Login To {platform} First Using `/{command}`>>",
+        "unsupported_media": "❌ <<Unsupported Media Type.>>",
+        "file_too_large": "❌ <<File Size Exceeds The Limit Of `{limit_mb}` MB.>>",
+        "download_starting": "⏳ <<Starting Download...>>",
+        "download_failed": "❌ <<Download Failed: {error}>>",
+        "storage_full": "⚠️ <<The server is low on storage right now. Please try again later.>>",
+        "upload_cancelled": "❌ **<<Upload Cancelled>>**\n\n<<Your Operation Has Been Cancelled.>>",
+        "ask_title": "<<Please send a Title for your post.>>",
+        "ask_description": "<<Next, send a Description.>>",
+        "ask_tags": "<<Now, send comma-separated Tags.>>",
+        "ask_thumbnail": "<<A thumbnail is required for YouTube Videos. Please upload one or let the bot generate one.>>",
+        "ask_visibility": "<<Set Video Visibility:>>",
+        "ask_publish": "<<When To Publish?>>",
+        "scheduling": "⏳ <<Scheduling your post...>>",
+        "scheduled": "✅ **Scheduled!**\n\nYour post will be uploaded on `{when}` UTC.",
+        "schedule_in_past": "❌ <<Scheduled time must be in the future.>>",
+        "schedule_bad_format": "❌ <<Invalid format. Please use `YYYY-MM-DD HH:MM` in UTC.>>",
+        "thumbnail_expected": "❌ <<Invalid input. Please either click a button below or send a PHOTO for the thumbnail.>>",
+        "thumbnail_not_image": "❌ <<That's not an image. Please send an image for the thumbnail.>>",
+        "thumbnail_downloading": "🖼️ <<Downloading thumbnail...>>",
+        "language_prompt": "🌐 <<Choose Your Language:>>",
+        "language_set": "✅ <<Language Set To English.>>",
+        "media_photo": "photo",
+        "media_video": "video",
+    },
+    "fa": {
+        "main_menu": "🏠 منوی اصلی",
+        "send_media": "✅ فایل {media_type} را ارسال کنید، آماده‌ایم!",
+        "access_denied": "❌ دسترسی شما مجاز نیست. لطفاً پریمیوم {platform} را فعال کنید.",
+        "login_first": "❌ لطفاً ابتدا با `/{command}` وارد {platform} شوید.",
+        "unsupported_media": "❌ نوع فایل پشتیبانی نمی‌شود.",
+        "file_too_large": "❌ حجم فایل از سقف `{limit_mb}` مگابایت بیشتر است.",
+        "download_starting": "⏳ در حال شروع دانلود...",
+        "download_failed": "❌ دانلود ناموفق بود: {error}",
+        "storage_full": "⚠️ فضای ذخیره‌سازی سرور در حال حاضر کم است. لطفاً بعداً دوباره تلاش کنید.",
+        "upload_cancelled": "❌ **آپلود لغو شد**\n\nعملیات شما لغو شد.",
+        "ask_title": "لطفاً یک عنوان برای پست خود ارسال کنید.",
+        "ask_description": "حالا یک توضیح ارسال کنید.",
+        "ask_tags": "حالا برچسب‌ها را با کاما جدا کرده و ارسال کنید.",
+        "ask_thumbnail": "برای ویدیوهای یوتیوب تصویر بندانگشتی لازم است. یکی ارسال کنید یا بگذارید ربات آن را بسازد.",
+        "ask_visibility": "وضعیت نمایش ویدیو را انتخاب کنید:",
+        "ask_publish": "چه زمانی منتشر شود؟",
+        "scheduling": "⏳ در حال زمان‌بندی پست شما...",
+        "scheduled": "✅ **زمان‌بندی شد!**\n\nپست شما در `{when}` (UTC) آپلود می‌شود.",
+        "schedule_in_past": "❌ زمان انتخاب‌شده باید در آینده باشد.",
+        "schedule_bad_format": "❌ قالب نامعتبر است. لطفاً از `YYYY-MM-DD HH:MM` به وقت UTC استفاده کنید.",
+        "thumbnail_expected": "❌ ورودی نامعتبر. لطفاً یکی از دکمه‌های زیر را بزنید یا یک عکس برای تصویر بندانگشتی بفرستید.",
+        "thumbnail_not_image": "❌ این یک تصویر نیست. لطفاً برای تصویر بندانگشتی یک عکس بفرستید.",
+        "thumbnail_downloading": "🖼️ در حال دریافت تصویر بندانگشتی...",
+        "language_prompt": "🌐 زبان خود را انتخاب کنید:",
+        "language_set": "✅ زبان روی فارسی تنظیم شد.",
+        "media_photo": "عکس",
+        "media_video": "ویدیو",
+    },
+}
+
+TEMPLATES = {lang: {key: Template(text) for key, text in texts.items()} for lang, texts in _TEXTS.items()}
+
+
+def normalize_language(lang) -> str:
+    return lang if lang in TEMPLATES else DEFAULT_LANGUAGE
+
+
+def render(key: str, lang: str = DEFAULT_LANGUAGE, **values) -> str:
+    """Renders template `key` in `lang`, falling back to English for missing keys."""
+    template = TEMPLATES.get(lang, {}).get(key) or TEMPLATES[DEFAULT_LANGUAGE][key]
+    return template.render(**values)
+
+
+# --- Button labels ---
+
+_LABELS = {
+    "en": {
+        "dashboard": "📊 Dashboard", "account_info": "👤 Account Info", "settings": "⚙️ ꜱᴇᴛᴛɪɴɢꜱ",
+        "fb_post": "📘 FB ᴩᴏꜱᴛ", "fb_video": "📘 FB ᴠɪᴅᴇᴏ", "fb_reels": "📘 FB ʀᴇᴇʟꜱ",
+        "yt_video": "▶️ YT ᴠɪᴅᴇᴏ", "yt_shorts": "🟥 YT ꜱʜᴏʀᴛꜱ",
+        "premium": "⭐ ᴩʀᴇᴍɪᴜᴍ", "premium_details": "/premiumdetails",
+        "admin_panel": "🛠 ᴀᴅᴍɪɴ ᴩᴀɴᴇʟ", "restart": "🔄 ʀᴇꜱᴛᴀʀᴛ ʙᴏᴛ",
+        "cancel": "❌ Cancel", "skip": "➡️ Skip",
+        "thumbnail_custom": "🖼️ Upload Thumbnail", "thumbnail_auto": "🤖 Auto-Generate",
+        "visibility_public": "🌍 ᴩᴜʙʟɪᴄ", "visibility_private": "🔒 ᴩʀɪᴠᴀᴛᴇ", "visibility_unlisted": "🔗 ᴜɴʟɪꜱᴛᴇᴅ",
+        "publish_now": "🚀 ᴩᴜʙʟɪꜱʜ ɴᴏᴡ", "publish_schedule": "⏰ ꜱᴄʜᴇᴅᴜʟᴇ ʟᴀᴛᴇʀ",
+    },
+    "fa": {
+        "dashboard": "📊 داشبورد", "account_info": "👤 اطلاعات حساب", "settings": "⚙️ تنظیمات",
+        "fb_post": "📘 پست فیسبوک", "fb_video": "📘 ویدیو فیسبوک", "fb_reels": "📘 ریلز فیسبوک",
+        "yt_video": "▶️ ویدیو یوتیوب", "yt_shorts": "🟥 شورتس یوتیوب",
+        "premium": "⭐ پریمیوم", "premium_details": "/premiumdetails",
+        "admin_panel": "🛠 پنل مدیریت", "restart": "🔄 راه‌اندازی مجدد",
+        "cancel": "❌ لغو", "skip": "➡️ رد کردن",
+        "thumbnail_custom": "🖼️ ارسال تصویر بندانگشتی", "thumbnail_auto": "🤖 ساخت خودکار",
+        "visibility_public": "🌍 عمومی", "visibility_private": "🔒 خصوصی", "visibility_unlisted": "🔗 فهرست‌نشده",
+        "publish_now": "🚀 انتشار فوری", "publish_schedule": "⏰ زمان‌بندی برای بعد",
+    },
+}
+
+_LABEL_KEYS = {label: key for labels in _LABELS.values() for key, label in labels.items()}
+
+
+def label(key: str, lang: str = DEFAULT_LANGUAGE) -> str:
+    return _LABELS.get(lang, {}).get(key) or _LABELS[DEFAULT_LANGUAGE][key]
+
+
+def label_key(text: str):
+    """Maps a pressed reply-keyboard label, in any language, back to its key."""
+    return _LABEL_KEYS.get(text)
+
+
+def label_pattern(*keys) -> str:
+    """A regex matching the given labels in every language, for `filters.regex`."""
+    labels = sorted({labels[key] for labels in _LABELS.values() for key in keys if key in labels}, key=len, reverse=True)
+    return "^(?:" + "|".join(re.escape(text) for text in labels) + ")$"
+
+
+# --- Keyboards (memoized; never mutate the returned markups) ---
+
+@lru_cache(maxsize=64)
+def main_keyboard(is_admin: bool, premium_platforms: tuple, lang: str = DEFAULT_LANGUAGE) -> ReplyKeyboardMarkup:
+    L = lambda key: KeyboardButton(label(key, lang))
+    buttons = [
+        [L("dashboard"), L("account_info")],
+        [L("settings")]
+    ]
+    fb_buttons = [L("fb_post"), L("fb_video"), L("fb_reels")] if "facebook" in premium_platforms else []
+    yt_buttons = [L("yt_video"), L("yt_shorts")] if "youtube" in premium_platforms else []
+
+    if fb_buttons:
+        buttons.insert(0, fb_buttons)
+    if yt_buttons:
+        buttons.insert(1 if fb_buttons else 0, yt_buttons)
+
+    buttons.append([L("premium"), L("premium_details")])
+    if is_admin:
+        buttons.append([L("admin_panel"), L("restart")])
+    return ReplyKeyboardMarkup(buttons, resize_keyboard=True, selective=True)
+
+
+@lru_cache(maxsize=8)
+def progress_markup(lang: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(label("cancel", lang), callback_data="cancel_upload")]
+    ])
+
+
+_UPLOAD_FLOW_STEPS = {
+    "thumbnail": [("thumbnail_custom", "upload_flow_thumbnail_custom"), ("thumbnail_auto", "upload_flow_thumbnail_auto")],
+    "visibility": [
+        ("visibility_public", "upload_flow_visibility_public"),
+        ("visibility_private", "upload_flow_visibility_private"),
+        ("visibility_unlisted", "upload_flow_visibility_unlisted")
+    ],
+    "publish": [("publish_now", "upload_flow_publish_now"), ("publish_schedule", "upload_flow_publish_schedule")],
+    "input": [("skip", "upload_flow_input_skip")],
+}
+
+
+@lru_cache(maxsize=64)
+def upload_flow_markup(platform: str, step: str, lang: str = DEFAULT_LANGUAGE) -> InlineKeyboardMarkup:
+    buttons = [
+        [InlineKeyboardButton(label(key, lang), callback_data=data)]
+        for key, data in _UPLOAD_FLOW_STEPS.get(step, [])
+    ]
+    buttons.append([InlineKeyboardButton(label("cancel", lang), callback_data="cancel_upload")])
+    return InlineKeyboardMarkup(buttons)
+
+
+@lru_cache(maxsize=1)
+def language_markup() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(name, callback_data=f"set_language_{code}")] for code, name in LANGUAGES.items()
+    ])
@@ -0,0 +1,166 @@
+import logging
+
+from bson import ObjectId
+from pymongo import AsyncMongoClient
+
+logger = logging.getLogger("YTFBUser.repository")
+
+# Named projections so hot paths only pull the fields they render.
+PROJECTIONS = {
+    "premium": {"premium": 1},
+    "profile": {"username": 1, "added_by": 1, "added_at": 1, "last_active": 1, "premium": 1},
+    "user_list": {"username": 1},
+    "id_only": {"_id": 1},
+}
+
+def _object_id(job_id):
+    return job_id if isinstance(job_id, ObjectId) else ObjectId(job_id)
+
+
+class Repository:
+    """Async-native data access for every collection the bot uses."""
+
+    def __init__(self, uri, db_name="UploaderBotDB", max_pool_size=50, min_pool_size=0,
+                 max_idle_time_ms=60000, server_selection_timeout_ms=5000, event_listeners=None):
+        self.client = AsyncMongoClient(
+            uri,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min_pool_size,
+            maxIdleTimeMS=max_idle_time_ms,
+            serverSelectionTimeoutMS=server_selection_timeout_ms,
+            event_listeners=event_listeners or []
+        )
+        self.db = self.client[db_name]
+
+    def collection(self, name):
+        return self.db[name]
+
+    @property
+    def users(self):
+        return self.db.users
+
+    @property
+    def settings(self):
+        return self.db.settings
+
+    @property
+    def sessions(self):
+        return self.db.sessions
+
+    @property
+    def uploads(self):
+        return self.db.uploads
+
+    @property
+    def scheduled_jobs(self):
+        return self.db.scheduled_jobs
+
+    # --- Lifecycle ---
+
+    async def connect(self):
+        await self.ping()
+
+    async def ping(self):
+        await self.client.admin.command("ping")
+
+    async def close(self):
+        await self.client.close()
+
+    # --- Users ---
+
+    async def get_user(self, user_id, projection=None):
+        return await self.users.find_one({"_id": user_id}, PROJECTIONS.get(projection))
+
+    async def update_user(self, user_id, fields, upsert=True):
+        await self.users.update_one({"_id": user_id}, {"$set": fields}, upsert=upsert)
+
+    async def count_users(self):
+        return await self.users.count_documents({})
+
+    async def list_users(self, limit=0, projection="user_list"):
+        return await self.users.find({}, PROJECTIONS.get(projection)).limit(limit).to_list()
+
+    async def iter_user_ids(self):
+        async for user in self.users.find({}, PROJECTIONS["id_only"]):
+            yield user["_id"]
+
+    # --- Settings ---
+
+    async def get_global_settings(self):
+        return await self.settings.find_one({"_id": "global_settings"})
+
+    async def update_global_settings(self, fields):
+        await self.settings.update_one({"_id": "global_settings"}, {"$set": fields}, upsert=True)
+
+    async def get_user_settings(self, user_id):
+        return await self.settings.find_one({"_id": user_id})
+
+    async def save_user_settings(self, user_id, settings):
+        await self.settings.update_one({"_id": user_id}, {"$set": settings}, upsert=True)
+
+    # --- Platform sessions ---
+
+    async def count_sessions(self, user_id, platform):
+        return await self.sessions.count_documents({"user_id": user_id, "platform": platform})
+
+    async def upsert_session(self, user_id, platform, account_id, fields):
+        await self.sessions.update_one(
+            {"user_id": user_id, "platform": platform, "account_id": account_id},
+            {"$set": fields},
+            upsert=True
+        )
+
+    async def list_sessions(self, user_id, platform):
+        return await self.sessions.find({"user_id": user_id, "platform": platform}).to_list()
+
+    async def get_session(self, user_id, platform, account_id):
+        return await self.sessions.find_one({"user_id": user_id, "platform": platform, "account_id": account_id})
+
+    async def delete_session(self, user_id, platform, account_id):
+        await self.sessions.delete_one({"user_id": user_id, "platform": platform, "account_id": account_id})
+
+    # --- Uploads ---
+
+    async def insert_upload(self, upload):
+        await self.uploads.insert_one(upload)
+
+    async def delete_all_uploads(self):
+        await self.uploads.delete_many({})
+
+    async def top_uploaders(self, limit=5):
+        pipeline = [
+            {"$group": {"_id": "$user_id", "upload_count": {"$sum": 1}}},
+            {"$sort": {"upload_count": -1}},
+            {"$limit": limit}
+        ]
+        cursor = await self.uploads.aggregate(pipeline)
+        return await cursor.to_list()
+
+    # --- Scheduled jobs ---
+
+    async def insert_scheduled_job(self, job):
+        result = await self.scheduled_jobs.insert_one(job)
+        return result.inserted_id
+
+    async def get_scheduled_job(self, job_id):
+        return await self.scheduled_jobs.find_one({"_id": _object_id(job_id)})
+
+    async def update_scheduled_job(self, job_id, fields):
+        await self.scheduled_jobs.update_one({"_id": _object_id(job_id)}, {"$set": fields})
+
+    async def due_scheduled_jobs(self, now):
+        return await self.scheduled_jobs.find({"schedule_time": {"$lte": now}, "status": "pending"}).to_list()
+
+    async def pending_scheduled_jobs(self, user_id, platform):
+        return await self.scheduled_jobs.find(
+            {"user_id": user_id, "platform": platform, "status": "pending"}
+        ).sort("schedule_time", 1).to_list()
+
+    async def scheduled_staging_ids(self):
+        """Staging directories still owned by scheduled jobs that have not run yet."""
+        return await self.scheduled_jobs.distinct(
+            "metadata.staging_id", {"status": {"$in": ["pending", "processing"]}}
+        )
+
+    async def delete_scheduled_job(self, job_id, user_id):
+        return await self.scheduled_jobs.find_one_and_delete({"_id": _object_id(job_id), "user_id": user_id})
@@ -0,0 +1,88 @@
+import logging
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger("YTFBUser.rollups")
+
+DAY_FORMAT = "%Y-%m-%d"
+
+
+def day_key(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).strftime(DAY_FORMAT)
+
+
+class DailyRollups:
+    """Per-day event counters so reports read O(days) documents instead of whole collections."""
+
+    def __init__(self, db, collection_name="daily_rollups"):
+        self.db = db
+        self.collection = db[collection_name]
+
+    async def _increment(self, increments: dict, when: datetime | None = None):
+        when = when or datetime.now(timezone.utc)
+        key = day_key(when)
+        day_start = datetime.strptime(key, DAY_FORMAT).replace(tzinfo=timezone.utc)
+        try:
+            await self.collection.update_one(
+                {"_id": key},
+                {"$inc": increments, "$setOnInsert": {"date": day_start}},
+                upsert=True
+            )
+        except Exception as e:
+            logger.error(f"Failed to update daily rollup {key}: {e}")
+
+    async def record_new_user(self):
+        await self._increment({"new_users": 1})
+
+    async def record_upload(self, platform: str, upload_type: str, size_bytes: int = 0):
+        await self._increment({
+            "uploads_total": 1,
+            f"uploads.{platform}.{upload_type}": 1,
+            "bytes_processed": int(size_bytes or 0)
+        })
+
+    async def record_premium_grant(self, platform: str, plan_key: str):
+        await self._increment({
+            f"premium_grants.{platform}": 1,
+            f"premium_plans.{plan_key}": 1
+        })
+
+    async def record_failure(self, platform: str | None):
+        await self._increment({
+            "failures_total": 1,
+            f"failures.{platform or 'unknown'}": 1
+        })
+
+    async def summarize(self, start: datetime, end: datetime) -> dict:
+        """Sums every rollup between `start` and `end` (inclusive, UTC days)."""
+        docs = await self.collection.find(
+            {"_id": {"$gte": day_key(start), "$lte": day_key(end)}}
+        ).sort("_id", 1).to_list()
+        totals = {
+            "start": day_key(start), "end": day_key(end),
+            "new_users": 0, "uploads_total": 0, "bytes_processed": 0, "failures_total": 0,
+            "uploads": {}, "premium_grants": {}, "premium_plans": {}, "failures": {},
+            "days": [], "backfilled_days": 0
+        }
+        for doc in docs:
+            if doc.get("backfilled"):
+                totals["backfilled_days"] += 1
+            for field in ("new_users", "uploads_total", "bytes_processed", "failures_total"):
+                totals[field] += doc.get(field, 0)
+            for platform, by_type in doc.get("uploads", {}).items():
+                platform_totals = totals["uploads"].setdefault(platform, {})
+                for upload_type, count in by_type.items():
+                    platform_totals[upload_type] = platform_totals.get(upload_type, 0) + count
+            for field in ("premium_grants", "premium_plans", "failures"):
+                for key, count in doc.get(field, {}).items():
+                    totals[field][key] = totals[field].get(key, 0) + count
+            totals["days"].append({
+                "day": doc["_id"],
+                "new_users": doc.get("new_users", 0),
+                "uploads_total": doc.get("uploads_total", 0),
+                "failures_total": doc.get("failures_total", 0)
+            })
+        return totals
+
+    async def last_days(self, days: int) -> dict:
+        end = datetime.now(timezone.utc)
+        return await self.summarize(end - timedelta(days=days - 1), end)
@@ -0,0 +1,159 @@
+import contextlib
+import logging
+import time
+
+logger = logging.getLogger("YTFBUser.router")
+
+
+class RouteStats:
+    __slots__ = ("name", "calls", "errors", "total_seconds", "max_seconds")
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, elapsed, failed):
+        self.calls += 1
+        self.total_seconds += elapsed
+        self.max_seconds = max(self.max_seconds, elapsed)
+        if failed:
+            self.errors += 1
+
+    def as_dict(self) -> dict:
+        return {
+            "route": self.name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_ms": self.total_seconds / self.calls * 1000 if self.calls else 0.0,
+            "max_ms": self.max_seconds * 1000,
+            "total_s": self.total_seconds
+        }
+
+
+class PrefixTrie:
+    """Maps string prefixes to values; lookup returns the longest registered prefix of a key."""
+
+    __slots__ = ("_root",)
+    _VALUE = object()
+
+    def __init__(self):
+        self._root = {}
+
+    def insert(self, prefix, value):
+        node = self._root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        if self._VALUE in node:
+            raise ValueError(f"Prefix {prefix!r} is already registered.")
+        node[self._VALUE] = value
+
+    def longest_match(self, key):
+        node, found = self._root, None
+        for char in key:
+            node = node.get(char)
+            if node is None:
+                break
+            if self._VALUE in node:
+                found = node[self._VALUE]
+        return found
+
+
+class _Route:
+    __slots__ = ("handler", "stats")
+
+    def __init__(self, handler, stats):
+        self.handler = handler
+        self.stats = stats
+
+
+class _Table:
+    """Exact keys in a dict, prefix keys in a trie; exact matches win."""
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.exact = {}
+        self.prefixes = PrefixTrie()
+
+    def add(self, keys, handler, prefix, stats):
+        route = _Route(handler, stats)
+        for key in keys:
+            if prefix:
+                self.prefixes.insert(key, route)
+            elif key in self.exact:
+                raise ValueError(f"{self.kind} route {key!r} is already registered.")
+            else:
+                self.exact[key] = route
+
+    def resolve(self, key):
+        if key is None:
+            return None
+        return self.exact.get(key) or self.prefixes.longest_match(key)
+
+
+class Router:
+    """Registry-based dispatch for conversation states and callback_data.
+
+    Handlers are registered with decorators, e.g.::
+
+        @router.callback("select_acc_", prefix=True)
+        async def select_account_cb(client, query): ...
+
+        @router.state("waiting_for_title")
+        async def on_title(msg, state_data): ...
+    """
+
+    def __init__(self):
+        self._states = _Table("state")
+        self._callbacks = _Table("callback")
+        self._stats = {}
+        self.attribute = None  # optional callable(route name) -> context manager, e.g. LoopMonitor.attribute
+
+    def _stats_for(self, kind, handler):
+        name = f"{kind}:{handler.__name__}"
+        return self._stats.setdefault(name, RouteStats(name))
+
+    def state(self, *actions, prefix=False):
+        def decorator(handler):
+            self._states.add(actions, handler, prefix, self._stats_for("state", handler))
+            return handler
+        return decorator
+
+    def callback(self, *keys, prefix=False):
+        def decorator(handler):
+            self._callbacks.add(keys, handler, prefix, self._stats_for("callback", handler))
+            return handler
+        return decorator
+
+    async def _run(self, route, args):
+        started = time.perf_counter()
+        failed = False
+        scope = self.attribute(route.stats.name) if self.attribute is not None else contextlib.nullcontext()
+        try:
+            with scope:
+                await route.handler(*args)
+        except BaseException:
+            failed = True
+            raise
+        finally:
+            route.stats.record(time.perf_counter() - started, failed)
+
+    async def dispatch_state(self, action, *args) -> bool:
+        """Runs the handler for `action`; False when no route matches."""
+        route = self._states.resolve(action)
+        if route is None:
+            return False
+        await self._run(route, args)
+        return True
+
+    async def dispatch_callback(self, data, *args) -> bool:
+        route = self._callbacks.resolve(data)
+        if route is None:
+            return False
+        await self._run(route, args)
+        return True
+
+    def stats(self) -> list[dict]:
+        return sorted((s.as_dict() for s in self._stats.values() if s.calls), key=lambda s: s["total_s"], reverse=True)
@@ -0,0 +1,117 @@
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+
+
+class _Entry:
+    __slots__ = ("settings", "sessions", "expires_at")
+
+    def __init__(self, expires_at):
+        self.settings = None
+        self.sessions = {}
+        self.expires_at = expires_at
+
+
+class UserSessionCache:
+    """Per-user settings and platform sessions, kept coherent by write-through from the save paths.
+
+    Callers always receive copies, so mutating a returned value never leaks into the cache.
+    """
+
+    def __init__(self, ttl=300, maxsize=5000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, user_id):
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return None
+        if entry.expires_at <= time.monotonic():
+            del self._entries[user_id]
+            return None
+        self._entries.move_to_end(user_id)
+        return entry
+
+    def _entry_for_write(self, user_id):
+        entry = self._get(user_id)
+        if entry is None:
+            entry = _Entry(time.monotonic() + self.ttl)
+            self._entries[user_id] = entry
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return entry
+
+    # --- Settings ---
+
+    def get_settings(self, user_id):
+        entry = self._get(user_id)
+        if entry is None or entry.settings is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return dict(entry.settings)
+
+    def put_settings(self, user_id, settings):
+        self._entry_for_write(user_id).settings = dict(settings)
+
+    def update_settings(self, user_id, fields):
+        """Mirrors a `$set` of `fields`; a no-op when the user's settings are not cached."""
+        entry = self._get(user_id)
+        if entry is not None and entry.settings is not None:
+            entry.settings.update(fields)
+
+    # --- Platform sessions ---
+
+    def get_sessions(self, user_id, platform):
+        entry = self._get(user_id)
+        sessions = entry.sessions.get(platform) if entry is not None else None
+        if sessions is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return copy.deepcopy(sessions)
+
+    def put_sessions(self, user_id, platform, sessions):
+        self._entry_for_write(user_id).sessions[platform] = copy.deepcopy(list(sessions))
+
+    def upsert_session(self, user_id, platform, account_id, fields):
+        entry = self._get(user_id)
+        sessions = entry.sessions.get(platform) if entry is not None else None
+        if sessions is None:
+            return
+        fields = copy.deepcopy(fields)
+        for session in sessions:
+            if session.get("account_id") == account_id:
+                session.update(fields)
+                return
+        sessions.append({"user_id": user_id, "platform": platform, "account_id": account_id, **fields})
+
+    def remove_session(self, user_id, platform, account_id):
+        entry = self._get(user_id)
+        sessions = entry.sessions.get(platform) if entry is not None else None
+        if sessions is not None:
+            entry.sessions[platform] = [s for s in sessions if s.get("account_id") != account_id]
+
+    # --- Maintenance ---
+
+    def invalidate(self, user_id):
+        self._entries.pop(user_id, None)
+
+    def evict_expired(self) -> int:
+        now = time.monotonic()
+        expired = [user_id for user_id, entry in self._entries.items() if entry.expires_at <= now]
+        for user_id in expired:
+            del self._entries[user_id]
+        return len(expired)
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.ttl)
+            self.evict_expired()
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import os
+import shutil
+import time
+import uuid
+
+import psutil
+
+import executors
+
+logger = logging.getLogger("YTFBUser.staging")
+
+
+class StagingFull(Exception):
+    """Raised when admitting a file would push the staging volume below its free-space floor."""
+
+
+class StagingArea:
+    """Per-job working directories for downloads, transcodes and thumbnails.
+
+    Every upload flow gets `<root>/<job_id>/`; small files (thumbnails, photos) may
+    go to `small_root` instead, e.g. a tmpfs. Before a download starts, `admit`
+    checks the file against the volume's free space minus what in-flight jobs have
+    already reserved. `discard` removes the job's directories and its reservation;
+    the janitor removes directories no live job or `protected` id claims.
+    """
+
+    def __init__(self, root, small_root=None, small_threshold=5 * 1024 * 1024,
+                 min_free_bytes=1024 ** 3, size_factor=2.5, orphan_age=6 * 3600):
+        self.root = os.path.abspath(root)
+        self.small_root = os.path.abspath(small_root) if small_root else None
+        self.small_threshold = small_threshold
+        self.min_free_bytes = min_free_bytes
+        # A video needs room for the download plus a transcoded copy and a thumbnail.
+        self.size_factor = size_factor
+        self.orphan_age = orphan_age
+        self._reserved = {}  # job id -> bytes
+        self.rejected = 0
+        self.reclaimed_bytes = 0
+        for directory in self._roots():
+            os.makedirs(directory, exist_ok=True)
+
+    def _roots(self):
+        return [self.root] + ([self.small_root] if self.small_root else [])
+
+    @staticmethod
+    def new_job_id() -> str:
+        return uuid.uuid4().hex
+
+    # --- Admission control ---
+
+    def free_bytes(self, small=False) -> int:
+        root = self.small_root if small and self.small_root else self.root
+        reserved = sum(self._reserved.values()) if root == self.root else 0
+        return psutil.disk_usage(root).free - reserved
+
+    def admit(self, job_id, size):
+        """Reserves room for a file of `size` bytes or raises StagingFull."""
+        needed = int(size * self.size_factor)
+        available = self.free_bytes()
+        if available - needed < self.min_free_bytes:
+            self.rejected += 1
+            raise StagingFull(
+                f"need {needed / 1024 ** 2:.0f} MB, {max(available - self.min_free_bytes, 0) / 1024 ** 2:.0f} MB available"
+            )
+        self._reserved[job_id] = self._reserved.get(job_id, 0) + needed
+
+    def release(self, job_id):
+        """Drops the job's reservation but keeps its files (e.g. a scheduled post's thumbnail)."""
+        self._reserved.pop(job_id, None)
+
+    # --- Job directories ---
+
+    def job_dir(self, job_id, size=None) -> str:
+        """The job's directory (with a trailing separator, as Pyrogram's `file_name` expects)."""
+        small = self.small_root and size is not None and size <= self.small_threshold
+        directory = os.path.join(self.small_root if small else self.root, job_id)
+        os.makedirs(directory, exist_ok=True)
+        return directory + os.sep
+
+    def is_live(self, job_id) -> bool:
+        return job_id in self._reserved
+
+    def discard(self, job_id):
+        if not job_id:
+            return
+        self.release(job_id)
+        for root in self._roots():
+            self._remove(os.path.join(root, job_id))
+
+    def discard_file(self, path):
+        if path and os.path.isfile(path):
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.error(f"Error deleting file {path}: {e}")
+
+    def _remove(self, path):
+        if not os.path.lexists(path):
+            return 0
+        size = _tree_size(path)
+        try:
+            if os.path.isdir(path) and not os.path.islink(path):
+                shutil.rmtree(path)
+            else:
+                os.remove(path)
+        except OSError as e:
+            logger.error(f"Could not remove staged path {path}: {e}")
+            return 0
+        self.reclaimed_bytes += size
+        return size
+
+    # --- Janitor ---
+
+    def sweep(self, protected=(), min_age=None) -> tuple[int, int]:
+        """Removes staged entries older than `min_age` that no live job or protected id owns.
+
+        Returns (entries removed, bytes reclaimed).
+        """
+        min_age = self.orphan_age if min_age is None else min_age
+        cutoff = time.time() - min_age
+        protected = set(protected)
+        removed, reclaimed = 0, 0
+        for root in self._roots():
+            try:
+                entries = list(os.scandir(root))
+            except FileNotFoundError:
+                continue
+            for entry in entries:
+                if entry.name in protected or self.is_live(entry.name):
+                    continue
+                try:
+                    if entry.stat(follow_symlinks=False).st_mtime > cutoff:
+                        continue
+                except FileNotFoundError:
+                    continue
+                reclaimed += self._remove(entry.path)
+                removed += 1
+        if removed:
+            logger.info(f"Staging janitor removed {removed} orphaned entries ({reclaimed / 1024 ** 2:.1f} MB).")
+        return removed, reclaimed
+
+    async def run(self, interval, protected_ids):
+        """Periodic janitor on the "io" pool; `protected_ids` is an async callable returning ids to keep."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                protected = await protected_ids()
+            except Exception as e:
+                logger.warning(f"Staging janitor skipped: could not load protected jobs: {e}")
+                continue
+            await executors.run("io", self.sweep, protected)
+
+    def usage(self) -> dict:
+        return {
+            "root": self.root,
+            "free_bytes": self.free_bytes(),
+            "reserved_bytes": sum(self._reserved.values()),
+            "live_jobs": len(self._reserved),
+            "rejected": self.rejected,
+            "reclaimed_bytes": self.reclaimed_bytes,
+        }
+
+
+def _tree_size(path) -> int:
+    if not os.path.isdir(path) or os.path.islink(path):
+        try:
+            return os.lstat(path).st_size
+        except OSError:
+            return 0
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.lstat(os.path.join(dirpath, name)).st_size
+            except OSError:
+                pass
+    return total
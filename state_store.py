@@ -0,0 +1,236 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from datetime import datetime, timedelta, timezone
+
+logger = logging.getLogger("YTFBUser.state_store")
+
+
+class _ChatRef:
+    __slots__ = ("id",)
+
+    def __init__(self, chat_id):
+        self.id = chat_id
+
+
+class MessageRef:
+    """Chat/message ids standing in for a Pyrogram Message kept across conversation steps.
+
+    Supports the subset of the Message API the bot calls on stored messages
+    (`id`, `chat.id`, `edit`, `edit_text`, `reply`, `delete`) through the bound client.
+    """
+
+    __slots__ = ("chat_id", "id")
+    client = None
+
+    def __init__(self, chat_id, message_id):
+        self.chat_id = chat_id
+        self.id = message_id
+
+    @classmethod
+    def of(cls, message):
+        """Returns a ref for a Message (or ref); None stays None."""
+        if message is None or isinstance(message, cls):
+            return message
+        return cls(message.chat.id, message.id)
+
+    @property
+    def chat(self):
+        return _ChatRef(self.chat_id)
+
+    async def edit_text(self, text, parse_mode=None, reply_markup=None, **kwargs):
+        return await self.client.edit_message_text(
+            self.chat_id, self.id, text, parse_mode=parse_mode, reply_markup=reply_markup, **kwargs
+        )
+
+    edit = edit_text
+
+    async def reply(self, text, quote=None, parse_mode=None, reply_markup=None, **kwargs):
+        return await self.client.send_message(
+            self.chat_id, text,
+            parse_mode=parse_mode,
+            reply_markup=reply_markup,
+            reply_to_message_id=self.id if quote else None,
+            **kwargs
+        )
+
+    async def delete(self):
+        return await self.client.delete_messages(self.chat_id, self.id)
+
+    def __eq__(self, other):
+        return isinstance(other, MessageRef) and (self.chat_id, self.id) == (other.chat_id, other.id)
+
+    def __hash__(self):
+        return hash((self.chat_id, self.id))
+
+    def __repr__(self):
+        return f"MessageRef(chat_id={self.chat_id}, id={self.id})"
+
+
+class _Slot:
+    __slots__ = ("value", "expires_at")
+
+    def __init__(self, value, expires_at):
+        self.value = value
+        self.expires_at = expires_at
+
+
+class StateStore(MutableMapping):
+    """A dict with a sliding TTL and a size bound, for per-user/per-flow state.
+
+    Reads and writes refresh an entry's deadline. Expired or least-recently-used
+    entries are dropped unless `can_evict(key, value)` says they are still in use;
+    `on_evict(key, value)` runs for every entry that is dropped that way.
+    Entries whose dict value holds any of `secret_keys` are never persisted by `save`.
+    """
+
+    def __init__(self, name, ttl, maxsize, on_evict=None, can_evict=None, secret_keys=()):
+        self.name = name
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.on_evict = on_evict
+        self.can_evict = can_evict
+        self.secret_keys = frozenset(secret_keys)
+        self._data = OrderedDict()
+        self.evicted = 0
+
+    def _deadline(self):
+        return time.monotonic() + self.ttl
+
+    def _evictable(self, key, slot):
+        return self.can_evict is None or self.can_evict(key, slot.value)
+
+    def _evict(self, key):
+        slot = self._data.pop(key)
+        self.evicted += 1
+        if self.on_evict is not None:
+            try:
+                self.on_evict(key, slot.value)
+            except Exception as e:
+                logger.warning(f"[{self.name}] eviction hook failed for {key}: {e}")
+
+    # --- Mapping protocol ---
+
+    def __getitem__(self, key):
+        slot = self._data[key]
+        if slot.expires_at <= time.monotonic() and self._evictable(key, slot):
+            self._evict(key)
+            raise KeyError(key)
+        slot.expires_at = self._deadline()
+        self._data.move_to_end(key)
+        return slot.value
+
+    def __setitem__(self, key, value):
+        slot = self._data.get(key)
+        if slot is None:
+            self._data[key] = _Slot(value, self._deadline())
+            self._enforce_size()
+        else:
+            slot.value = value
+            slot.expires_at = self._deadline()
+            self._data.move_to_end(key)
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def peek_values(self):
+        """Current values without refreshing their deadlines or LRU order."""
+        return [slot.value for slot in self._data.values()]
+
+    # --- Eviction ---
+
+    def _enforce_size(self):
+        if len(self._data) <= self.maxsize:
+            return
+        for key in list(self._data):
+            if len(self._data) <= self.maxsize:
+                break
+            if self._evictable(key, self._data[key]):
+                self._evict(key)
+
+    def sweep(self) -> int:
+        """Drops every expired entry that may be evicted; returns how many went."""
+        now = time.monotonic()
+        expired = [
+            key for key, slot in self._data.items()
+            if slot.expires_at <= now and self._evictable(key, slot)
+        ]
+        for key in expired:
+            self._evict(key)
+        return len(expired)
+
+    async def run(self, interval=60):
+        while True:
+            await asyncio.sleep(interval)
+            swept = self.sweep()
+            if swept:
+                logger.info(f"[{self.name}] swept {swept} abandoned entr{'y' if swept == 1 else 'ies'}.")
+
+    # --- Optional persistence ---
+
+    @staticmethod
+    def _encode(value):
+        if isinstance(value, MessageRef):
+            return {"__msgref__": [value.chat_id, value.id]}
+        if isinstance(value, dict):
+            return {str(k): StateStore._encode(v) for k, v in value.items()}
+        if isinstance(value, (list, tuple)):
+            return [StateStore._encode(v) for v in value]
+        return value
+
+    @staticmethod
+    def _decode(value):
+        if isinstance(value, dict):
+            if set(value) == {"__msgref__"}:
+                return MessageRef(*value["__msgref__"])
+            return {k: StateStore._decode(v) for k, v in value.items()}
+        if isinstance(value, list):
+            return [StateStore._decode(v) for v in value]
+        return value
+
+    def _persistable(self, value) -> bool:
+        return not (isinstance(value, dict) and self.secret_keys.intersection(value))
+
+    async def save(self, collection) -> int:
+        """Replaces the persisted snapshot with the current live entries, minus those holding secrets."""
+        now = time.monotonic()
+        wall_now = datetime.now(timezone.utc)
+        docs = [
+            {
+                "_id": key,
+                "state": self._encode(slot.value),
+                "expires_at": wall_now + timedelta(seconds=max(slot.expires_at - now, 0))
+            }
+            for key, slot in self._data.items()
+            if slot.expires_at > now and self._persistable(slot.value)
+        ]
+        await collection.delete_many({})
+        if docs:
+            await collection.insert_many(docs)
+        return len(docs)
+
+    async def load(self, collection) -> int:
+        """Restores entries persisted by `save` that have not expired in the meantime."""
+        now = datetime.now(timezone.utc)
+        loaded = 0
+        async for doc in collection.find({"expires_at": {"$gt": now}}):
+            remaining = (doc["expires_at"].replace(tzinfo=timezone.utc) - now).total_seconds()
+            self._data[doc["_id"]] = _Slot(self._decode(doc["state"]), time.monotonic() + remaining)
+            loaded += 1
+        self._enforce_size()
+        return loaded
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+logger = logging.getLogger("YTFBUser.stats")
+
+
+class StatsService:
+    """Serves dashboard statistics from memory and refreshes them in the background."""
+
+    def __init__(self, db, platforms, ttl=60, max_users=10000):
+        self.db = db
+        self.platforms = list(platforms)
+        self.ttl = ttl
+        self.max_users = max_users
+        self._global = None
+        self._global_at = 0.0
+        self._refresh_lock = asyncio.Lock()
+        self._refresh_task = None
+        self._user_counts = OrderedDict()
+
+    # --- Global (admin) statistics ---
+
+    def _global_pipeline(self):
+        """One round trip: each count is its own $unionWith branch, so every $match can use its index.
+
+        ($facet would run all counts over a single scan of `users`; its sub-pipelines cannot use indexes.)
+        """
+        def count(label, match=None):
+            return ([{"$match": match}] if match else []) + [{"$group": {"_id": label, "n": {"$sum": 1}}}]
+
+        active = [{f"premium.{p}.status": "active"} for p in self.platforms]
+        branches = [("users", count("premium_any", {"$or": active}))]
+        branches += [("users", count(f"premium.{p}", query)) for p, query in zip(self.platforms, active)]
+        branches.append(("uploads", [{"$group": {"_id": {"uploads": "$platform"}, "n": {"$sum": 1}}}]))
+        return count("users") + [{"$unionWith": {"coll": coll, "pipeline": pipeline}} for coll, pipeline in branches]
+
+    async def _compute_global(self):
+        """Premium counts are indexed lookups on `premium.<platform>.status`, kept current by the sweeper."""
+        cursor = await self.db.users.aggregate(self._global_pipeline())
+        counts, uploads = {}, {}
+        for row in await cursor.to_list():
+            if isinstance(row["_id"], dict):
+                uploads[row["_id"].get("uploads")] = row["n"]
+            else:
+                counts[row["_id"]] = row["n"]
+        return {
+            "total_users": counts.get("users", 0),
+            "total_premium": counts.get("premium_any", 0),
+            "premium": {p: counts.get(f"premium.{p}", 0) for p in self.platforms},
+            "total_uploads": sum(uploads.values()),
+            "uploads": {p: uploads.get(p, 0) for p in self.platforms},
+            "computed_at": datetime.now(timezone.utc)
+        }
+
+    async def refresh(self):
+        """Recomputes the global snapshot (one aggregate command). Callers that arrive mid-refresh share its result."""
+        requested_at = time.monotonic()
+        async with self._refresh_lock:
+            if self._global is not None and self._global_at >= requested_at:
+                return self._global
+            snapshot = await self._compute_global()
+            self._global = snapshot
+            self._global_at = time.monotonic()
+            return snapshot
+
+    async def _background_refresh(self):
+        try:
+            await self.refresh()
+        except Exception as e:
+            logger.error(f"Background stats refresh failed: {e}")
+
+    def _schedule_refresh(self):
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._background_refresh())
+
+    async def get_global(self):
+        """Returns the cached snapshot, revalidating it in the background once it is stale."""
+        if self._global is None:
+            return await self.refresh()
+        if time.monotonic() - self._global_at > self.ttl:
+            self._schedule_refresh()
+        return self._global
+
+    # --- Per-user statistics ---
+
+    async def get_user(self, user_id):
+        """Per-platform upload counts, loaded once and then kept current by `record_upload`.
+
+        record_upload only updates users already cached, so an upload that lands
+        while this user's counts are loading is missed until the entry is evicted
+        or the service is invalidated. The dashboard tolerates that staleness.
+        """
+        counts = self._user_counts.get(user_id)
+        if counts is None:
+            pipeline = [
+                {"$match": {"user_id": user_id}},
+                {"$group": {"_id": "$platform", "n": {"$sum": 1}}}
+            ]
+            cursor = await self.db.uploads.aggregate(pipeline)
+            rows = await cursor.to_list()
+            # A concurrent call may have cached this user first; keep its counter, which is the one being updated.
+            counts = self._user_counts.get(user_id) or {row["_id"]: row["n"] for row in rows}
+            self._user_counts[user_id] = counts
+            while len(self._user_counts) > self.max_users:
+                self._user_counts.popitem(last=False)
+        else:
+            self._user_counts.move_to_end(user_id)
+        return {"total": sum(counts.values()), **{p: counts.get(p, 0) for p in self.platforms}}
+
+    # --- Incremental updates ---
+
+    def record_upload(self, user_id, platform):
+        counts = self._user_counts.get(user_id)
+        if counts is not None:
+            counts[platform] = counts.get(platform, 0) + 1
+        if self._global is not None:
+            self._global["total_uploads"] += 1
+            if platform in self._global["uploads"]:
+                self._global["uploads"][platform] += 1
+
+    def record_new_user(self):
+        if self._global is not None:
+            self._global["total_users"] += 1
+
+    def invalidate(self):
+        self._global = None
+        self._global_at = 0.0
+        self._user_counts.clear()
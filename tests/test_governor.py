@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip("psutil")
+
+from governor import PRESSURE_AT, SEVERE_AT, ResourceGovernor  # noqa: E402
+
+
+def _governor(ffmpeg_threads, cpu_count=16):
+    governor = ResourceGovernor([], rss_target_bytes=1, ffmpeg_threads=ffmpeg_threads)
+    governor.cpu_count = cpu_count
+    return governor
+
+
+def test_pressure_never_raises_threads_above_configured_cap():
+    governor = _governor(ffmpeg_threads=2)
+    governor.pressure = PRESSURE_AT
+    assert governor.ffmpeg_threads() == 2
+
+
+def test_pressure_halves_threads_when_ffmpeg_picks():
+    governor = _governor(ffmpeg_threads=0)
+    assert governor.ffmpeg_threads() == 0
+    governor.pressure = PRESSURE_AT
+    assert governor.ffmpeg_threads() == 8
+    governor.pressure = SEVERE_AT
+    assert governor.ffmpeg_threads() == 1
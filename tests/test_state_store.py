@@ -0,0 +1,26 @@
+import asyncio
+
+from state_store import MessageRef, StateStore
+
+
+class _Collection:
+    def __init__(self):
+        self.documents = []
+
+    async def delete_many(self, query):
+        self.documents = []
+
+    async def insert_many(self, documents):
+        self.documents.extend(documents)
+
+
+def test_save_skips_states_holding_secrets():
+    store = StateStore("user_states", ttl=60, maxsize=10, secret_keys=("login_data",))
+    store[1] = {"action": "waiting_for_fb_app_secret", "login_data": {"app_id": "1", "app_secret": "hunter2"}}
+    store[2] = {"action": "waiting_for_title", "status_msg": MessageRef(2, 7)}
+    collection = _Collection()
+
+    assert asyncio.run(store.save(collection)) == 1
+    assert [doc["_id"] for doc in collection.documents] == [2]
+    assert "hunter2" not in repr(collection.documents)
+    assert collection.documents[0]["state"]["status_msg"] == {"__msgref__": [2, 7]}
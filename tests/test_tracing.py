@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from state_store import StateStore
+from tracing import JobTracer
+
+
+class _Collection:
+    def __init__(self):
+        self.documents = []
+
+    async def insert_one(self, document):
+        self.documents.append(document)
+
+
+def test_expired_in_flight_trace_is_stored_on_finish():
+    live = {"job-1"}  # stands in for staging.is_live, as wired in main
+    active = StateStore("job_traces", ttl=0.01, maxsize=10, can_evict=lambda job_id, _: job_id not in live)
+    collection = _Collection()
+    tracer = JobTracer(active, collection)
+
+    trace = tracer.get("job-1", 42, platform="youtube")
+    with trace.span("upload"):
+        time.sleep(0.02)  # the job outlives the store's TTL
+    assert active.sweep() == 0
+
+    document = asyncio.run(tracer.finish("job-1", "ok"))
+    assert document is not None
+    assert [doc["job_id"] for doc in collection.documents] == ["job-1"]
+    assert [span["name"] for span in document["spans"]] == ["upload"]
+
+
+def test_trace_of_abandoned_job_expires():
+    active = StateStore("job_traces", ttl=0.01, maxsize=10, can_evict=lambda job_id, _: True)
+    tracer = JobTracer(active, _Collection())
+    tracer.start("job-2", 42)
+    time.sleep(0.02)
+    assert active.sweep() == 1
+    assert asyncio.run(tracer.finish("job-2", "ok")) is None
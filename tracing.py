@@ -0,0 +1,176 @@
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+logger = logging.getLogger("YTFBUser.tracing")
+
+# Stages in pipeline order; summaries list them this way.
+STAGES = ("download", "probe", "convert", "thumbnail", "token_refresh", "upload", "db_write", "notify")
+
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(fraction * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+class Span:
+    __slots__ = ("name", "attributes", "started_at", "_started", "seconds", "status", "error")
+
+    def __init__(self, name, attributes):
+        self.name = name
+        self.attributes = attributes
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.seconds = None
+        self.status = "running"
+        self.error = None
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def end(self, error=None):
+        if self.seconds is not None:
+            return
+        self.seconds = time.perf_counter() - self._started
+        self.status = "error" if error is not None else "ok"
+        self.error = str(error) if error is not None else None
+
+    def as_dict(self) -> dict:
+        return {"name": self.name, "started_at": self.started_at, "seconds": self.seconds,
+                "status": self.status, "error": self.error, "attributes": self.attributes}
+
+
+class Trace:
+    """Span timings for one upload job, from download to the user's notification."""
+
+    def __init__(self, job_id, user_id, **attributes):
+        self.trace_id = uuid.uuid4().hex
+        self.job_id = job_id
+        self.user_id = user_id
+        self.attributes = attributes
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        self.spans = []
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def begin(self, name, **attributes) -> Span:
+        span = Span(name, attributes)
+        self.spans.append(span)
+        return span
+
+    @contextmanager
+    def span(self, name, **attributes):
+        span = self.begin(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            span.end(error=e)
+            raise
+        span.end()
+
+    def end_open_spans(self, error=None):
+        """Closes spans an exception skipped past, marking them failed."""
+        for span in self.spans:
+            if span.seconds is None:
+                span.end(error=error or "interrupted")
+
+    def to_document(self, status, error=None) -> dict:
+        self.end_open_spans(error)
+        return {
+            "_id": self.trace_id,
+            "job_id": self.job_id,
+            "user_id": self.user_id,
+            "status": status,
+            "error": str(error) if error is not None else None,
+            "started_at": self.started_at,
+            "seconds": time.perf_counter() - self._started,
+            "attributes": self.attributes,
+            "spans": [span.as_dict() for span in self.spans],
+        }
+
+
+class JobTracer:
+    """Keeps traces of in-flight jobs in memory and writes finished ones to a capped collection.
+
+    `active` is a mapping (the bot passes a StateStore, so abandoned flows
+    expire). Without a collection, traces are dropped on finish.
+    """
+
+    def __init__(self, active, collection=None):
+        self.active = active
+        self.collection = collection
+
+    def start(self, job_id, user_id, **attributes) -> Trace:
+        trace = Trace(job_id, user_id, **attributes)
+        self.active[job_id] = trace
+        return trace
+
+    def get(self, job_id, user_id, **attributes) -> Trace:
+        """The job's running trace, or a fresh one (e.g. after a restart lost it)."""
+        trace = self.active.get(job_id)
+        if trace is None:
+            return self.start(job_id, user_id, **attributes)
+        trace.set(**attributes)
+        return trace
+
+    async def finish(self, job_id, status, error=None):
+        trace = self.active.pop(job_id, None)
+        if trace is None:
+            return None
+        document = trace.to_document(status, error)
+        if self.collection is not None:
+            try:
+                await self.collection.insert_one(document)
+            except Exception as e:
+                logger.error(f"Failed to store trace for job {job_id}: {e}")
+        return document
+
+    # --- Queries ---
+
+    async def find(self, job_id, limit=5) -> list[dict]:
+        """Stored traces of a job (a scheduled job has one for the chat side and one for the run)."""
+        if self.collection is None:
+            return []
+        return await self.collection.find({"job_id": job_id}).sort("started_at", -1).limit(limit).to_list()
+
+    async def for_user(self, user_id, limit=10) -> list[dict]:
+        if self.collection is None:
+            return []
+        return await self.collection.find(
+            {"user_id": user_id}, {"spans.attributes": 0}
+        ).sort("started_at", -1).limit(limit).to_list()
+
+    async def stage_summary(self, since, platform=None, user_id=None, max_traces=5000) -> list[dict]:
+        """count/p50/p95/max seconds per stage over traces started after `since`."""
+        if self.collection is None:
+            return []
+        query = {"started_at": {"$gte": since}}
+        if platform:
+            query["attributes.platform"] = platform
+        if user_id:
+            query["user_id"] = user_id
+        cursor = self.collection.find(query, {"spans.name": 1, "spans.seconds": 1, "spans.status": 1})
+        durations, errors = {}, {}
+        async for doc in cursor.sort("started_at", -1).limit(max_traces):
+            for span in doc.get("spans", []):
+                if span.get("seconds") is None:
+                    continue
+                durations.setdefault(span["name"], []).append(span["seconds"])
+                if span.get("status") == "error":
+                    errors[span["name"]] = errors.get(span["name"], 0) + 1
+
+        order = {name: i for i, name in enumerate(STAGES)}
+        summary = []
+        for name in sorted(durations, key=lambda n: order.get(n, len(STAGES))):
+            values = sorted(durations[name])
+            summary.append({
+                "stage": name, "count": len(values), "errors": errors.get(name, 0),
+                "p50": _percentile(values, 0.5), "p95": _percentile(values, 0.95), "max": values[-1]
+            })
+        return summary
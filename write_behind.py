@@ -0,0 +1,53 @@
+import asyncio
+import logging
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger("YTFBUser.write_behind")
+
+
+class ActivityBuffer:
+    """Coalesces per-user activity/profile fields in memory and flushes them with one bulk_write."""
+
+    def __init__(self, collection, flush_interval=15, max_pending=5000):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}
+        self._flush_lock = asyncio.Lock()
+        self._early_flush = None
+        self.flushed_users = 0
+        self.flush_count = 0
+
+    def touch(self, user_id, **fields):
+        """Records fields to $set on the user's document at the next flush. Later values win."""
+        self._pending.setdefault(user_id, {}).update(fields)
+        if len(self._pending) >= self.max_pending and (self._early_flush is None or self._early_flush.done()):
+            self._early_flush = asyncio.get_running_loop().create_task(self.flush())
+
+    def pending(self, user_id) -> dict:
+        return dict(self._pending.get(user_id, {}))
+
+    async def flush(self) -> int:
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            ops = [UpdateOne({"_id": user_id}, {"$set": fields}, upsert=True) for user_id, fields in batch.items()]
+            try:
+                await self.collection.bulk_write(ops, ordered=False)
+            except Exception as e:
+                logger.error(f"Activity flush of {len(ops)} users failed, re-queueing: {e}")
+                for user_id, fields in batch.items():
+                    # Anything touched during the failed write is newer than the batch.
+                    self._pending[user_id] = {**fields, **self._pending.get(user_id, {})}
+                return 0
+            self.flush_count += 1
+            self.flushed_users += len(ops)
+            return len(ops)
+
+    async def run(self):
+        """Periodic flusher; cancel it and call flush() once more on shutdown."""
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()